@@ -0,0 +1,254 @@
+import base64
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Entries written per insert_many, and the longest an entry waits in the
+# buffer before a partial batch is flushed anyway.
+FLUSH_BATCH = 500
+FLUSH_INTERVAL = 1.0
+
+# Entries buffered before record() starts dropping instead of blocking the
+# request thread.
+QUEUE_SIZE = 20000
+
+# Attempts per batch before it is dropped, and the pause between them
+WRITE_ATTEMPTS = 3
+RETRY_DELAY = 0.5
+
+# Rotation: entries older than this are expired by MongoDB's TTL monitor
+RETENTION_DAYS = 90
+
+_TIMED_OUT = object()
+
+# Compound indexes for /api/logs: equality filter first, then the timestamp
+# range and _id, so each filtered query is a single index range scan that
+# already returns entries in (timestamp, _id) page order; the last one
+# serves unfiltered pages.
+LOG_INDEXES = [
+    [("user_id", 1), ("timestamp", 1), ("_id", 1)],
+    [("item_id", 1), ("timestamp", 1), ("_id", 1)],
+    [("action_type", 1), ("timestamp", 1), ("_id", 1)],
+    [("timestamp", 1), ("_id", 1)],
+]
+
+# Fields returned by /api/logs, and the values /api/logs?groupBy= can count by
+LOG_FIELDS = ['timestamp', 'user_id', 'action_type', 'item_id', 'item_name', 'location',
+              'mission_id', 'item_type', 'recommended_location', 'confidence', 'details']
+GROUP_KEYS = {
+    'actionType': "$action_type",
+    'userId': "$user_id",
+    'itemId': "$item_id",
+    'hour': {"$dateToString": {"format": "%Y-%m-%dT%H:00:00", "date": "$timestamp"}},
+    'day': {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+}
+
+PAGE_ORDER = [("timestamp", -1), ("_id", -1)]
+
+
+class ActivityLog:
+    """Buffered writer for the activity log.
+
+    Request handlers call record()/record_many(), which only enqueue; a
+    single background thread drains the queue and writes with insert_many
+    once FLUSH_BATCH entries are waiting or FLUSH_INTERVAL has passed. The
+    buffer is bounded, and entries that do not fit are dropped and counted
+    rather than slowing the request down. Old entries are rotated out by a
+    TTL index on `timestamp`. close() flushes everything still buffered.
+    Listeners (the change feed) see every entry as it is recorded, including
+    ones recorded with persist=False, which are not written.
+    """
+
+    def __init__(self, collection, batch_size=FLUSH_BATCH, flush_interval=FLUSH_INTERVAL,
+                 queue_size=QUEUE_SIZE, retention_days=RETENTION_DAYS):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.indexed = False
+        self.closed = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def record(self, entry, persist=True):
+        for listener in self.listeners:
+            listener(entry)
+        if not persist or self.collection is None or self.closed:
+            return
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"Activity log buffer is full; {self.dropped} entries dropped so far")
+
+    def record_many(self, entries, persist=True):
+        for entry in entries:
+            self.record(entry, persist)
+
+    def flush(self, timeout=None):
+        """Block until everything recorded before the call is written.
+        Returns False if that did not happen within `timeout` seconds."""
+        if self.thread is None:
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    def ensure_indexes(self):
+        if self.collection is None or self.indexed:
+            return
+        self.indexed = True
+        # Each index on its own, so one that cannot be built (e.g. a TTL index
+        # left from an earlier retention setting) does not keep the others out
+        if self.retention_days:
+            try:
+                self.collection.create_index("timestamp", name="timestamp_ttl",
+                                             expireAfterSeconds=int(self.retention_days * 86400))
+            except PyMongoError as e:
+                logger.warning(f"Could not set up the activity log TTL index: {e}")
+        for keys in LOG_INDEXES:
+            try:
+                self.collection.create_index(keys)
+            except PyMongoError as e:
+                logger.warning(f"Could not set up activity log index {keys}: {e}")
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _ensure_started(self):
+        # Started on first use rather than at import so that forked server
+        # workers each get their own writer thread.
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.ensure_indexes()
+                    self.thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+                    self.thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                entry = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                entry = _TIMED_OUT
+            waiter = entry if isinstance(entry, threading.Event) else None
+            if entry is not None and entry is not _TIMED_OUT and waiter is None:
+                batch.append(entry)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write(batch)
+                batch = []
+                deadline = None
+            if waiter is not None:
+                waiter.set()
+            if entry is None:
+                return
+
+    def _write(self, batch):
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                self.collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+                return
+            except PyMongoError as e:
+                if attempt == WRITE_ATTEMPTS:
+                    self.failed += len(batch)
+                    logger.error(f"Dropping {len(batch)} activity log entries after {attempt} attempts: {e}")
+                else:
+                    time.sleep(RETRY_DELAY * attempt)
+            except Exception as e:
+                # Anything else (e.g. an entry BSON cannot encode) will not go
+                # away on retry; drop the batch and keep the writer running
+                self.failed += len(batch)
+                logger.exception(f"Dropping {len(batch)} activity log entries: {e}")
+                return
+
+
+def encode_cursor(log):
+    raw = f"{log['timestamp'].isoformat()}|{log['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(timestamp, _id) of the last entry a page ended on. Raises ValueError
+    for anything that is not a cursor this module produced."""
+    try:
+        timestamp, object_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), ObjectId(object_id)
+    except (ValueError, TypeError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def after(timestamp, object_id):
+    """Entries that come after (timestamp, _id) in PAGE_ORDER."""
+    return {"$or": [{"timestamp": {"$lt": timestamp}},
+                    {"timestamp": timestamp, "_id": {"$lt": object_id}}]}
+
+
+def up_to(timestamp, object_id):
+    """Entries up to and including (timestamp, _id) in PAGE_ORDER."""
+    return {"$or": [{"timestamp": {"$gt": timestamp}},
+                    {"timestamp": timestamp, "_id": {"$gte": object_id}}]}
+
+
+def stream_logs(cursor):
+    yield '['
+    first = True
+    for log in cursor:
+        if isinstance(log.get('timestamp'), datetime):
+            log['timestamp'] = log['timestamp'].isoformat()
+        row = json.dumps(log, default=str)
+        yield row if first else ',' + row
+        first = False
+    yield ']'
+
+
+def group_pipeline(query, group_by):
+    group_id = {key: GROUP_KEYS[key] for key in group_by}
+    return [
+        {"$match": query},
+        {"$group": {"_id": group_id, "count": {"$sum": 1}}},
+        {"$sort": {f"_id.{key}": 1 for key in group_by}},
+    ]
@@ -1,51 +1,581 @@
 
-from flask import Flask, request, jsonify
+from flask import (Flask, Blueprint, request, jsonify, Response, stream_with_context, g, current_app,
+                   make_response)
 from flask_cors import CORS
-import pandas as pd
 import os
+import json
+import tempfile
 import logging
-import random
-import numpy as np
-from datetime import datetime, timedelta
-from pymongo import MongoClient
+from datetime import datetime
+from pymongo import MongoClient, UpdateOne
+import threading
+import functools
+import atexit
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+from inventory_store import InventoryStore, STORE_PROJECTION
+from placement import PlacementIndex, parse_dimensions, position_to_box
+from search_index import SearchIndex
+from retrieval import RetrievalPlanner
+from importer import import_csv, item_defaults, ITEM_SCHEMA, CONTAINER_SCHEMA
+from jobs import JobManager, JobQueueFull
+from exporter import FORMATS, STREAMERS
+from simulation import (Inventory, ScenarioStore, resupply_item, run_scenarios, commit_changes,
+                        MAX_DAYS, INACTIVE_STATUSES)
+from waste import WasteTracker
+from undocking import save_plan, undock
+from occupancy import OccupancyCache
+from rearrange import Layout, optimize, DEFAULT_BUDGET, MAX_BUDGET, DEFAULT_MAX_MOVES, MAX_MOVES
+from response_cache import ResponseCache, MemoryBackend
+from change_feed import ChangeFeed, FeedFull, FeedRelay, FEED_ACTIONS
+from generation import InventoryGeneration
+from process_pool import ProcessPool
+from metrics import Metrics, start_profile, profile_report
+from return_plan import (WasteLoad, plan_return, VEHICLES, DEFAULT_VEHICLE, CONTAINER_MAX_WEIGHT,
+                         CONTAINER_VOLUME)
+from activity_log import (ActivityLog, LOG_FIELDS, GROUP_KEYS, PAGE_ORDER, encode_cursor,
+                          decode_cursor, after, up_to, stream_logs, group_pipeline)
+
+# Every API route lives on this blueprint; create_app() builds the Flask
+# app around it
+api = Blueprint('api', __name__)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection setup
-try:
-    mongo_uri = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/iss_cargo_db')
-    client = MongoClient(mongo_uri)
-    db = client['iss_cargo_db']
-    logger.info("Connected to MongoDB successfully")
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {e}")
-    db = None
-
-# Collections
-cargo_collection = db['cargo_items'] if db else None
-waste_collection = db['waste_items'] if db else None
-logs_collection = db['activity_logs'] if db else None
+# Settings and their defaults. create_app() takes each from its `config`
+# argument, then the environment, then this table; 0 leaves a MongoDB
+# timeout at the driver default.
+SETTINGS = {
+    'MONGODB_URI': 'mongodb://localhost:27017/iss_cargo_db',
+    'MONGO_DATABASE': 'iss_cargo_db',
+    'MONGO_MAX_POOL_SIZE': 100,
+    'MONGO_MIN_POOL_SIZE': 0,
+    'MONGO_CONNECT_TIMEOUT_MS': 5000,
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 5000,
+    'MONGO_SOCKET_TIMEOUT_MS': 0,
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 10000,
+    'MONGO_READ_PREFERENCE': 'primary',
+    'IMPORT_WORKERS': 1,
+    'IMPORT_QUEUE_SIZE': 8,
+    'LOG_RETENTION_DAYS': 90.0,
+    # Each open event stream holds one of the worker's threads, so by
+    # default at most half of them (gunicorn.conf.py) go to streams
+    'EVENT_STREAM_CLIENTS': max(1, int(os.environ.get('WEB_THREADS', 16)) // 2),
+    'SIMULATION_WORKERS': min(4, os.cpu_count() or 1),
+    'REARRANGE_WORKERS': min(4, os.cpu_count() or 1),
+    'INVENTORY_SYNC_INTERVAL': 1.0,
+    # Change feed events cross between workers through MongoDB, which a
+    # single worker has no need for
+    'EVENT_RELAY_INTERVAL': 0.5 if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1 else 0.0,
+    'PROFILING_ENABLED': False,
+    'RESPONSE_CACHE_TTL': 30.0,
+    'RESPONSE_CACHE_ENTRIES': 1024,
+}
+
+def load_settings(config=None):
+    config = config or {}
+    settings = {}
+    for key, default in SETTINGS.items():
+        value = config.get(key, os.environ.get(key, default))
+        if isinstance(default, bool) and isinstance(value, str):
+            value = value.lower() in ('1', 'true', 'yes')
+        settings[key] = type(default)(value)
+    return settings
+
+def connect(settings):
+    # connect=False: nothing is contacted until the first operation, so the
+    # server starts (and workers fork) whether or not MongoDB is up yet
+    timeouts = {
+        option: settings[key] or None
+        for option, key in (("connectTimeoutMS", 'MONGO_CONNECT_TIMEOUT_MS'),
+                            ("serverSelectionTimeoutMS", 'MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+                            ("socketTimeoutMS", 'MONGO_SOCKET_TIMEOUT_MS'),
+                            ("waitQueueTimeoutMS", 'MONGO_WAIT_QUEUE_TIMEOUT_MS'))
+    }
+    return MongoClient(
+        settings['MONGODB_URI'],
+        connect=False,
+        maxPoolSize=settings['MONGO_MAX_POOL_SIZE'],
+        minPoolSize=settings['MONGO_MIN_POOL_SIZE'],
+        readPreference=settings['MONGO_READ_PREFERENCE'],
+        event_listeners=[metrics.mongo_listener],
+        **timeouts
+    )
+
+# Request, MongoDB and queue metrics for /metrics; one set per process
+metrics = Metrics()
+
+# MongoDB client, database and collections; set by create_app()
+client = None
+db = None
+cargo_collection = None
+waste_collection = None
+logs_collection = None
+containers_collection = None
+
+# Every item and container in compact records, loaded from MongoDB in one
+# projected read on first use and then kept current by the handlers that
+# write them; the engines below are built from it
+inventory_store = None
+inventory_store_lock = threading.Lock()
+
+def get_inventory_store():
+    global inventory_store
+    if inventory_store is None:
+        with inventory_store_lock:
+            if inventory_store is None:
+                if cargo_collection is not None:
+                    cargo_collection.create_index("item_id")
+                inventory_store = InventoryStore.from_collections(containers_collection, cargo_collection)
+    return inventory_store
+
+# In-memory free-space index, built from the inventory store on first use
+# and then kept current by the place/retrieve handlers
+placement_index = None
+placement_index_lock = threading.Lock()
+
+def get_placement_index():
+    global placement_index
+    if placement_index is None:
+        with placement_index_lock:
+            if placement_index is None:
+                placement_index = PlacementIndex.from_store(get_inventory_store())
+    return placement_index
+
+# Retrieval planner with per-container occlusion graphs over the placement index
+retrieval_planner = None
+
+def get_retrieval_planner():
+    global retrieval_planner
+    if retrieval_planner is None:
+        with placement_index_lock:
+            if retrieval_planner is None:
+                retrieval_planner = RetrievalPlanner(get_placement_index())
+    return retrieval_planner
+
+# In-process name/ID index for /api/search, built from the inventory store
+# on first use
+search_index = None
+search_index_lock = threading.Lock()
+
+def get_search_index():
+    global search_index
+    if search_index is None:
+        with search_index_lock:
+            if search_index is None:
+                search_index = SearchIndex.from_store(get_inventory_store())
+    return search_index
+
+# Running waste classification and totals, built from the inventory store on
+# first use and kept current by the handlers that change items
+waste_tracker = None
+waste_tracker_lock = threading.Lock()
+
+def get_waste_tracker():
+    global waste_tracker
+    if waste_tracker is None:
+        with waste_tracker_lock:
+            if waste_tracker is None:
+                waste_tracker = WasteTracker.from_store(get_inventory_store())
+    return waste_tracker
+
+# Background import jobs, the buffered activity log writer, the change
+# feed, its relay to other workers and the cross-worker change counter;
+# created by create_app()
+job_manager = None
+activity_log = None
+change_feed = None
+feed_relay = None
+inventory_generation = None
+
+# What-if simulation runs: uncommitted results, and the processes used
+# when several scenarios are run at once
+scenario_store = ScenarioStore()
+SIMULATION_WORKERS = SETTINGS['SIMULATION_WORKERS']
+
+# Worker processes for CPU-bound fan-out, kept for the life of the server
+# worker; created by create_app()
+process_pool = None
+
+# Annealing chains run side by side for /api/rearrange, one per process of
+# the shared pool
+REARRANGE_WORKERS = SETTINGS['REARRANGE_WORKERS']
+
+# Serialized occupancy reports, rebuilt only when the placement index changes
+occupancy_cache = OccupancyCache()
+
+# Search results, log aggregates and export summaries, dropped by the writes
+# that make them stale; created by create_app()
+response_cache = None
+
+def reset_engines():
+    # Dropped engines are rebuilt from MongoDB the next time they are used
+    global inventory_store, placement_index, retrieval_planner, search_index, waste_tracker
+    inventory_store = placement_index = retrieval_planner = search_index = waste_tracker = None
+
+def changes_inventory(handler):
+    # Handlers that change items or containers run under the worker's
+    # inventory lock, then tell the other workers what they wrote (see
+    # note_changes); a request turned away (4xx) has changed nothing
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        with inventory_generation.lock:
+            response = make_response(handler(*args, **kwargs))
+            if not 400 <= response.status_code < 500:
+                # A handler that noted nothing (e.g. one that failed part way)
+                # has the other workers reload everything
+                inventory_generation.bump(*g.pop('inventory_changes', (None, None)))
+        return response
+    return wrapper
+
+def note_changes(items=(), containers=()):
+    # Items and containers a changes_inventory handler wrote; other workers
+    # re-read just these
+    items_noted, containers_noted = g.setdefault('inventory_changes', (set(), set()))
+    items_noted.update(items)
+    containers_noted.update(containers)
+
+def cached(namespace, when=None):
+    # Successful responses of a GET handler are kept in the response cache,
+    # keyed by the query string; a hit never reaches the handler. `when`
+    # picks the requests that may be cached (those without side effects).
+    # Handlers list the items in their response in g.cache_items.
+    def decorate(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            if 'profile' in g or (when is not None and not when(request.args)):
+                return handler(*args, **kwargs)
+            key = response_cache.key(namespace, request.args)
+            entry = response_cache.get(namespace, key)
+            if entry is not None:
+                body, status, content_type, headers = entry
+                return Response(body, status=status, content_type=content_type,
+                                headers=dict(headers, **{"X-Cache": "HIT"}))
+            generation = response_cache.generation
+            response = make_response(handler(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = [(name, value) for name, value in response.headers
+                           if name not in ('Content-Type', 'Content-Length')]
+                response_cache.put(namespace, key, (response.get_data(), 200, response.content_type, headers),
+                                   generation, g.pop('cache_items', ()))
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorate
+
+def invalidate_responses(items=None):
+    # After a write to items: log aggregates and export counts are stale, as
+    # are the searches that returned `items`, or every search when items
+    # were added or removed (None)
+    if items is None:
+        response_cache.invalidate('search', 'logs', 'export')
+    else:
+        response_cache.invalidate('logs', 'export', items=items)
+
+@api.before_request
+def sync_engines():
+    # Another worker changed the inventory since this one last looked: the
+    # items and containers it wrote are re-read, or everything when that is
+    # not known. A cache private to this worker may hold responses from
+    # before the change too.
+    changes = inventory_generation.poll()
+    if changes is None:
+        return
+    with inventory_generation.lock:
+        if changes.reload:
+            reset_engines()
+            if not response_cache.backend.shared:
+                response_cache.clear()
+            return
+        apply_changes(changes.items, changes.containers)
+        if not response_cache.backend.shared:
+            invalidate_responses()
+
+def apply_changes(item_ids, container_ids):
+    # Patch the engines this worker has built through their incremental
+    # paths; those not built yet load the current data on first use
+    store = inventory_store
+    if store is None:
+        return
+    if container_ids and containers_collection is not None:
+        containers = list(containers_collection.find({"container_id": {"$in": list(container_ids)}}, {"_id": 0}))
+        store.add_containers(containers)
+        if placement_index is not None:
+            placement_index.add_containers(containers)
+    if not item_ids or cargo_collection is None:
+        return
+    item_ids = list(item_ids)
+    store.remove(item_ids)
+    store.put(cargo_collection.find({"item_id": {"$in": item_ids}}, STORE_PROJECTION))
+    if placement_index is not None:
+        with placement_index.lock:
+            for item_id in item_ids:
+                placement_index.remove(item_id)
+                item = store.get(item_id)
+                if item is None or item.container_id is None or item.box is None:
+                    continue
+                try:
+                    placement_index.place(item_id, item.container_id, item.box, item.weight or 0)
+                except (KeyError, TypeError, ValueError):
+                    continue
+    if search_index is not None:
+        search_index.add_many((item_id, store.get(item_id).name or '') for item_id in item_ids
+                              if item_id in store)
+        for item_id in item_ids:
+            if item_id not in store:
+                search_index.remove(item_id)
+    if waste_tracker is not None:
+        waste_tracker.refresh(store, item_ids)
+
+def start_request():
+    g.started = metrics.request_started()
+    # Opt-in profiling: ?profile=1 answers with a cProfile breakdown of the
+    # handler instead of its response, when the server allows it
+    if current_app.config['PROFILING_ENABLED'] and request.args.get('profile') == '1':
+        g.profile = start_profile()
+
+def finish_request(response):
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    metrics.request_finished(request.method, route, response.status_code, g.started, request.content_length,
+                             None if response.is_streamed else response.calculate_content_length())
+    profile = g.pop('profile', None)
+    if profile is not None:
+        return Response(profile_report(profile), mimetype='text/plain')
+    return response
+
+def end_request(error=None):
+    if 'started' in g:
+        metrics.request_ended()
+
+def register_metrics():
+    # Queue depths and throughput owned by the background services, read
+    # when /metrics is scraped
+    metrics.add_callback('activity_log_queue_depth', 'Activity log entries waiting to be written.',
+                         lambda: {(): activity_log.stats()["queued"]})
+    metrics.add_callback('activity_log_entries_total', 'Activity log entries by outcome.',
+                         lambda: {(("outcome", outcome),): count for outcome, count in activity_log.stats().items()
+                                  if outcome != "queued"}, kind='counter')
+    metrics.add_callback('import_queue_depth', 'Import jobs waiting for a worker.',
+                         lambda: {(): job_manager.queue_depth()})
+    metrics.add_callback('event_stream_clients', 'Open /api/events connections.',
+                         lambda: {(): change_feed.stats()["subscribers"]})
+    metrics.add_callback('event_stream_events_total', 'Change feed events published, delivered and merged.',
+                         lambda: {(("stage", stage),): count for stage, count in change_feed.stats().items()
+                                  if stage != "subscribers"}, kind='counter')
+    metrics.add_callback('response_cache_requests_total', 'Response cache lookups by namespace and outcome.',
+                         lambda: {(("namespace", namespace), ("outcome", outcome)): count
+                                  for (namespace, outcome), count in cache_counts().items()}, kind='counter')
+    metrics.add_callback('response_cache_invalidated_total', 'Cached responses dropped by writes.',
+                         lambda: {(): response_cache.invalidated}, kind='counter')
+    metrics.add_callback('response_cache_entries', 'Responses held in this worker\'s cache.',
+                         lambda: {(): len(response_cache.backend)})
+
+def cache_counts():
+    # The occupancy reports have their own cache, keyed on index revisions
+    counts = response_cache.stats()
+    counts[("occupancy", "hit")] = occupancy_cache.hits
+    counts[("occupancy", "miss")] = occupancy_cache.misses
+    return counts
+
+def create_app(config=None, mongo_client=None, cache_backend=None):
+    """Build the Flask app, its MongoDB client and the background services.
+
+    Nothing here waits for MongoDB: the client connects on first use. One
+    app per process, as the handlers share the module-level client,
+    collections and engines. `mongo_client` replaces the client built from
+    the settings (the benchmarks pass a mongomock one). `cache_backend`
+    replaces the per-process response cache store, e.g. with one shared by
+    all workers (see response_cache.MemoryBackend for the interface).
+    """
+    global client, db, cargo_collection, waste_collection, logs_collection, containers_collection
+    global job_manager, activity_log, change_feed, feed_relay, inventory_generation, response_cache
+    global SIMULATION_WORKERS
+    global REARRANGE_WORKERS, process_pool
+    settings = load_settings(config)
+    
+    app = Flask(__name__)
+    app.config.update(settings)
+    CORS(app)  # Enable CORS for all routes
+    
+    try:
+        client = mongo_client if mongo_client is not None else connect(settings)
+        db = client[settings['MONGO_DATABASE']]
+        logger.info("MongoDB client configured; it connects on first use")
+    except Exception as e:
+        logger.error(f"Failed to configure MongoDB: {e}")
+        client = db = None
+    
+    # Collections
+    cargo_collection = db['cargo_items'] if db is not None else None
+    waste_collection = db['waste_items'] if db is not None else None
+    logs_collection = db['activity_logs'] if db is not None else None
+    containers_collection = db['containers'] if db is not None else None
+    reset_engines()
+    
+    # Background import jobs; a small worker pool so large imports cannot starve
+    # interactive requests
+    job_manager = JobManager(workers=settings['IMPORT_WORKERS'], queue_size=settings['IMPORT_QUEUE_SIZE'])
+    
+    # Activity log entries are buffered and written in batches by a background
+    # thread, so request latency does not include log writes
+    activity_log = ActivityLog(logs_collection, retention_days=settings['LOG_RETENTION_DAYS'])
+    
+    # Changes recorded in the activity log are also pushed to /api/events clients
+    change_feed = ChangeFeed(max_subscribers=settings['EVENT_STREAM_CLIENTS'])
+    activity_log.add_listener(change_feed.publish)
+    
+    # ... and to the clients of the other workers
+    feed_relay = None
+    if db is not None and settings['EVENT_RELAY_INTERVAL']:
+        feed_relay = FeedRelay(db['feed_events'], change_feed, interval=settings['EVENT_RELAY_INTERVAL'])
+        activity_log.add_listener(feed_relay.send)
+    
+    # Workers sharing the database re-read what another one changed
+    inventory_generation = InventoryGeneration(db['server_state'] if db is not None else None,
+                                               settings['INVENTORY_SYNC_INTERVAL'],
+                                               db['inventory_changes'] if db is not None else None)
+    SIMULATION_WORKERS = settings['SIMULATION_WORKERS']
+    REARRANGE_WORKERS = settings['REARRANGE_WORKERS']
+    process_pool = ProcessPool(max(SIMULATION_WORKERS, REARRANGE_WORKERS))
+    
+    # Read-heavy GET responses are cached until a write makes them stale or
+    # RESPONSE_CACHE_TTL seconds pass; a TTL of 0 turns the cache off
+    response_cache = ResponseCache(
+        cache_backend if cache_backend is not None else MemoryBackend(settings['RESPONSE_CACHE_ENTRIES']),
+        ttl=settings['RESPONSE_CACHE_TTL'],
+    )
+    
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+    register_metrics()
+    app.register_blueprint(api)
+    atexit.register(shutdown)
+    return app
+
+def drain():
+    # First step of a graceful stop: end the open event streams so the
+    # in-flight requests can finish
+    if change_feed is not None:
+        change_feed.close()
+
+def shutdown():
+    # Last step: stop the import workers, write out the buffered activity
+    # log and relayed events, stop the worker processes and close the
+    # connection pool
+    drain()
+    if job_manager is not None:
+        job_manager.shutdown(timeout=10)
+    if activity_log is not None:
+        activity_log.close()
+    if feed_relay is not None:
+        feed_relay.close()
+    if process_pool is not None:
+        process_pool.shutdown()
+    if client is not None:
+        client.close()
 
 # Helpers
+def import_summary(prefix, stats):
+    return {
+        "success": True,
+        f"{prefix}Processed": stats["processed"],
+        f"{prefix}Added": stats["added"],
+        f"{prefix}Updated": stats["updated"],
+        f"{prefix}Rejected": stats["rejected"],
+        "errors": stats["errors"],
+        "cancelled": stats["cancelled"],
+        "processingTime": f"{stats['seconds']}s"
+    }
+
+def run_import(file, collection, schema, on_chunk, prefix):
+    # ?sync=true runs the import inside the request; otherwise the upload is
+    # spooled to disk and handed to the job pool, and the caller polls
+    # /api/jobs/<id>
+    if request.args.get('sync', 'false').lower() == 'true':
+        try:
+            stats = import_csv(file.stream, collection, schema, on_chunk=on_chunk)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(import_summary(prefix, stats))
+    
+    spooled = tempfile.NamedTemporaryFile(prefix='import-', suffix='.csv', delete=False)
+    with spooled:
+        file.save(spooled)
+    
+    def work(job):
+        def progress(stats):
+            job.progress = {
+                "rowsDone": stats["processed"],
+                "rowsPerSecond": round(stats["processed"] / stats["seconds"], 1) if stats["seconds"] else None,
+                "added": stats["added"],
+                "updated": stats["updated"],
+                "rejected": stats["rejected"],
+                "errors": stats["errors"][:10]
+            }
+        with open(spooled.name, 'rb') as stream:
+            stats = import_csv(stream, collection, schema, on_chunk=on_chunk,
+                               progress=progress, cancelled=job.cancel_event)
+        return import_summary(prefix, stats)
+    
+    try:
+        job = job_manager.submit(f"import_{prefix}", work, cleanup=lambda: os.remove(spooled.name))
+    except JobQueueFull as e:
+        os.remove(spooled.name)
+        return jsonify({"error": f"Import queue is full: {e}"}), 503
+    return jsonify({
+        "success": True,
+        "jobId": job.id,
+        "status": job.status,
+        "statusUrl": f"/api/jobs/{job.id}"
+    }), 202
+
+def parse_scenario(data):
+    # Raises TypeError/ValueError/KeyError on malformed input
+    days = int(data.get('days', 1))
+    return {
+        "name": data.get('name'),
+        # Limit simulation to reasonable range
+        "days": max(1, min(days, MAX_DAYS)),
+        "start": datetime.fromisoformat(data['startDate'][:10]) if data.get('startDate') else datetime.utcnow(),
+        "seed": data.get('seed'),
+        "daily_uses": [entry.get('itemId') if isinstance(entry, dict) else entry
+                       for entry in data.get('itemsToBeUsedPerDay', [])],
+        "resupplies": [
+            (int(delivery['day']), [resupply_item(entry) for entry in delivery.get('items', [])])
+            for delivery in data.get('resupplies', [])
+        ]
+    }
+
+def apply_simulation(changes):
+    with inventory_generation.lock:
+        committed = commit_changes(cargo_collection, changes)
+        updates, new_items = changes
+        # The same conditions as the bulk write: inactive items are left alone
+        # and resupplies never overwrite an existing item
+        store = get_inventory_store()
+        for item_id, fields in updates:
+            store.set([item_id], fields, skip_statuses=INACTIVE_STATUSES)
+        store.put([item for item in new_items if item["item_id"] not in store])
+        changed = [item_id for item_id, _ in updates] + [item["item_id"] for item in new_items]
+        get_waste_tracker().refresh(store, changed)
+        invalidate_responses()
+        inventory_generation.bump(changed)
+    return committed
+
 def log_activity(user_id, action_type, item_id, item_name, location):
-    if logs_collection:
-        logs_collection.insert_one({
-            "user_id": user_id,
-            "action_type": action_type,
-            "item_id": item_id,
-            "item_name": item_name,
-            "location": location,
-            "timestamp": datetime.utcnow()
-        })
+    activity_log.record({
+        "user_id": user_id,
+        "action_type": action_type,
+        "item_id": item_id,
+        "item_name": item_name,
+        "location": location,
+        "timestamp": datetime.utcnow()
+    })
 
-# 1. Cargo Placement API - Uses Greedy Bin Packing algorithm
-@app.route('/api/placement', methods=['POST'])
+# 1. Cargo Placement API - Uses Extreme-Point 3D Bin Packing over the occupancy index
+@api.route('/api/placement', methods=['POST'])
 def get_placement_recommendations():
     try:
         # Extract cargo details from request
@@ -55,114 +585,253 @@ def get_placement_recommendations():
         dimensions = data.get('dimensions', {'length': 20, 'width': 20, 'height': 20})
         priority = data.get('priority', 'medium')
         
-        # Greedy Bin Packing algorithm simulation
-        # In a real implementation, this would analyze current module occupancy
-        # and use bin packing logic to find optimal placement
-        
-        # For demo purposes, use simple logic based on cargo type and weight
-        modules = ['Columbus', 'Destiny', 'Harmony', 'Unity', 'Tranquility', 'Kibo']
-        sections = ['A', 'B', 'C', 'D', 'E']
-        locations = ['Shelf', 'Cabinet', 'Drawer', 'Floor', 'Wall']
-        
-        # Simple greedy selection based on item characteristics
-        if item_type == 'food':
-            module = 'Unity'
-        elif item_type == 'medical':
-            module = 'Columbus'
-        elif item_type == 'scientific':
-            module = 'Destiny'
-        elif weight > 10:
-            module = 'Tranquility'
-        else:
-            module = random.choice(modules)
-            
-        section = f"{random.choice(sections)}{random.randint(1, 9)}"
-        location = f"{random.choice(locations)}-{random.randint(1, 10)}"
-        
-        # Generate confidence score based on item properties
-        confidence = min(95, 60 + (100 - (weight * 2)) / 10)
-        
-        # Generate alternative placements
-        alternatives = []
-        for i in range(2):
-            alt_module = random.choice([m for m in modules if m != module])
-            alt_section = f"{random.choice(sections)}{random.randint(1, 9)}"
-            alt_location = f"{random.choice(locations)}-{random.randint(1, 10)}"
-            alt_confidence = max(50, confidence - (15 * (i+1)))
-            
-            alternatives.append({
-                "module": alt_module,
-                "section": alt_section,
-                "location": alt_location,
-                "confidence": int(alt_confidence)
-            })
+        try:
+            dims = parse_dimensions(dimensions)
+            weight = float(weight)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid item specification: {e}"}), 400
         
-        recommendations = {
-            "module": module,
-            "section": section,
-            "location": location,
-            "confidence": int(confidence),
-            "alternatives": alternatives
-        }
+        # Containers are pre-filtered on free volume, free mass and inner
+        # dimensions, then the survivors are checked exactly against their
+        # extreme points; the best-scoring placement wins
+        placements = get_placement_index().recommend(dims, weight, priority, item_type, limit=3)
+        if not placements:
+            return jsonify({"error": "No container has room for an item of this size and weight"}), 404
+        
+        def to_recommendation(placement):
+            start = placement["position"]["start"]
+            return {
+                "module": placement["module"],
+                "section": placement["section"],
+                "location": f"{placement['containerId']}@({start['width']:g},{start['depth']:g},{start['height']:g})",
+                "containerId": placement["containerId"],
+                "position": placement["position"],
+                "confidence": int(round(placement["fitScore"] * 100)),
+                "fitScore": placement["fitScore"]
+            }
+        
+        best = to_recommendation(placements[0])
+        recommendations = dict(best, alternatives=[to_recommendation(p) for p in placements[1:]])
         
         # Log the recommendation
-        if logs_collection:
-            logs_collection.insert_one({
-                "action_type": "placement_recommendation",
-                "item_type": item_type,
-                "recommended_location": f"{module}/{section}/{location}",
-                "confidence": int(confidence),
-                "timestamp": datetime.utcnow()
-            })
+        activity_log.record({
+            "action_type": "placement_recommendation",
+            "item_type": item_type,
+            "recommended_location": f"{best['module']}/{best['section']}/{best['containerId']}",
+            "confidence": best["confidence"],
+            "timestamp": datetime.utcnow()
+        })
             
         return jsonify(recommendations)
     except Exception as e:
         logger.error(f"Error in placement recommendations: {e}")
         return jsonify({"error": str(e)}), 500
 
-# 2. Item Search & Retrieval API - Uses Trie + BFS 
-@app.route('/api/search', methods=['GET'])
+@api.route('/api/placement/batch', methods=['POST'])
+def place_manifest():
+    try:
+        data = request.get_json() or {}
+        manifest = data.get('items', [])
+        user_id = data.get('userId', 'system')
+        
+        if not manifest:
+            return jsonify({"error": "Manifest items are required"}), 400
+        
+        # Validate the whole manifest up front; bad rows are reported in the
+        # stream rather than failing the batch
+        items = []
+        rejected = []
+        for entry in manifest:
+            item_id = entry.get('itemId')
+            try:
+                if not item_id:
+                    raise ValueError("Item ID is required")
+                items.append({
+                    "item_id": item_id,
+                    "name": entry.get('name', item_id),
+                    "type": entry.get('type', 'general'),
+                    "weight": float(entry.get('weight', 1.0)),
+                    "priority": entry.get('priority', 'medium'),
+                    "dims": parse_dimensions(entry.get('dimensions', {'length': 20, 'width': 20, 'height': 20}))
+                })
+            except (TypeError, ValueError) as e:
+                rejected.append({"itemId": item_id, "error": str(e)})
+        
+        # First-fit-decreasing on a copy of the occupancy index, so other
+        # requests are not held up while the manifest is packed; the locks
+        # are only taken to commit the result (see changes_inventory)
+        started = datetime.utcnow()
+        planned = get_placement_index().snapshot().pack(items)
+        
+        with inventory_generation.lock:
+            packed = get_placement_index().commit(planned)
+            
+            # One bulk write for the inventory and one for the placement log
+            now = datetime.utcnow()
+            placed = [(item, placement) for item, placement in packed if placement is not None]
+            documents = [{
+                "item_id": item['item_id'],
+                "name": item['name'],
+                "type": item['type'],
+                "weight": item['weight'],
+                "priority": item['priority'],
+                "dimensions": dict(zip(('width', 'depth', 'height'), item['dims'])),
+                "module": placement['module'],
+                "section": placement['section'],
+                "container_id": placement['containerId'],
+                "position": placement['position'],
+                "status": "placed"
+            } for item, placement in placed]
+            if documents and cargo_collection is not None:
+                cargo_collection.bulk_write([
+                    UpdateOne({"item_id": document['item_id']}, {"$set": document}, upsert=True)
+                    for document in documents
+                ], ordered=False)
+            get_inventory_store().put(documents)
+            names = get_search_index()
+            for item, placement in placed:
+                names.add(item['item_id'], item['name'])
+            get_waste_tracker().refresh(get_inventory_store(), [item['item_id'] for item, placement in placed])
+            if placed:
+                invalidate_responses()
+                activity_log.record_many([{
+                    "user_id": user_id,
+                    "action_type": "item_placement",
+                    "item_id": item['item_id'],
+                    "item_name": item['name'],
+                    "location": f"{placement['module']}/{placement['section']}/{placement['containerId']}",
+                    "timestamp": now
+                } for item, placement in placed])
+            inventory_generation.bump([item['item_id'] for item, placement in placed])
+        
+        summary = {
+            "itemsReceived": len(manifest),
+            "itemsPlaced": len(placed),
+            "itemsUnplaced": len(packed) - len(placed),
+            "itemsRejected": len(rejected),
+            "processingTime": f"{(now - started).total_seconds():.3f}s"
+        }
+        
+        # Stream one JSON line per item, then the summary
+        def generate():
+            for item, placement in packed:
+                if placement is None:
+                    yield json.dumps({"itemId": item['item_id'], "success": False,
+                                      "error": "No container has room for this item"}) + "\n"
+                else:
+                    yield json.dumps({"itemId": item['item_id'], "success": True,
+                                      "placement": placement}) + "\n"
+            for entry in rejected:
+                yield json.dumps(dict(entry, success=False)) + "\n"
+            yield json.dumps({"summary": summary}) + "\n"
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    except Exception as e:
+        logger.error(f"Error in batch placement: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# 2. Item Search & Retrieval API - Uses an in-process prefix + trigram index
+@api.route('/api/search', methods=['GET'])
+@cached('search', when=lambda args: not args.get('userId'))
 def search_items():
     try:
         item_id = request.args.get('itemId')
         item_name = request.args.get('itemName')
         user_id = request.args.get('userId')
-        query = {}
-        if item_id:
-            query["item_id"] = item_id
+        mode = request.args.get('mode', 'auto')
+        try:
+            limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({"error": "limit and offset must be integers"}), 400
+        if mode not in ['auto', 'prefix', 'substring', 'fuzzy']:
+            return jsonify({"error": "mode must be one of auto, prefix, substring, fuzzy"}), 400
+        
+        # Names are resolved against the index and the requested page of
+        # documents is read from the inventory store, without a query
         if item_name:
-            query["name"] = {"$regex": item_name, "$options": "i"}
-        results = list(cargo_collection.find(query, {"_id": 0})) if cargo_collection else []
+            page, has_more = get_search_index().search(item_name, limit=limit, offset=offset, mode=mode)
+            if item_id:
+                page = [i for i in page if i == item_id]
+        else:
+            page = [item_id] if item_id else []
+            has_more = False
+        
+        results = get_inventory_store().documents(page)
+        g.cache_items = page
         if results and user_id:
             for item in results:
                 log_activity(user_id, "retrieval", item.get("item_id", ""), item.get("name", ""), item.get("module", ""))
-        return jsonify(results)
+        
+        response = jsonify(results)
+        response.headers['X-Has-More'] = 'true' if has_more else 'false'
+        return response
     except Exception as e:
         logger.error(f"Error in item search: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/retrieve', methods=['POST'])
+@api.route('/api/retrieve', methods=['POST'])
+@changes_inventory
 def retrieve_item():
     try:
         data = request.get_json()
         item_id = data.get('itemId')
+        item_ids = data.get('itemIds')
         user_id = data.get('userId')
         
-        if not item_id:
+        if not item_id and not item_ids:
             return jsonify({"error": "Item ID is required"}), 400
+        requested = [item_id] if item_id else list(dict.fromkeys(item_ids))
+        store = get_inventory_store()
+        unknown = [target for target in requested if store.get(target) is None]
+        if unknown:
+            return jsonify({"error": f"Unknown item {unknown[0]}" if item_id else "Unknown items",
+                            "notFound": unknown}), 404
         
-        # In a real implementation, this would update the item's status
-        # For demo, we'll simulate a successful retrieval
+        # Plan against the current arrangement, then free the targets' space
+        # and mark them retrieved; blockers are placed back where they were.
+        # Items not in any container are reported and left as they are.
+        index = get_placement_index()
+        with index.lock:
+            plans, unplaced = get_retrieval_planner().plan(requested)
+            targets = [target for target in requested if target not in unplaced]
+            if not targets:
+                return jsonify({"error": f"Item {item_id} is not in a container" if item_id
+                                else "None of the items are in a container",
+                                "notInContainer": unplaced}), 409
+            for target in targets:
+                index.remove(target)
+        note_changes(targets)
+        if cargo_collection is not None:
+            cargo_collection.update_many(
+                {"item_id": {"$in": targets}},
+                {"$set": {"status": "retrieved"}, "$unset": {"container_id": "", "position": ""}}
+            )
+        store.set(targets, {"status": "retrieved", "container_id": None, "position": None})
+        invalidate_responses(targets)
         
-        # Log the retrieval operation
-        if user_id and logs_collection:
-            logs_collection.insert_one({
-                "user_id": user_id,
-                "action_type": "item_retrieval",
-                "item_id": item_id,
-                "timestamp": datetime.utcnow()
+        # Log the retrieval operation; anonymous retrievals are only pushed
+        # to the change feed
+        retrieved_at = datetime.utcnow()
+        activity_log.record_many([{
+            "user_id": user_id,
+            "action_type": "item_retrieval",
+            "item_id": target,
+            "timestamp": retrieved_at
+        } for target in targets], persist=bool(user_id))
+        
+        if item_ids and not item_id:
+            return jsonify({
+                "success": True,
+                "message": f"{len(targets)} items have been retrieved",
+                "plans": plans,
+                "notInContainer": unplaced,
+                "totalSteps": sum(len(plan["steps"]) for plan in plans),
+                "retrieved_by": user_id,
+                "retrieved_at": retrieved_at.isoformat()
             })
-            
+        
+        steps = plans[0]["steps"]
         return jsonify({
             "success": True,
             "message": f"Item {item_id} has been retrieved",
@@ -170,14 +839,17 @@ def retrieve_item():
                 "item_id": item_id,
                 "status": "retrieved",
                 "retrieved_by": user_id,
-                "retrieved_at": datetime.utcnow().isoformat()
-            }
+                "retrieved_at": retrieved_at.isoformat()
+            },
+            "itemsMoved": plans[0]["itemsMoved"],
+            "retrievalSteps": [dict(step, step=i + 1) for i, step in enumerate(steps)]
         })
     except Exception as e:
         logger.error(f"Error in item retrieval: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/place', methods=['POST'])
+@api.route('/api/place', methods=['POST'])
+@changes_inventory
 def place_item():
     try:
         data = request.get_json()
@@ -187,23 +859,65 @@ def place_item():
         
         if not item_id or not location:
             return jsonify({"error": "Item ID and location are required"}), 400
+        item = get_inventory_store().get(item_id)
+        if item is None:
+            return jsonify({"error": f"Unknown item {item_id}"}), 404
         
         module = location.get('module')
         section = location.get('section')
         position = location.get('position')
         
-        # In a real implementation, this would update the item's location in the database
-        # For demo, we'll simulate a successful placement
+        # Placements that name a container and exact start/end coordinates are
+        # recorded in the occupancy index so later recommendations see them
+        container_id = location.get('containerId')
+        update = {"status": "placed"}
+        if container_id and isinstance(position, dict):
+            try:
+                box = position_to_box(position)
+            except (KeyError, TypeError, ValueError):
+                return jsonify({"error": "Position must have start and end coordinates"}), 400
+            index = get_placement_index()
+            space = index.get(container_id)
+            if space is None:
+                return jsonify({"error": f"Unknown container {container_id}"}), 404
+            weight = item.weight or 0
+            with index.lock:
+                # Moving within the station: the item's current space and
+                # weight must not count against its new position
+                previous_space, previous_box = index.locate(item_id)
+                index.remove(item_id)
+                error = None
+                if not space.fits(box[:3], [box[3] - box[0], box[4] - box[1], box[5] - box[2]]):
+                    error = f"Position is occupied or outside container {container_id}"
+                elif space.used_weight + weight > space.max_weight:
+                    error = f"Container {container_id} cannot take another {weight:g} kg"
+                if error:
+                    if previous_space is not None:
+                        index.place(item_id, previous_space.container_id, previous_box, weight)
+                    return jsonify({"error": error}), 409
+                index.place(item_id, container_id, box, weight)
+            module = module or space.module
+            section = section or space.section
+            position = f"{container_id}@({box[0]:g},{box[1]:g},{box[2]:g})"
+            update.update({"container_id": container_id, "position": location['position']})
+        update.update({k: v for k, v in (("module", module), ("section", section)) if v})
+        note_changes([item_id])
+        if cargo_collection is not None:
+            item = cargo_collection.find_one_and_update({"item_id": item_id}, {"$set": update},
+                                                        projection={"_id": 0, "name": 1})
+            if item is not None:
+                get_search_index().add(item_id, item.get('name', ''))
+        get_inventory_store().set([item_id], update)
+        invalidate_responses([item_id])
         
         # Log the placement operation
-        if user_id and logs_collection:
-            logs_collection.insert_one({
-                "user_id": user_id,
-                "action_type": "item_placement",
-                "item_id": item_id,
-                "location": f"{module}/{section}/{position}",
-                "timestamp": datetime.utcnow()
-            })
+        activity_log.record({
+            "user_id": user_id,
+            "action_type": "item_placement",
+            "item_id": item_id,
+            "location": f"{module}/{section}/{position}",
+            "timestamp": datetime.utcnow()
+        }, persist=bool(user_id))
             
         return jsonify({
             "success": True,
@@ -220,108 +934,120 @@ def place_item():
         logger.error(f"Error in item placement: {e}")
         return jsonify({"error": str(e)}), 500
 
-# 3. Waste Management API - Uses LSTM + Isolation Forest
-@app.route('/api/waste/identify', methods=['GET'])
+# 3. Waste Management API - Uses incremental classification + Linear trend / Isolation Forest
+@api.route('/api/waste/identify', methods=['GET'])
 def identify_waste():
     try:
-        # In a real implementation, this would use LSTM model predictions
-        # For demo, we'll simulate waste identification results
-        
-        waste_types = ['Biological', 'Packaging', 'Technical', 'Food', 'Medical']
-        total_waste = 0
-        categories = []
-        
-        for waste_type in waste_types:
-            # Simulate amount with some randomness
-            amount = round(random.uniform(5, 45), 1)
-            total_waste += amount
-            
-            # Simulate trend
-            trends = ['increasing', 'decreasing', 'stable']
-            trend = random.choice(trends)
-            
-            categories.append({
-                "type": waste_type,
-                "amount": amount,
-                "trend": trend
-            })
-        
-        # Simulate next pickup date (2-4 weeks in the future)
-        days_to_pickup = random.randint(14, 28)
-        next_pickup = (datetime.utcnow() + timedelta(days=days_to_pickup)).strftime('%Y-%m-%d')
-        
-        waste_data = {
-            "categories": categories,
-            "total": round(total_waste, 1),
-            "nextPickup": next_pickup
-        }
-        
-        return jsonify(waste_data)
+        # Totals are maintained incrementally as items change and the summary
+        # is cached, so this is normally a dictionary lookup
+        include_items = request.args.get('items', 'false').lower() == 'true'
+        return jsonify(get_waste_tracker().summary(include_items=include_items))
     except Exception as e:
         logger.error(f"Error in waste identification: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/waste/return-plan', methods=['POST'])
+@api.route('/api/waste/return-plan', methods=['POST'])
 def create_waste_return_plan():
     try:
-        data = request.get_json()
+        data = request.get_json() or {}
         waste_items = data.get('wasteItems', [])
+        mode = data.get('mode', 'pack')
+        mission_id = data.get('missionId')
+        vehicle_name = data.get('vehicle', DEFAULT_VEHICLE)
+        return_date = data.get('returnDate')
         
+        # fromInventory plans for everything currently identified as waste
+        if data.get('fromInventory'):
+            waste_items = [{"itemId": item["itemId"]} for item in
+                           get_waste_tracker().summary(include_items=True)["items"]]
         if not waste_items:
             return jsonify({"error": "Waste items are required"}), 400
+        if mode not in ('pack', 'knapsack'):
+            return jsonify({"error": "Mode must be 'pack' or 'knapsack'"}), 400
+        if vehicle_name not in VEHICLES:
+            return jsonify({"error": f"Unknown vehicle; use one of {', '.join(VEHICLES)}"}), 400
+        try:
+            if return_date:
+                datetime.strptime(return_date, '%Y-%m-%d')
+            preset = VEHICLES[vehicle_name]
+            vehicle = {
+                "max_weight": float(data.get('maxWeight', preset['max_weight'])),
+                "containers": int(data.get('containers', preset['containers'])),
+                "container_max_weight": float(data.get('containerMaxWeight', CONTAINER_MAX_WEIGHT)),
+                "container_volume": float(data.get('containerVolume', CONTAINER_VOLUME))
+            }
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid return plan request: {e}"}), 400
         
-        # In a real implementation, this would calculate optimal packing and scheduling
-        # For demo, we'll simulate a return plan
-        
-        # Calculate total weight and volume
-        total_weight = sum(item.get('weight', 0) for item in waste_items)
+        # Weight, size and type not given in the request come from the
+        # inventory store
+        items = [{
+            "item_id": item.get('itemId', item.get('id')),
+            "type": item.get('type'),
+            "weight": item.get('weight'),
+            "volume": item.get('volume'),
+            "dimensions": item.get('dimensions'),
+            "hazardous": item.get('hazardous')
+        } for item in waste_items]
+        # Only items in the inventory can be planned, saved to a mission and
+        # archived by undocking
+        store = get_inventory_store()
+        unknown = [item["item_id"] for item in items if store.get(item["item_id"]) is None]
+        if unknown:
+            return jsonify({"error": "Unknown items", "notFound": unknown}), 404
+        missing = [item["item_id"] for item in items if item["weight"] is None or
+                   (not item["volume"] and not item["dimensions"]) or item["type"] is None]
+        if missing:
+            stored = {doc["item_id"]: doc for doc in store.documents(missing)}
+            for item in items:
+                document = stored.get(item["item_id"], {})
+                for field in ("type", "weight", "dimensions", "hazardous"):
+                    if item.get(field) is None and document.get(field) is not None:
+                        item[field] = document[field]
         
-        # Simulate return vehicle assignment
-        vehicles = ['Progress MS', 'Cygnus', 'Dragon', 'HTV']
-        assigned_vehicle = random.choice(vehicles)
+        started = datetime.utcnow()
+        load = WasteLoad(items)
+        plan = plan_return(load, vehicle, mode=mode)
+        if return_date:
+            get_waste_tracker().set_next_pickup(return_date)
         
-        # Simulate return date (1-3 months in the future)
-        days_to_return = random.randint(30, 90)
-        return_date = (datetime.utcnow() + timedelta(days=days_to_return)).strftime('%Y-%m-%d')
+        # A plan saved against a mission is what undocking later removes
+        if mission_id and db is not None:
+            assigned = [item_id for container in plan["containers"] for item_id in container["itemIds"]]
+            if not save_plan(db['return_plans'], mission_id, assigned, vehicle_name, return_date):
+                return jsonify({"error": f"Mission {mission_id} has already undocked"}), 409
         
-        # Simulate container assignment
-        containers = []
-        remaining_weight = total_weight
-        container_id = 1
+        biohazard = [container["id"] for container in plan["containers"] if container["biohazard"]]
+        instructions = []
+        if biohazard:
+            instructions.append(f"Pack biohazardous materials in red containers: {', '.join(biohazard)}")
+        instructions.append("Ensure all containers are properly sealed")
+        if return_date:
+            instructions.append(f"Complete packing 48 hours before {return_date}")
+        if plan["unassigned"]:
+            instructions.append(f"{len(plan['unassigned'])} items stay aboard for a later vehicle")
         
-        while remaining_weight > 0:
-            container_capacity = random.uniform(10, 30)
-            container_weight = min(container_capacity, remaining_weight)
-            remaining_weight -= container_weight
-            
-            containers.append({
-                "id": f"CONT-{container_id:03d}",
-                "capacity": round(container_capacity, 1),
-                "filled": round(container_weight, 1),
-                "items": random.randint(1, 5)
-            })
-            container_id += 1
-        
-        return_plan = {
+        return_plan = dict(plan, **{
             "success": True,
-            "wasteItems": len(waste_items),
-            "totalWeight": round(total_weight, 1),
-            "returnVehicle": assigned_vehicle,
+            "mode": mode,
+            "wasteItems": len(items),
+            "totalWeight": round(float(load.weight.sum()), 1),
+            "totalVolume": round(float(load.volume.sum()), 1),
+            "missionId": mission_id,
+            "returnVehicle": vehicle_name,
             "returnDate": return_date,
-            "containers": containers,
-            "instructions": [
-                f"Pack biohazardous materials in red containers",
-                f"Ensure all containers are properly sealed",
-                f"Complete packing 48 hours before {return_date}"
-            ]
-        }
+            "maxWeight": vehicle["max_weight"],
+            "instructions": instructions,
+            "planningTime": f"{(datetime.utcnow() - started).total_seconds():.3f}s"
+        })
         
         return jsonify(return_plan)
     except Exception as e:
         logger.error(f"Error in waste return planning: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/waste/complete-undocking', methods=['POST'])
+@api.route('/api/waste/complete-undocking', methods=['POST'])
+@changes_inventory
 def complete_waste_undocking():
     try:
         data = request.get_json()
@@ -331,92 +1057,141 @@ def complete_waste_undocking():
         if not mission_id:
             return jsonify({"error": "Mission ID is required"}), 400
         
-        # In a real implementation, this would update all waste records
-        # For demo, we'll simulate a successful undocking
+        if db is None:
+            return jsonify({"error": "Database is not available"}), 503
         
-        # Log the waste undocking operation
-        if user_id and logs_collection:
-            logs_collection.insert_one({
+        # Archive the mission's items and drop them from the inventory in one
+        # transaction; repeating a completed mission returns its outcome
+        outcome, item_ids, already_undocked = undock(db, mission_id, data.get('itemIds'))
+        if outcome is None:
+            return jsonify({"error": f"No return plan found for mission {mission_id}"}), 404
+        note_changes([] if already_undocked else item_ids)
+        
+        if not already_undocked:
+            # The items are gone, so the in-memory indexes drop them too
+            get_inventory_store().remove(item_ids)
+            placement = get_placement_index()
+            names = get_search_index()
+            for item_id in item_ids:
+                placement.remove(item_id)
+                names.remove(item_id)
+            get_waste_tracker().forget(item_ids)
+            invalidate_responses()
+            
+            # Log the waste undocking operation
+            activity_log.record({
                 "user_id": user_id,
                 "action_type": "waste_undocking",
                 "mission_id": mission_id,
+                "details": {"items_archived": outcome["itemsArchived"]},
                 "timestamp": datetime.utcnow()
-            })
-            
-        completion_time = datetime.utcnow().isoformat()
+            }, persist=bool(user_id))
         
-        return jsonify({
+        return jsonify(dict(outcome, **{
             "success": True,
             "message": f"Waste undocking for mission {mission_id} completed successfully",
             "missionId": mission_id,
-            "completedAt": completion_time,
-            "status": "undocked"
-        })
+            "status": "undocked",
+            "alreadyUndocked": already_undocked
+        }))
     except Exception as e:
         logger.error(f"Error in waste undocking completion: {e}")
         return jsonify({"error": str(e)}), 500
 
 # 4. Time Simulation API - Uses Discrete Event Simulation (DES)
-@app.route('/api/simulate/day', methods=['POST'])
+@api.route('/api/simulate/day', methods=['POST'])
 def simulate_day():
     try:
         data = request.get_json() or {}
         user_id = data.get('userId', 'system')
-        days = data.get('days', 1)
-        
-        # Limit simulation to reasonable range
-        if days > 30:
-            days = 30
-            
-        # In a real implementation, this would run a discrete event simulation
-        # For demo, we'll simulate the passage of days
-        
-        # Simulate consumption of supplies
-        food_consumed = round(random.uniform(1.5, 2.5) * days, 1)
-        water_consumed = round(random.uniform(2.0, 3.0) * days, 1)
-        oxygen_consumed = round(random.uniform(0.8, 1.2) * days, 1)
         
-        # Simulate waste generation
-        waste_generated = round(random.uniform(1.0, 1.8) * days, 1)
+        # `scenarios` runs several what-if branches side by side; otherwise
+        # the request itself is the single scenario
+        try:
+            scenarios = [parse_scenario(scenario) for scenario in data['scenarios']] \
+                if data.get('scenarios') else [parse_scenario(data)]
+        except (TypeError, ValueError, KeyError) as e:
+            return jsonify({"error": f"Invalid simulation request: {e}"}), 400
+        if len(scenarios) > 1 and data.get('commit'):
+            return jsonify({"error": "Only a single scenario can be committed directly"}), 400
         
-        # Simulate scientific experiments
-        experiments_conducted = random.randint(1, 3) * days
+        # Every scenario runs on its own copy-on-write fork of one snapshot
+        # of the working inventory, so nothing live is touched until commit
+        inventory = Inventory.from_store(get_inventory_store())
+        outcomes = run_scenarios(inventory, scenarios, process_pool, SIMULATION_WORKERS)
         
-        # Log the simulation
-        if logs_collection:
-            logs_collection.insert_one({
+        results = []
+        for scenario, (result, changes) in zip(scenarios, outcomes):
+            result = dict(result, name=scenario["name"], simulationTime=datetime.utcnow().isoformat())
+            if data.get('commit'):
+                result["committed"] = apply_simulation(changes) if cargo_collection is not None else None
+            else:
+                result["scenarioId"] = scenario_store.put(changes)
+            results.append(result)
+            
+            # Log the simulation
+            activity_log.record({
                 "user_id": user_id,
                 "action_type": "simulation",
                 "details": {
-                    "days_simulated": days,
-                    "food_consumed": food_consumed,
-                    "waste_generated": waste_generated,
-                    "experiments_conducted": experiments_conducted
+                    "days_simulated": result["daysSimulated"],
+                    "consumed": result["consumables"],
+                    "waste_generated": result["wasteGenerated"],
+                    "items_depleted": result["itemsDepletedCount"],
+                    "items_expired": result["itemsExpiredCount"],
+                    "committed": bool(data.get('commit'))
                 },
                 "timestamp": datetime.utcnow()
             })
-            
+        
+        if data.get('scenarios'):
+            return jsonify({
+                "success": True,
+                "message": f"Simulated {len(results)} scenarios of ISS operations",
+                "scenarios": results
+            })
         return jsonify({
             "success": True, 
-            "message": f"Simulated {days} days of ISS operations",
-            "simulation": {
-                "daysSimulated": days,
-                "consumables": {
-                    "foodConsumed": food_consumed,
-                    "waterConsumed": water_consumed,
-                    "oxygenConsumed": oxygen_consumed
-                },
-                "wasteGenerated": waste_generated,
-                "experimentsCompleted": experiments_conducted,
-                "simulationTime": datetime.utcnow().isoformat()
-            }
+            "message": f"Simulated {results[0]['daysSimulated']} days of ISS operations",
+            "simulation": results[0]
         })
     except Exception as e:
         logger.error(f"Error in day simulation: {e}")
         return jsonify({"error": str(e)}), 500
 
+@api.route('/api/simulate/commit', methods=['POST'])
+def commit_simulation():
+    try:
+        data = request.get_json() or {}
+        scenario_id = data.get('scenarioId')
+        user_id = data.get('userId', 'system')
+        
+        if not scenario_id:
+            return jsonify({"error": "Scenario ID is required"}), 400
+        if cargo_collection is None:
+            return jsonify({"error": "Database is not available"}), 503
+        
+        changes = scenario_store.pop(scenario_id)
+        if changes is None:
+            return jsonify({"error": "Scenario not found; it may have been committed already or expired"}), 404
+        
+        # One unordered bulk write applies the whole scenario
+        committed = apply_simulation(changes)
+        
+        activity_log.record({
+            "user_id": user_id,
+            "action_type": "simulation_commit",
+            "details": dict(committed, scenario_id=scenario_id),
+            "timestamp": datetime.utcnow()
+        })
+        
+        return jsonify(dict(committed, success=True, scenarioId=scenario_id))
+    except Exception as e:
+        logger.error(f"Error in simulation commit: {e}")
+        return jsonify({"error": str(e)}), 500
+
 # 5. Import/Export API - Uses Chunked Parsing + Schema Matching
-@app.route('/api/import/items', methods=['POST'])
+@api.route('/api/import/items', methods=['POST'])
 def import_items():
     try:
         if 'file' not in request.files:
@@ -425,32 +1200,33 @@ def import_items():
         if not file.filename.endswith('.csv'):
             return jsonify({"error": "File must be CSV format"}), 400
         
-        # In a real implementation, this would parse and validate the CSV
-        # For demo, we'll simulate the import process
-        
-        # Read file contents
-        df = pd.read_csv(file)
-        
-        # Simulate processing statistics
-        items_processed = len(df)
-        items_added = int(len(df) * 0.75)
-        items_updated = int(len(df) * 0.25)
-        processing_time = round(items_processed * 0.05, 2)  # Simulate processing time
-        
-        result = {
-            "success": True, 
-            "itemsProcessed": items_processed, 
-            "itemsAdded": items_added, 
-            "itemsUpdated": items_updated,
-            "processingTime": f"{processing_time}s"
-        }
+        # Parse, validate and upsert chunk by chunk; the search index and
+        # waste totals pick up each chunk as it lands (looked up per chunk,
+        # since they are rebuilt when another worker changes the inventory)
+        def on_chunk(items):
+            with inventory_generation.lock:
+                # Items new to this worker were created with the defaults
+                store = get_inventory_store()
+                items = [dict(item_defaults(item), **item) if store.get(item["item_id"]) is None else item
+                         for item in items]
+                store.put(items)
+                get_search_index().add_many((i["item_id"], i["name"]) for i in items if "name" in i)
+                get_waste_tracker().refresh(get_inventory_store(), [i["item_id"] for i in items])
+                invalidate_responses()
+                inventory_generation.bump([i["item_id"] for i in items])
+            activity_log.record({
+                "user_id": "system",
+                "action_type": "item_import",
+                "details": {"items": len(items)},
+                "timestamp": datetime.utcnow()
+            })
         
-        return jsonify(result)
+        return run_import(file, cargo_collection, ITEM_SCHEMA, on_chunk, "items")
     except Exception as e:
         logger.error(f"Error in import: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/import/containers', methods=['POST'])
+@api.route('/api/import/containers', methods=['POST'])
 def import_containers():
     try:
         if 'file' not in request.files:
@@ -459,68 +1235,90 @@ def import_containers():
         if not file.filename.endswith('.csv'):
             return jsonify({"error": "File must be CSV format"}), 400
         
-        # Similar to import_items but for containers
-        df = pd.read_csv(file)
-        
-        # Simulate processing statistics
-        containers_processed = len(df)
-        containers_added = int(len(df) * 0.8)
-        containers_updated = int(len(df) * 0.2)
-        processing_time = round(containers_processed * 0.07, 2)
-        
-        result = {
-            "success": True, 
-            "containersProcessed": containers_processed, 
-            "containersAdded": containers_added, 
-            "containersUpdated": containers_updated,
-            "processingTime": f"{processing_time}s"
-        }
+        # Same pipeline as import_items; new containers become available to
+        # the placement engine as soon as their chunk is written
+        def on_chunk(containers):
+            with inventory_generation.lock:
+                get_inventory_store().add_containers(containers)
+                get_placement_index().add_containers(containers)
+                response_cache.invalidate('logs')
+                inventory_generation.bump(containers=[c["container_id"] for c in containers])
+            activity_log.record({
+                "user_id": "system",
+                "action_type": "container_import",
+                "details": {"containers": len(containers)},
+                "timestamp": datetime.utcnow()
+            })
         
-        return jsonify(result)
+        return run_import(file, containers_collection, CONTAINER_SCHEMA, on_chunk, "containers")
     except Exception as e:
         logger.error(f"Error in container import: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/export/arrangement', methods=['GET'])
+@api.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job.snapshot())
+
+@api.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job.snapshot())
+
+@api.route('/api/export/arrangement', methods=['GET'])
 def export_arrangement():
     try:
         module = request.args.get('module')
         format_type = request.args.get('format', 'csv')
         
-        # In a real implementation, this would query the database and format the data
-        # For demo, we'll simulate the export process
-        
-        if format_type not in ['csv', 'json']:
+        if format_type not in FORMATS:
             return jsonify({"error": "Unsupported export format"}), 400
         
-        # Simulate export data preparation
-        modules = ['Columbus', 'Destiny', 'Harmony', 'Unity', 'Tranquility', 'Kibo']
-        if module and module not in modules:
+        known_modules = {m for m in get_placement_index().modules if m}
+        if module and known_modules and module not in known_modules:
             return jsonify({"error": "Invalid module specified"}), 400
+        if cargo_collection is None:
+            return jsonify({"error": "Database is not available"}), 503
         
-        # Determine what modules to include
-        modules_to_export = [module] if module else modules
+        # Rows come from the inventory store, in (module, item_id) order, and
+        # are formatted batch by batch as the response is sent
+        rows = (item.document() for item in get_inventory_store().in_module(module))
         
-        # Simulate export statistics
-        items_exported = random.randint(50, 200) * len(modules_to_export)
-        sections_included = random.randint(3, 8) * len(modules_to_export)
-        
-        result = {
-            "success": True,
-            "exportFormat": format_type,
-            "modulesIncluded": modules_to_export,
-            "itemsExported": items_exported,
-            "sectionsIncluded": sections_included,
-            "downloadUrl": f"/api/downloads/arrangement_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{format_type}"
-        }
-        
-        return jsonify(result)
+        mimetype, extension = FORMATS[format_type]
+        filename = f"arrangement_{module + '_' if module else ''}{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{extension}"
+        response = Response(stream_with_context(STREAMERS[format_type](rows)), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
     except Exception as e:
         logger.error(f"Error in arrangement export: {e}")
         return jsonify({"error": str(e)}), 500
 
+@api.route('/api/export/summary', methods=['GET'])
+@cached('export')
+def export_summary():
+    try:
+        if cargo_collection is None:
+            return jsonify({"error": "Database is not available"}), 503
+        
+        # What an export would contain: rows per module
+        modules = [{"module": module, "items": count}
+                   for module, count in sorted(get_inventory_store().module_counts().items())]
+        return jsonify({
+            "modules": modules,
+            "items": sum(module["items"] for module in modules),
+            "formats": list(FORMATS),
+        })
+    except Exception as e:
+        logger.error(f"Error in export summary: {e}")
+        return jsonify({"error": str(e)}), 500
+
 # 6. Logging API - Uses Asynchronous Logging + Log Rotation
-@app.route('/api/logs', methods=['GET'])
+@api.route('/api/logs', methods=['GET'])
+@cached('logs', when=lambda args: args.get('groupBy'))
 def get_logs():
     try:
         start_date = request.args.get('startDate')
@@ -549,20 +1347,157 @@ def get_logs():
         if action_type:
             query["action_type"] = action_type
         
-        # Execute the query
-        results = list(logs_collection.find(query, {"_id": 0})) if logs_collection else []
+        group_by = [key for key in request.args.get('groupBy', '').split(',') if key]
+        unknown = [key for key in group_by if key not in GROUP_KEYS]
+        if unknown:
+            return jsonify({"error": f"Cannot group by {', '.join(unknown)}; use {', '.join(GROUP_KEYS)}"}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+            page_after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        fields = [field for field in request.args.get('fields', '').split(',') if field in LOG_FIELDS] or LOG_FIELDS
         
-        # Convert datetime objects to ISO format strings for JSON serialization
-        for log in results:
-            if "timestamp" in log:
-                log["timestamp"] = log["timestamp"].isoformat()
+        if logs_collection is None:
+            return jsonify([])
+        activity_log.ensure_indexes()
         
-        return jsonify(results)
+        # Entries still buffered by the writer are flushed first so the
+        # query sees everything logged before this request
+        activity_log.flush(timeout=2)
+        
+        # Aggregation mode: counts per group are computed by MongoDB, so
+        # charts never pull raw rows
+        if group_by:
+            return jsonify([
+                dict(group["_id"], count=group["count"])
+                for group in logs_collection.aggregate(group_pipeline(query, group_by))
+            ])
+        
+        if page_after:
+            query = {"$and": [query, after(*page_after)]}
+        
+        # The last (timestamp, _id) of the page is found with a covered index
+        # scan first; the page itself is then bounded by it rather than by a
+        # limit, so entries logged meanwhile can't push rows off the page
+        # without them reappearing on the next one.
+        boundary = list(logs_collection.find(query, {"timestamp": 1})
+                        .sort(PAGE_ORDER).skip(limit - 1).limit(2))
+        headers = {}
+        if len(boundary) == 2:
+            headers["X-Next-Cursor"] = encode_cursor(boundary[0])
+            query = {"$and": [query, up_to(boundary[0]["timestamp"], boundary[0]["_id"])]}
+        
+        projection = dict({field: 1 for field in fields}, _id=0)
+        cursor = logs_collection.find(query, projection).sort(PAGE_ORDER).batch_size(limit)
+        return Response(stream_with_context(stream_logs(cursor)), mimetype='application/json', headers=headers)
     except Exception as e:
         logger.error(f"Error in logs retrieval: {e}")
         return jsonify({"error": str(e)}), 500
 
-# Main entry point
+# 7. Occupancy API - Uses materialized counters + ETag revalidation
+@api.route('/api/occupancy', methods=['GET'])
+def get_occupancy():
+    try:
+        module = request.args.get('module')
+        with_containers = request.args.get('containers', 'false').lower() == 'true'
+        
+        index = get_placement_index()
+        if module and module not in index.module_usage:
+            return jsonify({"error": f"Unknown module {module}"}), 404
+        
+        # Served from the index's running totals; an unchanged report is
+        # answered with 304 when the client already has it
+        body, etag = occupancy_cache.get(index, module, with_containers)
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        logger.error(f"Error in occupancy report: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# 8. Change Feed API - Uses Server-Sent Events + per-client coalescing
+@api.route('/api/events', methods=['GET'])
+def stream_events():
+    try:
+        types = [t for t in request.args.get('types', '').split(',') if t] or None
+        unknown = [t for t in types or [] if t not in FEED_ACTIONS]
+        if unknown:
+            return jsonify({"error": f"Unknown event types {', '.join(unknown)}; use {', '.join(sorted(FEED_ACTIONS))}"}), 400
+        
+        # Each client gets its own bounded, coalescing buffer; a slow reader
+        # receives merged events rather than holding up anyone else
+        try:
+            subscriber = change_feed.subscribe(types)
+        except FeedFull as e:
+            return jsonify({"error": f"Event stream unavailable: {e}"}), 503
+        if feed_relay is not None:
+            feed_relay.start()
+        return Response(stream_with_context(change_feed.stream(subscriber)), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    except Exception as e:
+        logger.error(f"Error in event stream: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# 9. Metrics API - Uses Prometheus text exposition
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# 10. Rearrangement API - Uses Simulated Annealing with incremental move scoring
+@api.route('/api/rearrange', methods=['POST'])
+def suggest_rearrangement():
+    try:
+        data = request.get_json() or {}
+        module = data.get('module')
+        user_id = data.get('userId', 'system')
+        
+        try:
+            budget = float(data.get('timeBudget', DEFAULT_BUDGET))
+            max_moves = int(data.get('maxMoves', DEFAULT_MAX_MOVES))
+            seed = int(data['seed']) if data.get('seed') is not None else None
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid rearrangement request: {e}"}), 400
+        if not 0 < budget <= MAX_BUDGET:
+            return jsonify({"error": f"timeBudget must be between 0 and {MAX_BUDGET:g} seconds"}), 400
+        if not 1 <= max_moves <= MAX_MOVES:
+            return jsonify({"error": f"maxMoves must be between 1 and {MAX_MOVES}"}), 400
+        
+        index = get_placement_index()
+        if module and module not in index.module_usage:
+            return jsonify({"error": f"Unknown module {module}"}), 404
+        
+        # The search runs on a copy of the occupancy, so nothing is moved and
+        # placements carry on meanwhile; the moves are a proposal to be
+        # carried out in order through /api/place
+        store = get_inventory_store()
+        layout = Layout.from_index(index, store, module)
+        result = optimize(layout, budget, max_moves, seed, process_pool, REARRANGE_WORKERS)
+        for move in result["moves"]:
+            item = store.get(move["itemId"])
+            move["itemName"] = item.name if item is not None else None
+        
+        activity_log.record({
+            "user_id": user_id,
+            "action_type": "rearrangement_plan",
+            "details": {
+                "module": module,
+                "moves": len(result["moves"]),
+                "efficiency_before": result["efficiency"]["before"],
+                "efficiency_after": result["efficiency"]["after"],
+                "time_budget": budget
+            },
+            "timestamp": datetime.utcnow()
+        })
+        
+        return jsonify(dict(result, success=True, module=module))
+    except Exception as e:
+        logger.error(f"Error in rearrangement: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# Main entry point for development; production runs under gunicorn with
+# gunicorn.conf.py
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8000))
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port, threaded=True)
@@ -0,0 +1,69 @@
+"""Compare two benchmark result files.
+
+    python benchmarks/compare.py results/base.json results/head.json --threshold 10
+
+Prints the change in throughput and p50/p99 latency per scenario and exits
+with status 1 when any of them got worse by more than `--threshold`
+percent, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+# (label, path into a scenario's result, True when higher is better)
+COLUMNS = [
+    ('req/s', ('throughput',), True),
+    ('p50 ms', ('latency_ms', 'p50'), False),
+    ('p99 ms', ('latency_ms', 'p99'), False),
+]
+
+
+def lookup(result, path):
+    for key in path:
+        if result is None:
+            return None
+        result = result.get(key)
+    return result
+
+
+def compare(base, head, threshold):
+    """Rows of (scenario, label, base, head, change %, regressed)."""
+    rows = []
+    for name, result in head["scenarios"].items():
+        before = base["scenarios"].get(name)
+        for label, path, higher_is_better in COLUMNS:
+            old, new = lookup(before, path), lookup(result, path)
+            if not old or new is None:
+                rows.append((name, label, old, new, None, False))
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            rows.append((name, label, old, new, change, worse > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--threshold', type=float, default=10.0, help="Percent change counted as a regression")
+    args = parser.parse_args(argv)
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    for key in ('backend', 'items', 'containers', 'requests'):
+        if base.get(key) != head.get(key):
+            print(f"warning: {key} differs ({base.get(key)} vs {head.get(key)}); numbers are not comparable")
+    print(f"{base['commit']} -> {head['commit']}")
+    rows = compare(base, head, args.threshold)
+    for name, label, old, new, change, regressed in rows:
+        change_text = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"{name:16} {label:7} {old if old is not None else '-':>10} {new if new is not None else '-':>10} "
+              f"{change_text:>8}{'  REGRESSION' if regressed else ''}")
+    return 1 if any(row[5] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import random
+from datetime import datetime, timedelta
+
+# Station layout and container kinds: (label, width, depth, height, max kg)
+MODULES = ['Columbus', 'Destiny', 'Harmony', 'Unity', 'Tranquility', 'Kibo', 'Zvezda', 'Zarya', 'Rassvet']
+CONTAINER_KINDS = [
+    ('CTB', 50, 42, 25, 27),
+    ('Locker', 60, 60, 60, 80),
+    ('Rack', 100, 85, 200, 400),
+]
+CONTAINER_WEIGHTS = [6, 3, 1]
+
+# Item kinds: (name, type, side range cm, weight range kg, usage limit,
+# shelf life range in days or None)
+ITEM_KINDS = [
+    ('Food Packet', 'food', (8, 20), (0.2, 1.5), 1, (30, 720)),
+    ('Water Bag', 'food', (10, 25), (0.5, 4.0), 1, (180, 1080)),
+    ('Oxygen Cylinder', 'life_support', (15, 40), (5.0, 20.0), 20, None),
+    ('First Aid Kit', 'medical', (10, 30), (0.5, 3.0), 30, (180, 900)),
+    ('Medication Pack', 'medical', (5, 12), (0.05, 0.5), 10, (90, 720)),
+    ('Screwdriver', 'tools', (3, 25), (0.1, 0.6), 1000, None),
+    ('Sample Tube Rack', 'scientific', (10, 30), (0.3, 2.0), 50, (60, 365)),
+    ('Filter Cartridge', 'maintenance', (10, 35), (0.5, 5.0), 60, None),
+    ('Clothing Pack', 'clothing', (15, 35), (0.5, 2.5), 30, None),
+    ('Packaging Foam', 'packaging', (10, 40), (0.1, 1.0), 1, None),
+]
+ITEM_WEIGHTS = [20, 10, 3, 5, 6, 6, 6, 6, 8, 4]
+
+WORDS = [kind[0].split()[0] for kind in ITEM_KINDS]
+
+
+def containers(count, seed=0):
+    rnd = random.Random(seed)
+    result = []
+    for i in range(count):
+        label, width, depth, height, max_weight = rnd.choices(CONTAINER_KINDS, CONTAINER_WEIGHTS)[0]
+        result.append({
+            "container_id": f"{label}-{i:06d}",
+            "module": MODULES[i % len(MODULES)],
+            "section": f"S{rnd.randint(1, 12)}",
+            "width": float(width),
+            "depth": float(depth),
+            "height": float(height),
+            "max_weight": float(max_weight),
+        })
+    return result
+
+
+def items(count, station, seed=0, placed_fraction=0.8, today=None):
+    """Synthetic cargo. About `placed_fraction` of it is stowed in
+    `station`'s containers, stacked on a grid of cells so no two boxes
+    overlap; the rest is unplaced. Expiry dates straddle `today` so some
+    items are already waste."""
+    rnd = random.Random(seed + 1)
+    today = today or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Free grid cells per container, filled in order
+    cursors = [0] * len(station)
+    open_containers = list(range(len(station)))
+    result = []
+    for i in range(count):
+        name, item_type, sides, weights, usage_limit, shelf_life = rnd.choices(ITEM_KINDS, ITEM_WEIGHTS)[0]
+        dims = [float(rnd.randint(*sides)) for _ in range(3)]
+        item = {
+            "item_id": f"ITM-{i:07d}",
+            "name": f"{name} {i}",
+            "type": item_type,
+            "weight": round(rnd.uniform(*weights), 3),
+            "dimensions": {"width": dims[0], "depth": dims[1], "height": dims[2]},
+            "priority": rnd.randint(1, 100),
+            "access_frequency": rnd.choice(['high', 'medium', 'medium', 'low', 'low']),
+            "hazardous": item_type == 'life_support' and rnd.random() < 0.3,
+            "expiry_date": today + timedelta(days=rnd.randint(-30, shelf_life[1])) if shelf_life else None,
+            "usage_limit": usage_limit,
+            "uses_remaining": rnd.randint(0, usage_limit) if usage_limit > 1 else 1,
+            "status": "stored",
+        }
+        if open_containers and rnd.random() < placed_fraction:
+            slot = _stow(station, cursors, open_containers, dims, rnd)
+            if slot is not None:
+                container, box = slot
+                item.update({
+                    "module": container["module"],
+                    "section": container["section"],
+                    "container_id": container["container_id"],
+                    "position": {
+                        "start": {"width": box[0], "depth": box[1], "height": box[2]},
+                        "end": {"width": box[3], "depth": box[4], "height": box[5]},
+                    },
+                    "status": "placed",
+                })
+        result.append(item)
+    return result
+
+
+def _stow(station, cursors, open_containers, dims, rnd):
+    # Containers are divided into cubic cells (40 cm, or 25 cm where that
+    # does not fit the height) filled in order; an item goes in a cell when
+    # all its sides fit, else another container is tried
+    for _ in range(8):
+        index = rnd.choice(open_containers)
+        container = station[index]
+        cell = 40.0 if container["height"] >= 40 else 25.0
+        per_row = int(container["width"] // cell)
+        per_layer = per_row * int(container["depth"] // cell)
+        capacity = per_layer * int(container["height"] // cell)
+        if cursors[index] >= capacity:
+            open_containers.remove(index)
+            if not open_containers:
+                return None
+            continue
+        if max(dims) > cell:
+            continue
+        n = cursors[index]
+        cursors[index] += 1
+        x, y, z = (n % per_row) * cell, (n // per_row % (per_layer // per_row)) * cell, (n // per_layer) * cell
+        return container, (x, y, z, x + dims[0], y + dims[1], z + dims[2])
+    return None
+
+
+def activity_logs(count, inventory, seed=0, days=30):
+    rnd = random.Random(seed + 2)
+    start = datetime.utcnow() - timedelta(days=days)
+    actions = ['item_placement', 'item_retrieval', 'retrieval', 'placement_recommendation']
+    return [{
+        "user_id": f"crew-{rnd.randint(1, 6)}",
+        "action_type": rnd.choice(actions),
+        "item_id": rnd.choice(inventory)["item_id"],
+        "timestamp": start + timedelta(seconds=rnd.uniform(0, days * 86400)),
+    } for _ in range(count)]
+
+
+def items_csv(count, seed=0, prefix='IMP'):
+    """An import file in the upload format."""
+    rnd = random.Random(seed + 3)
+    rows = ["item_id,name,type,weight_kg,dimensions_cm,priority,expiry_date,usage_limit"]
+    for i in range(count):
+        name, item_type, sides, weights, usage_limit, shelf_life = rnd.choices(ITEM_KINDS, ITEM_WEIGHTS)[0]
+        dims = [rnd.randint(*sides) for _ in range(3)]
+        expiry = (datetime.utcnow() + timedelta(days=rnd.randint(*shelf_life))).strftime('%Y-%m-%d') \
+            if shelf_life else ''
+        rows.append(f"{prefix}-{i:07d},{name} {i},{item_type},{rnd.uniform(*weights):.3f},"
+                    f"{dims[0]}x{dims[1]}x{dims[2]},{rnd.randint(1, 100)},{expiry},{usage_limit}")
+    return '\n'.join(rows) + '\n'
@@ -0,0 +1,311 @@
+"""Benchmark the backend API against a synthetic station inventory.
+
+    python benchmarks/run.py --items 10000 --containers 500
+    python benchmarks/run.py --backend mongod --uri mongodb://localhost:27017 --items 1000000
+
+Each scenario sends `--requests` requests through the Flask test client to
+an app built with create_app(), so the numbers cover routing, the handlers,
+the engines and the database driver but not the network or gunicorn.
+Results are written as JSON (see compare.py) tagged with the commit.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import inventory
+
+# Read-only scenarios first, so every one of them sees the generated data
+SCENARIOS = ['placement', 'search', 'logs', 'logs_grouped', 'export', 'simulation',
+             'retrieve', 'place', 'batch_placement', 'import']
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def connect(args):
+    if args.backend == 'mongomock':
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install -r benchmarks/requirements.txt")
+        return mongomock.MongoClient()
+    from pymongo import MongoClient
+    return MongoClient(args.uri, serverSelectionTimeoutMS=5000)
+
+
+def load(db, args):
+    """Fill a fresh database; returns the generated containers and items."""
+    for name in ('cargo_items', 'waste_items', 'activity_logs', 'containers', 'server_state',
+                 'return_plans', 'archived_items'):
+        db[name].drop()
+    station = inventory.containers(args.containers, args.seed)
+    cargo = inventory.items(args.items, station, args.seed)
+    db['containers'].insert_many([dict(container) for container in station])
+    for start in range(0, len(cargo), 10_000):
+        db['cargo_items'].insert_many([dict(item) for item in cargo[start:start + 10_000]])
+    db['cargo_items'].create_index("item_id")
+    if args.logs:
+        db['activity_logs'].insert_many(inventory.activity_logs(args.logs, cargo, args.seed))
+    return station, cargo
+
+
+class Scenarios:
+    """Request builders. Each returns (method, path, keyword arguments for
+    the test client); anything they need to look up happens before the
+    clock starts."""
+
+    def __init__(self, app_module, cargo, seed, batch_size, import_rows):
+        self.app = app_module
+        self.rnd = random.Random(seed + 10)
+        self.placed = [item for item in cargo if item["status"] == "placed"]
+        self.unplaced = [item for item in cargo if item["status"] != "placed"]
+        self.batch_size = batch_size
+        self.import_rows = import_rows
+        self.sequence = 0
+
+    def _spec(self):
+        _, item_type, sides, weights, _, _ = self.rnd.choices(inventory.ITEM_KINDS, inventory.ITEM_WEIGHTS)[0]
+        return {
+            "type": item_type,
+            "weight": round(self.rnd.uniform(*weights), 3),
+            "dimensions": {"width": self.rnd.randint(*sides), "depth": self.rnd.randint(*sides),
+                           "height": self.rnd.randint(*sides)},
+            "priority": self.rnd.choice(['high', 'medium', 'low']),
+        }
+
+    def placement(self):
+        return 'POST', '/api/placement', {"json": self._spec()}
+
+    def batch_placement(self):
+        self.sequence += 1
+        manifest = [dict(self._spec(), itemId=f"BATCH-{self.sequence:05d}-{i:04d}")
+                    for i in range(self.batch_size)]
+        return 'POST', '/api/placement/batch', {"json": {"items": manifest, "userId": "bench"}}
+
+    def search(self):
+        if self.rnd.random() < 0.5:
+            return 'GET', f'/api/search?itemId={self.rnd.choice(self.placed)["item_id"]}', {}
+        return 'GET', f'/api/search?itemName={self.rnd.choice(inventory.WORDS)}&limit=50', {}
+
+    def retrieve(self):
+        item = self.placed.pop(self.rnd.randrange(len(self.placed)))
+        return 'POST', '/api/retrieve', {"json": {"itemId": item["item_id"], "userId": "bench"}}
+
+    def place(self):
+        # Stow a loose item where the placement engine would put it
+        for _ in range(20):
+            item = self.rnd.choice(self.unplaced)
+            dims = [item["dimensions"][side] for side in ('width', 'depth', 'height')]
+            placements = self.app.get_placement_index().recommend(dims, item["weight"], 'medium', item["type"],
+                                                                  limit=1)
+            if placements:
+                placement = placements[0]
+                return 'POST', '/api/place', {"json": {"itemId": item["item_id"], "userId": "bench", "location": {
+                    "containerId": placement["containerId"], "position": placement["position"]}}}
+        return 'POST', '/api/place', {"json": {"itemId": item["item_id"], "location": {"module": "Unity"}}}
+
+    def import_(self):
+        self.sequence += 1
+        body = inventory.items_csv(self.import_rows, self.sequence, prefix=f'IMP{self.sequence:04d}')
+        return 'POST', '/api/import/items?sync=true', {
+            "data": {"file": (io.BytesIO(body.encode()), 'items.csv')}, "content_type": 'multipart/form-data'}
+
+    def export(self):
+        module = self.rnd.choice(inventory.MODULES + [None])
+        return 'GET', '/api/export/arrangement?format=csv' + (f'&module={module}' if module else ''), {}
+
+    def _log_window(self):
+        end = datetime.utcnow()
+        start = end - timedelta(days=self.rnd.choice([1, 7, 30]))
+        return f'startDate={start.isoformat()}Z&endDate={end.isoformat()}Z'
+
+    def logs(self):
+        return 'GET', f'/api/logs?{self._log_window()}&limit=100', {}
+
+    def logs_grouped(self):
+        return 'GET', f'/api/logs?{self._log_window()}&groupBy=actionType,day', {}
+
+    def simulation(self):
+        uses = [item["item_id"] for item in self.rnd.sample(self.placed, min(20, len(self.placed)))]
+        return 'POST', '/api/simulate/day', {"json": {"days": 30, "itemsToBeUsedPerDay": uses,
+                                                      "seed": self.rnd.randint(0, 10**6)}}
+
+
+def time_pack(args):
+    """Pack `--pack-items` synthetic items into empty copies of the station's
+    containers with PlacementIndex.pack, the engine behind batch placement,
+    outside any request."""
+    from placement import PlacementIndex
+
+    rnd = random.Random(args.seed + 20)
+    manifest = []
+    for i in range(args.pack_items):
+        _, item_type, sides, weights, _, _ = rnd.choices(inventory.ITEM_KINDS, inventory.ITEM_WEIGHTS)[0]
+        manifest.append({"item_id": f"PACK-{i:06d}", "dims": tuple(float(rnd.randint(*sides)) for _ in range(3)),
+                         "weight": rnd.uniform(*weights), "priority": rnd.choice(['high', 'medium', 'low']),
+                         "type": item_type})
+    index = PlacementIndex()
+    index.add_containers(inventory.containers(args.containers, args.seed))
+    started = time.perf_counter()
+    packed = index.pack(manifest)
+    seconds = time.perf_counter() - started
+    placed = sum(1 for _, placement in packed if placement is not None)
+    return {
+        "items": args.pack_items,
+        "containers": args.containers,
+        "placed": placed,
+        "seconds": round(seconds, 3),
+        "utilization": round(float(index.used_volume.sum() / index.capacity.sum()), 4),
+    }
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_scenario(test_client, build, count, warmup):
+    latencies = []
+    errors = 0
+    response_bytes = 0
+    started = time.perf_counter()
+    for i in range(warmup + count):
+        method, path, kwargs = build()
+        begin = time.perf_counter()
+        response = test_client.open(path, method=method, **kwargs)
+        # Streamed responses (export, batch placement) count until the last byte
+        body = response.get_data()
+        elapsed = time.perf_counter() - begin
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        response_bytes += len(body)
+        if response.status_code >= 400:
+            errors += 1
+    total = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": count,
+        "errors": errors,
+        "seconds": round(total, 4),
+        "throughput": round(count / sum(latencies), 2) if latencies else None,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 3),
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p90": round(percentile(latencies, 0.90) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        } if latencies else None,
+        "response_bytes": response_bytes,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=10_000)
+    parser.add_argument('--containers', type=int, default=None,
+                        help="Defaults to one container per 20 items")
+    parser.add_argument('--logs', type=int, default=None, help="Activity log entries; defaults to --items")
+    parser.add_argument('--backend', choices=['mongomock', 'mongod'], default='mongomock')
+    parser.add_argument('--uri', default='mongodb://localhost:27017')
+    parser.add_argument('--database', default='iss_cargo_bench')
+    parser.add_argument('--requests', type=int, default=200, help="Timed requests per scenario")
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--import-rows', type=int, default=500)
+    parser.add_argument('--pack-items', type=int, default=10_000,
+                        help="Items packed in one PlacementIndex.pack call into empty containers; 0 skips it")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Result file; defaults to benchmarks/results/<commit>-<time>.json")
+    args = parser.parse_args(argv)
+    args.containers = args.containers or max(1, args.items // 20)
+    args.logs = args.items if args.logs is None else args.logs
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    import app as app_module
+
+    mongo_client = connect(args)
+    began = time.perf_counter()
+    station, cargo = load(mongo_client[args.database], args)
+    load_seconds = time.perf_counter() - began
+    print(f"Loaded {len(cargo)} items in {len(station)} containers into {args.backend} in {load_seconds:.1f}s")
+
+    # No cross-worker checks: this is the only worker
+    app = app_module.create_app({"MONGO_DATABASE": args.database, "INVENTORY_SYNC_INTERVAL": 0},
+                                mongo_client=mongo_client)
+    test_client = app.test_client()
+    builders = Scenarios(app_module, cargo, args.seed, args.batch_size, args.import_rows)
+
+    # The first request loads the engines; timed separately
+    began = time.perf_counter()
+    for getter in (app_module.get_placement_index, app_module.get_search_index,
+                   app_module.get_retrieval_planner, app_module.get_waste_tracker):
+        getter()
+    engine_seconds = time.perf_counter() - began
+
+    results = {}
+    for name in scenarios:
+        build = getattr(builders, 'import_' if name == 'import' else name)
+        results[name] = run_scenario(test_client, build, args.requests, args.warmup)
+        latency = results[name]["latency_ms"]
+        print(f"{name:16} {results[name]['throughput']:>9} req/s  p50 {latency['p50']:>9} ms  "
+              f"p99 {latency['p99']:>9} ms  errors {results[name]['errors']}")
+    app_module.shutdown()
+
+    pack = None
+    if args.pack_items:
+        pack = time_pack(args)
+        print(f"{'pack':16} {pack['items']} items in {pack['seconds']}s, {pack['placed']} placed, "
+              f"{pack['utilization']:.1%} of capacity")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + 'Z',
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "items": args.items,
+        "containers": args.containers,
+        "logs": args.logs,
+        "seed": args.seed,
+        "requests": args.requests,
+        "load_seconds": round(load_seconds, 3),
+        "engine_load_seconds": round(engine_seconds, 3),
+        "scenarios": results,
+        "pack": pack,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{report['commit']}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Activity that changes what the UI shows; anything else recorded in the
+# activity log (recommendations, searches) is not pushed
+FEED_ACTIONS = {
+    'item_placement', 'item_retrieval', 'item_import', 'container_import',
+    'waste_undocking', 'simulation', 'simulation_commit',
+}
+
+# Shortest gap between two deliveries to one client; events arriving in
+# between are merged into one per action type
+COALESCE_WINDOW = 0.25
+
+# Comment lines sent to idle clients, so dropped connections are noticed
+HEARTBEAT_INTERVAL = 15.0
+
+MAX_SUBSCRIBERS = 100
+
+# Item ids carried by one merged event; the count keeps going past it
+MAX_EVENT_ITEMS = 100
+
+# How often the relay between workers writes this worker's events and reads
+# the others'; how far back it reads (well past any delay between a write
+# and the next read, so none is missed); and how long relayed events are
+# kept. Events queued while MongoDB is unreachable are capped.
+RELAY_INTERVAL = 0.5
+RELAY_WINDOW = 10.0
+RELAY_TTL_SECONDS = 300
+MAX_RELAY_QUEUE = 10_000
+
+# Entry fields a subscriber reads
+RELAY_FIELDS = ('action_type', 'item_id', 'location', 'details', 'mission_id', 'timestamp')
+
+
+class FeedFull(Exception):
+    pass
+
+
+class Subscriber:
+    """One client's pending events, at most one per action type.
+
+    A client that reads slower than events arrive is never sent a backlog:
+    whatever piles up while it is busy is merged into the pending event of
+    the same type, so its memory stays bounded and it receives the net
+    change when it next reads.
+    """
+
+    __slots__ = ('types', 'condition', 'pending', 'closed', 'last_delivery', 'coalesced')
+
+    def __init__(self, types=None):
+        self.types = set(types) if types else None
+        self.condition = threading.Condition()
+        self.pending = {}
+        self.closed = False
+        self.last_delivery = 0.0
+        self.coalesced = 0
+
+    def offer(self, sequence, entry):
+        action = entry['action_type']
+        if self.types is not None and action not in self.types:
+            return
+        with self.condition:
+            event = self.pending.get(action)
+            if event is None:
+                event = self.pending[action] = {"type": action, "count": 0, "itemIds": [], "truncated": False}
+            else:
+                self.coalesced += 1
+            event["count"] += 1
+            event["id"] = sequence
+            item_id = entry.get('item_id')
+            if item_id:
+                if len(event["itemIds"]) < MAX_EVENT_ITEMS:
+                    event["itemIds"].append(item_id)
+                else:
+                    event["truncated"] = True
+            for field, key in (('location', 'location'), ('details', 'details'), ('mission_id', 'missionId')):
+                if entry.get(field) is not None:
+                    event[key] = entry[field]
+            timestamp = entry.get('timestamp')
+            event["timestamp"] = timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+            self.condition.notify()
+
+    def take(self, timeout, window=COALESCE_WINDOW):
+        """Pending events once there are some, no sooner than `window` after
+        the previous delivery. [] on timeout, None once closed."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.pending or self.closed, timeout):
+                return []
+            wait = self.last_delivery + window - time.monotonic()
+            if wait > 0 and not self.closed:
+                # Let the burst that woke us finish arriving
+                self.condition.wait(wait)
+            if self.closed:
+                return None
+            events = sorted(self.pending.values(), key=lambda event: event["id"])
+            self.pending = {}
+            self.last_delivery = time.monotonic()
+            return events
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class ChangeFeed:
+    """Fans activity-log entries out to Server-Sent Events clients.
+
+    publish() is registered as a listener on the activity log, so every
+    change the log records is also pushed, in the order it was recorded.
+    It only hands the entry to each subscriber's pending events and never
+    blocks on a client; each client's response generator delivers at its
+    own pace.
+    """
+
+    def __init__(self, max_subscribers=MAX_SUBSCRIBERS, window=COALESCE_WINDOW,
+                 heartbeat=HEARTBEAT_INTERVAL):
+        self.max_subscribers = max_subscribers
+        self.window = window
+        self.heartbeat = heartbeat
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.closed = False
+        self.sequence = 0
+        self.published = 0
+        self.delivered = 0
+
+    def publish(self, entry):
+        if entry.get('action_type') not in FEED_ACTIONS:
+            return
+        with self.lock:
+            self.sequence += 1
+            self.published += 1
+            sequence = self.sequence
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(sequence, entry)
+
+    def subscribe(self, types=None):
+        with self.lock:
+            if self.closed:
+                raise FeedFull("The server is shutting down")
+            if len(self.subscribers) >= self.max_subscribers:
+                raise FeedFull(f"{len(self.subscribers)} clients are already connected")
+            subscriber = Subscriber(types)
+            self.subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        subscriber.close()
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def stream(self, subscriber):
+        """SSE text for one client until it disconnects or the feed closes."""
+        try:
+            yield f"retry: 3000\n: connected at sequence {self.sequence}\n\n"
+            while True:
+                events = subscriber.take(self.heartbeat, self.window)
+                if events is None:
+                    return
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                self.delivered += len(events)
+                yield ''.join(f"id: {event['id']}\nevent: {event['type']}\ndata: "
+                              f"{json.dumps(event, default=str)}\n\n" for event in events)
+        finally:
+            self.unsubscribe(subscriber)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def stats(self):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "coalesced": sum(subscriber.coalesced for subscriber in subscribers),
+        }
+
+
+class FeedRelay:
+    """Carries change feed entries between server workers through a MongoDB
+    collection, so an /api/events client sees changes made on any worker.
+
+    send() is registered on the activity log next to ChangeFeed.publish and
+    only queues the entry. A background thread, started on first use,
+    writes the queue every `interval` and publishes into the local feed the
+    entries other workers wrote in the last `window` seconds that it has not
+    published yet, in the order they were written. Events from another
+    worker therefore reach a client up to one interval later than those
+    from its own.
+    """
+
+    def __init__(self, collection, feed, interval=RELAY_INTERVAL, window=RELAY_WINDOW):
+        self.collection = collection
+        self.feed = feed
+        self.interval = interval
+        self.window = window
+        self.worker = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.outbox = []
+        self.received = None
+        self.dropped = 0
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def send(self, entry):
+        if entry.get('action_type') not in FEED_ACTIONS:
+            return
+        relayed = {field: entry[field] for field in RELAY_FIELDS if entry.get(field) is not None}
+        relayed["worker"] = self.worker
+        with self.lock:
+            if len(self.outbox) < MAX_RELAY_QUEUE:
+                self.outbox.append(relayed)
+            else:
+                self.dropped += 1
+        self.start()
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None or self.stopping.is_set():
+                return
+            self.thread = threading.Thread(target=self._run, name='feed-relay', daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+        self._write()
+
+    def _run(self):
+        try:
+            self.collection.create_index("at", expireAfterSeconds=RELAY_TTL_SECONDS)
+        except PyMongoError as e:
+            logger.warning(f"Could not set up the change feed relay index: {e}")
+        while not self.stopping.wait(self.interval):
+            try:
+                self._write()
+                self._read()
+            except Exception as e:
+                # The relay outlives a bad batch or an unreachable database
+                logger.error(f"Change feed relay failed: {e}")
+
+    def _write(self):
+        with self.lock:
+            entries, self.outbox = self.outbox, []
+        if not entries:
+            return
+        now = datetime.utcnow()
+        for entry in entries:
+            entry["at"] = now
+        try:
+            self.collection.insert_many(entries, ordered=False)
+        except PyMongoError as e:
+            logger.warning(f"Could not relay {len(entries)} change feed events: {e}")
+
+    def _read(self):
+        # Entries are read by the time in their ObjectId rather than after
+        # the last one seen, since ids minted by different workers in the
+        # same second do not arrive in order. Nobody is listening while the
+        # feed has no subscribers; the first read after that only notes what
+        # is already there, so new clients are not sent past events.
+        if not self.feed.subscribers:
+            self.received = None
+            return
+        since = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=self.window))
+        entries = self.collection.find({"_id": {"$gte": since}, "worker": {"$ne": self.worker}}).sort("_id", 1)
+        received = set()
+        for entry in entries:
+            received.add(entry["_id"])
+            if self.received is not None and entry["_id"] not in self.received:
+                self.feed.publish(entry)
+        self.received = received
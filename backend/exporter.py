@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+
+# Rows formatted per chunk of the response, and per Parquet row group; this
+# bounds the rows held as text at once regardless of result size.
+EXPORT_BATCH = 2000
+
+EXPORT_COLUMNS = [
+    'item_id', 'name', 'type', 'module', 'section', 'container_id',
+    'start_width', 'start_depth', 'start_height', 'end_width', 'end_depth', 'end_height',
+    'weight_kg', 'priority', 'expiry_date', 'status',
+]
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/json', 'json'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def flatten(item):
+    position = item.get('position') or {}
+    start = position.get('start') or {}
+    end = position.get('end') or {}
+    expiry = item.get('expiry_date')
+    return {
+        'item_id': item.get('item_id'),
+        'name': item.get('name'),
+        'type': item.get('type'),
+        'module': item.get('module'),
+        'section': item.get('section'),
+        'container_id': item.get('container_id'),
+        'start_width': start.get('width'),
+        'start_depth': start.get('depth'),
+        'start_height': start.get('height'),
+        'end_width': end.get('width'),
+        'end_depth': end.get('depth'),
+        'end_height': end.get('height'),
+        'weight_kg': item.get('weight'),
+        'priority': None if item.get('priority') is None else str(item.get('priority')),
+        'expiry_date': expiry.strftime('%Y-%m-%d') if hasattr(expiry, 'strftime') else expiry,
+        'status': item.get('status'),
+    }
+
+
+def _batches(cursor, size=EXPORT_BATCH):
+    batch = []
+    for item in cursor:
+        batch.append(flatten(item))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(cursor):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for batch in _batches(cursor):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_jsonl(cursor):
+    for batch in _batches(cursor):
+        yield ''.join(json.dumps(row) + '\n' for row in batch)
+
+
+def stream_json(cursor):
+    yield '['
+    first = True
+    for batch in _batches(cursor):
+        chunk = ','.join(json.dumps(row) for row in batch)
+        yield chunk if first else ',' + chunk
+        first = False
+    yield ']'
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last
+    drain, so a Parquet writer can be streamed row group by row group."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_parquet(cursor):
+    # Polars can only write a complete frame, so row groups are appended
+    # through pyarrow (the Arrow backend polars itself uses). Batches are
+    # built column by column, as pinned pyarrow 6 has no Table.from_pylist.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (column, pa.float64() if column.startswith(('start_', 'end_')) or column == 'weight_kg' else pa.string())
+        for column in EXPORT_COLUMNS
+    ])
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for batch in _batches(cursor):
+            writer.write_table(pa.Table.from_pydict(
+                {field.name: [row.get(field.name) for row in batch] for field in schema}, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'json': stream_json,
+    'jsonl': stream_jsonl,
+    'parquet': stream_parquet,
+}
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# How often a worker asks whether another worker has changed the inventory
+SYNC_INTERVAL = 1.0
+
+# Item and container ids one change entry lists; a larger change asks the
+# other workers to reload everything instead
+MAX_CHANGE_IDS = 20_000
+
+# How long a worker waits for the entry of a generation it has seen counted
+# (its writer bumps the counter, then inserts the entry) before giving up
+# and reloading everything, and how long entries are kept
+ENTRY_GRACE = 5.0
+ENTRY_TTL_SECONDS = 3600
+
+
+class Changes:
+    """What other workers changed since this one last looked: item and
+    container ids to re-read, or `reload` when that is not known."""
+
+    __slots__ = ('items', 'containers', 'reload')
+
+    def __init__(self, items=(), containers=(), reload=False):
+        self.items = set(items)
+        self.containers = set(containers)
+        self.reload = reload
+
+
+class InventoryGeneration:
+    """Counter in MongoDB that every server worker bumps after changing the
+    inventory, with an entry per generation listing what changed, so the
+    others can bring their in-memory engines up to date.
+
+    Handlers that change items or containers run under `lock` and call
+    bump() with the ids they wrote. poll() is checked before requests, reads
+    the counter at most once per `interval` and returns the Changes made
+    by other workers since this one last looked; the caller re-reads those
+    items and containers (under `lock`, so no change is half applied). A
+    bump without ids, a change too large to list, or an entry that went
+    missing (expired, or never written) asks for a full reload. With a
+    single worker the counter only ever moves by this worker's own bumps
+    and nothing is re-read.
+    """
+
+    def __init__(self, collection, interval=SYNC_INTERVAL, entries=None):
+        self.collection = collection
+        self.entries = entries
+        self.interval = interval
+        self.lock = threading.RLock()
+        self.worker = uuid.uuid4().hex
+        self.seen = None
+        self.checked = 0.0
+        self.waiting_since = None
+        self.indexed = False
+
+    def bump(self, items=None, containers=None):
+        if self.collection is None or not self.interval:
+            return
+        try:
+            state = self.collection.find_one_and_update(
+                {"_id": "inventory"}, {"$inc": {"generation": 1}},
+                upsert=True, return_document=ReturnDocument.AFTER,
+            )
+            if self.entries is not None:
+                self._ensure_index()
+                entry = {"_id": state["generation"], "worker": self.worker, "at": datetime.utcnow()}
+                listed = items is not None or containers is not None
+                items, containers = list(items or ()), list(containers or ())
+                if not listed or len(items) + len(containers) > MAX_CHANGE_IDS:
+                    entry["reload"] = True
+                else:
+                    entry.update(items=items, containers=containers)
+                self.entries.insert_one(entry)
+        except PyMongoError as e:
+            logger.warning(f"Could not publish inventory change: {e}")
+            return
+        with self.lock:
+            # Anything other than our own step means another worker wrote in
+            # between; leave `seen` behind so the next poll picks it up
+            if self.seen is not None and state["generation"] == self.seen + 1:
+                self.seen = state["generation"]
+
+    def poll(self):
+        if self.collection is None or not self.interval:
+            return None
+        now = time.monotonic()
+        if now - self.checked < self.interval:
+            return None
+        self.checked = now
+        try:
+            state = self.collection.find_one({"_id": "inventory"}) or {"generation": 0}
+        except PyMongoError as e:
+            logger.warning(f"Could not check for inventory changes: {e}")
+            return None
+        with self.lock:
+            if self.seen is None:
+                # Engines load lazily from the current data, so whatever the
+                # counter says now is what they will reflect
+                self.seen = state["generation"]
+                return None
+            if state["generation"] == self.seen:
+                return None
+            if self.entries is None:
+                self.seen = state["generation"]
+                return Changes(reload=True)
+            try:
+                entries = list(self.entries.find({"_id": {"$gt": self.seen, "$lte": state["generation"]}})
+                               .sort("_id", 1))
+            except PyMongoError as e:
+                logger.warning(f"Could not read inventory changes: {e}")
+                return None
+            changes = Changes()
+            for entry in entries:
+                if entry["_id"] != self.seen + 1:
+                    break
+                self.seen = entry["_id"]
+                if entry["worker"] == self.worker:
+                    continue
+                changes.reload = changes.reload or entry.get("reload", False)
+                changes.items.update(entry.get("items", ()))
+                changes.containers.update(entry.get("containers", ()))
+            if self.seen < state["generation"]:
+                # The next entry is not there yet; past the grace period it
+                # never will be, and everything is reloaded
+                self.waiting_since = self.waiting_since or now
+                if now - self.waiting_since >= ENTRY_GRACE:
+                    self.seen = state["generation"]
+                    changes.reload = True
+            if self.seen == state["generation"]:
+                self.waiting_since = None
+            if changes.reload or changes.items or changes.containers:
+                return changes
+            return None
+
+    def _ensure_index(self):
+        if self.indexed:
+            return
+        self.indexed = True
+        try:
+            self.entries.create_index("at", expireAfterSeconds=ENTRY_TTL_SECONDS)
+        except PyMongoError as e:
+            logger.warning(f"Could not set up the inventory change index: {e}")
@@ -0,0 +1,47 @@
+# Production server: gunicorn -c gunicorn.conf.py "app:create_app()"
+#
+# Each worker is a separate process with its own app, connection pool and
+# in-memory engines; workers keep their engines in step through the
+# inventory change log in MongoDB and pass change feed events to each other
+# the same way. Threaded workers, because /api/events holds a connection
+# open per client.
+import os
+import signal
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 16))
+
+# The app is built in each worker, after the fork, so no worker inherits
+# another's MongoDB sockets or background threads
+preload_app = False
+
+# Requests in flight get this long to finish after SIGTERM
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('WORKER_TIMEOUT', 120))
+keepalive = 5
+
+
+def post_worker_init(worker):
+    # Event streams never finish on their own; close them as soon as the
+    # worker is told to stop so that only ordinary requests are waited for
+    import app
+
+    stop = signal.getsignal(signal.SIGTERM)
+
+    def drain_and_stop(signum, frame):
+        app.drain()
+        stop(signum, frame)
+
+    signal.signal(signal.SIGTERM, drain_and_stop)
+
+    # Simulation workers come up now, not on the first what-if request
+    if app.process_pool is not None:
+        app.process_pool.start()
+
+
+def worker_exit(server, worker):
+    import app
+
+    app.shutdown()
@@ -0,0 +1,231 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+
+# Rows parsed, validated and written per round trip; bounds memory to one
+# chunk regardless of the upload size.
+CHUNK_ROWS = 5000
+
+# Rejected rows reported back in full; the rest are only counted.
+MAX_REPORTED_ERRORS = 50
+
+LEVELS = ['high', 'medium', 'low']
+
+# CSV column each document field comes from, where the names differ
+ITEM_COLUMNS = {
+    "weight": 'weight_kg',
+    "dimensions": 'dimensions_cm',
+    "module": 'current_module',
+    "section": 'current_section',
+}
+CONTAINER_COLUMNS = {
+    "width": 'width_cm',
+    "depth": 'depth_cm',
+    "height": 'height_cm',
+    "max_weight": 'max_weight_kg',
+}
+
+DIMENSIONS_PATTERN = r'^\s*([0-9.]+)\s*[xX]\s*([0-9.]+)\s*[xX]\s*([0-9.]+)\s*$'
+
+
+def _text(chunk, column):
+    return chunk[column].astype(str).str.strip() if column in chunk else pd.Series('', index=chunk.index)
+
+
+def _present(chunk, document, columns):
+    # Only fields whose column is in the file and holds a value, so an
+    # upsert never blanks out what a narrower file did not mention
+    return {
+        field: value for field, value in document.items()
+        if columns.get(field, field) in chunk and value is not None and value != ''
+    }
+
+
+def _reject(errors, mask, reason):
+    # First failing reason wins for each row
+    fresh = mask & errors.isna()
+    errors[fresh] = reason
+
+
+def coerce_items(chunk):
+    """Validate and convert a chunk of item rows with column-wise checks.
+    Returns (documents, errors) where errors is a Series of reasons indexed
+    like the chunk, NaN for valid rows."""
+    errors = pd.Series(np.nan, index=chunk.index, dtype=object)
+    item_id = _text(chunk, 'item_id')
+    weight = pd.to_numeric(_text(chunk, 'weight_kg'), errors='coerce')
+    dims = _text(chunk, 'dimensions_cm').str.extract(DIMENSIONS_PATTERN).apply(pd.to_numeric, errors='coerce')
+    priority = _text(chunk, 'priority').str.lower()
+    numeric_priority = pd.to_numeric(priority, errors='coerce')
+    access = _text(chunk, 'access_frequency').str.lower()
+    hazardous = _text(chunk, 'hazardous').str.lower()
+    expiry_text = _text(chunk, 'expiry_date')
+    expiry = pd.to_datetime(expiry_text, format='%Y-%m-%d', errors='coerce')
+    name = _text(chunk, 'name')
+    usage_text = _text(chunk, 'usage_limit')
+    usage_limit = pd.to_numeric(usage_text, errors='coerce')
+
+    _reject(errors, item_id == '', "item_id is required")
+    _reject(errors, ~(weight > 0), "weight_kg must be a positive number")
+    _reject(errors, ~(dims > 0).all(axis=1), "dimensions_cm must be LxWxH in positive centimetres")
+    _reject(errors, ~(priority.isin(LEVELS) | numeric_priority.between(0, 100) | (priority == '')),
+            "priority must be high, medium, low or 0-100")
+    _reject(errors, ~(access.isin(LEVELS) | (access == '')), "access_frequency must be high, medium or low")
+    _reject(errors, ~hazardous.isin(['yes', 'no', '']), "hazardous must be yes or no")
+    _reject(errors, (expiry_text != '') & expiry.isna(), "expiry_date must be YYYY-MM-DD")
+    _reject(errors, (usage_text != '') & ~(usage_limit > 0), "usage_limit must be a positive number")
+
+    valid = errors.isna()
+    documents = pd.DataFrame({
+        "item_id": item_id,
+        "name": name,
+        "type": _text(chunk, 'type').str.lower(),
+        "weight": weight,
+        "depth": dims[0],
+        "width": dims[1],
+        "height": dims[2],
+        "priority": numeric_priority.where(numeric_priority.notna(), priority),
+        "access_frequency": access,
+        "module": _text(chunk, 'current_module'),
+        "section": _text(chunk, 'current_section'),
+        "hazardous": hazardous == 'yes',
+        "expiry_date": expiry,
+        "usage_limit": usage_limit,
+    })[valid]
+    records = []
+    for row in documents.itertuples(index=False):
+        records.append(_present(chunk, {
+            "item_id": row.item_id,
+            "name": row.name,
+            "type": row.type,
+            "weight": float(row.weight),
+            "dimensions": {"width": float(row.width), "depth": float(row.depth), "height": float(row.height)},
+            "priority": row.priority if isinstance(row.priority, str) else int(row.priority),
+            "access_frequency": row.access_frequency,
+            "module": row.module,
+            "section": row.section,
+            "hazardous": bool(row.hazardous),
+            "expiry_date": None if pd.isna(row.expiry_date) else row.expiry_date.to_pydatetime(),
+            "usage_limit": None if pd.isna(row.usage_limit) else int(row.usage_limit),
+        }, ITEM_COLUMNS))
+    return records, errors
+
+
+def item_defaults(document):
+    """Fields a new item gets when its row leaves them out."""
+    return {"name": document["item_id"], "priority": "medium", "access_frequency": "medium", "hazardous": False}
+
+
+def coerce_containers(chunk):
+    """Container counterpart of coerce_items."""
+    errors = pd.Series(np.nan, index=chunk.index, dtype=object)
+    container_id = _text(chunk, 'container_id')
+    sizes = pd.DataFrame({
+        column: pd.to_numeric(_text(chunk, column), errors='coerce')
+        for column in ['width_cm', 'depth_cm', 'height_cm']
+    })
+    max_weight_text = _text(chunk, 'max_weight_kg')
+    max_weight = pd.to_numeric(max_weight_text, errors='coerce')
+
+    _reject(errors, container_id == '', "container_id is required")
+    _reject(errors, _text(chunk, 'module') == '', "module is required")
+    _reject(errors, ~(sizes > 0).all(axis=1), "width_cm, depth_cm and height_cm must be positive numbers")
+    _reject(errors, (max_weight_text != '') & ~(max_weight > 0), "max_weight_kg must be a positive number")
+
+    valid = errors.isna()
+    records = [
+        _present(chunk, {
+            "container_id": row.container_id,
+            "module": row.module,
+            "section": row.section,
+            "width": float(row.width_cm),
+            "depth": float(row.depth_cm),
+            "height": float(row.height_cm),
+            "max_weight": None if pd.isna(row.max_weight) else float(row.max_weight),
+        }, CONTAINER_COLUMNS)
+        for row in pd.DataFrame({
+            "container_id": container_id,
+            "module": _text(chunk, 'module'),
+            "section": _text(chunk, 'section'),
+            "width_cm": sizes['width_cm'],
+            "depth_cm": sizes['depth_cm'],
+            "height_cm": sizes['height_cm'],
+            "max_weight": max_weight,
+        })[valid].itertuples(index=False)
+    ]
+    return records, errors
+
+
+# key: upsert key, required: columns the header must contain,
+# coerce: chunk validator returning (documents, errors), defaults: fields
+# set only when a row creates its document
+Schema = namedtuple('Schema', ['key', 'required', 'coerce', 'defaults'])
+
+ITEM_SCHEMA = Schema('item_id', ['item_id', 'weight_kg', 'dimensions_cm'], coerce_items, item_defaults)
+CONTAINER_SCHEMA = Schema('container_id', ['container_id', 'module', 'width_cm', 'depth_cm', 'height_cm'],
+                          coerce_containers, lambda document: {})
+
+
+def import_csv(stream, collection, schema, on_chunk=None, progress=None, cancelled=None,
+               chunk_rows=CHUNK_ROWS):
+    """Stream a CSV upload into `collection` chunk by chunk.
+
+    Each chunk is validated by the schema's coerce function and written with
+    a single unordered bulk_write of upserts keyed on the schema key. Raises
+    ValueError if the header lacks a required column. Only the columns in
+    the file are set; a row that creates its document also gets the
+    schema's defaults. `on_chunk` receives the accepted documents of every
+    chunk (the $set part) after they are written, for keeping in-memory
+    indexes current, and `progress` the running stats. Setting the
+    `cancelled` event stops the import between chunks; chunks already
+    written stay written. Returns the true processed/added/updated/rejected
+    counts.
+    """
+    started = time.perf_counter()
+    stats = {"processed": 0, "added": 0, "updated": 0, "rejected": 0, "errors": [], "cancelled": False}
+    reader = pd.read_csv(stream, chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                         skipinitialspace=True)
+    for chunk in reader:
+        if cancelled is not None and cancelled.is_set():
+            stats["cancelled"] = True
+            break
+        chunk.columns = [str(column).strip().lower() for column in chunk.columns]
+        missing = [column for column in schema.required if column not in chunk.columns]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+        key = schema.key
+        documents, errors = schema.coerce(chunk)
+        # Within a chunk the last row for a key wins, so unordered upserts
+        # never race on the same document
+        documents = list({document[key]: document for document in documents}.values())
+
+        rejected = errors.dropna()
+        stats["processed"] += len(chunk)
+        stats["rejected"] += len(rejected)
+        for row, reason in rejected.items():
+            if len(stats["errors"]) >= MAX_REPORTED_ERRORS:
+                break
+            # +2: header line and 1-based numbering
+            stats["errors"].append({"row": int(row) + 2, "error": reason})
+
+        if documents and collection is not None:
+            inserts = [{field: value for field, value in schema.defaults(document).items() if field not in document}
+                       for document in documents]
+            result = collection.bulk_write([
+                UpdateOne({key: document[key]}, {"$set": document, "$setOnInsert": insert} if insert
+                          else {"$set": document}, upsert=True)
+                for document, insert in zip(documents, inserts)
+            ], ordered=False)
+            stats["added"] += result.upserted_count
+            stats["updated"] += result.matched_count
+        if documents and on_chunk is not None:
+            on_chunk(documents)
+        if progress is not None:
+            stats["seconds"] = round(time.perf_counter() - started, 3)
+            progress(stats)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
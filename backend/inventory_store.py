@@ -0,0 +1,170 @@
+import sys
+import threading
+
+from placement import position_to_box
+
+# Item attributes held in memory, named as in the cargo documents. The
+# dimensions and position sub-documents are kept as tuples instead.
+ITEM_FIELDS = ('item_id', 'name', 'type', 'weight', 'priority', 'access_frequency', 'hazardous', 'damaged',
+               'expiry_date', 'usage_limit', 'uses_remaining', 'status', 'waste_reason', 'waste_date',
+               'module', 'section', 'container_id')
+
+STORE_PROJECTION = dict({field: 1 for field in ITEM_FIELDS}, _id=0, dimensions=1, position=1)
+
+# Values repeated across many items; each distinct one is held once
+SHARED_FIELDS = {'type', 'access_frequency', 'status', 'module', 'section', 'container_id', 'waste_reason'}
+
+SIDES = ('width', 'depth', 'height')
+
+# Documents per cursor round trip while loading
+LOAD_BATCH = 5000
+
+
+def _dims(dimensions):
+    if not isinstance(dimensions, dict):
+        return None
+    return tuple(float(dimensions.get(side) or 0) for side in SIDES)
+
+
+def _box(position):
+    try:
+        return position_to_box(position)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class Item:
+    """One cargo item: slots rather than a dict per document, with the
+    dimensions and the (start, end) position box as flat tuples."""
+
+    __slots__ = ITEM_FIELDS + ('dims', 'box')
+
+    def __init__(self, item_id):
+        for field in self.__slots__:
+            setattr(self, field, None)
+        self.item_id = item_id
+
+    def update(self, fields):
+        # $set semantics; None unsets, fields the store doesn't keep are ignored
+        for field, value in fields.items():
+            if field == 'dimensions':
+                self.dims = _dims(value)
+            elif field == 'position':
+                self.box = _box(value) if value is not None else None
+            elif field in SHARED_FIELDS:
+                setattr(self, field, sys.intern(value) if isinstance(value, str) else value)
+            elif field in ITEM_FIELDS and field != 'item_id':
+                setattr(self, field, value)
+
+    def document(self):
+        """The item as a cargo document, leaving out unset fields."""
+        document = {field: getattr(self, field) for field in ITEM_FIELDS if getattr(self, field) is not None}
+        if self.dims is not None:
+            document["dimensions"] = dict(zip(SIDES, self.dims))
+        if self.box is not None:
+            document["position"] = {"start": dict(zip(SIDES, self.box[:3])), "end": dict(zip(SIDES, self.box[3:]))}
+        return document
+
+
+class InventoryStore:
+    """Every cargo item and container, held once per process.
+
+    Loaded with one projected, batched read of each collection. Handlers
+    that write items or containers to MongoDB apply the same change here,
+    so the placement, search and waste engines are built from it and
+    search, export, simulation and return planning read it instead of
+    querying. Documents handed out are new dicts the caller may keep.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.items = {}
+        self.containers = {}
+
+    @classmethod
+    def from_collections(cls, containers_collection, cargo_collection):
+        store = cls()
+        if containers_collection is not None:
+            store.add_containers(containers_collection.find({}, {"_id": 0}).batch_size(LOAD_BATCH))
+        if cargo_collection is not None:
+            store.put(cargo_collection.find({}, STORE_PROJECTION).batch_size(LOAD_BATCH))
+        return store
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item_id):
+        return item_id in self.items
+
+    def get(self, item_id):
+        return self.items.get(item_id)
+
+    def documents(self, item_ids):
+        """Documents of the known items among `item_ids`, in that order."""
+        with self.lock:
+            return [self.items[item_id].document() for item_id in item_ids if item_id in self.items]
+
+    def snapshot(self, exclude_statuses=()):
+        """The items (records, not copies) whose status is not excluded."""
+        with self.lock:
+            if not exclude_statuses:
+                return list(self.items.values())
+            return [item for item in self.items.values() if item.status not in exclude_statuses]
+
+    def placed(self):
+        """(item_id, container_id, box, weight) of every stowed item."""
+        with self.lock:
+            return [(item.item_id, item.container_id, item.box, item.weight or 0)
+                    for item in self.items.values() if item.container_id is not None and item.box is not None]
+
+    def in_module(self, module=None):
+        """Items assigned to `module` (or to any module), ordered as the
+        export lists them."""
+        with self.lock:
+            rows = [item for item in self.items.values()
+                    if item.module is not None and (module is None or item.module == module)]
+        rows.sort(key=lambda item: (item.module, item.item_id))
+        return rows
+
+    def module_counts(self):
+        counts = {}
+        with self.lock:
+            for item in self.items.values():
+                if item.module is not None:
+                    counts[item.module] = counts.get(item.module, 0) + 1
+        return counts
+
+    def container_documents(self):
+        with self.lock:
+            return [dict(container) for container in self.containers.values()]
+
+    def put(self, documents):
+        """Upsert documents as an update with $set would."""
+        with self.lock:
+            for document in documents:
+                item_id = document.get('item_id')
+                if not item_id:
+                    continue
+                item = self.items.get(item_id)
+                if item is None:
+                    item = self.items[item_id] = Item(item_id)
+                item.update(document)
+
+    def set(self, item_ids, fields, skip_statuses=()):
+        """Update the known items among `item_ids`, except those in one of
+        `skip_statuses`."""
+        with self.lock:
+            for item_id in item_ids:
+                item = self.items.get(item_id)
+                if item is not None and item.status not in skip_statuses:
+                    item.update(fields)
+
+    def remove(self, item_ids):
+        with self.lock:
+            for item_id in item_ids:
+                self.items.pop(item_id, None)
+
+    def add_containers(self, containers):
+        with self.lock:
+            for container in containers:
+                self.containers.setdefault(container['container_id'], {}).update(container)
@@ -0,0 +1,139 @@
+import logging
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept around for polling before the oldest are forgotten
+MAX_FINISHED_JOBS = 200
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    __slots__ = ('id', 'kind', 'status', 'created_at', 'started_at', 'finished_at',
+                 'progress', 'result', 'error', 'cancel_event', 'work', 'cleanup')
+
+    def __init__(self, kind, work, cleanup=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self.work = work
+        self.cleanup = cleanup
+
+    def snapshot(self):
+        return {
+            "jobId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "createdAt": self.created_at.isoformat(),
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """Fixed pool of worker threads fed from a bounded queue.
+
+    `work` callables receive their Job, may publish progress through
+    job.progress and should check job.cancel_event between units of work.
+    Submitting to a full queue raises JobQueueFull rather than blocking the
+    request thread. `cleanup` runs once the job is finished with, including
+    when it is cancelled before it starts.
+    """
+
+    def __init__(self, workers=1, queue_size=8):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, kind, work, cleanup=None):
+        job = Job(kind, work, cleanup)
+        with self.lock:
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFull(f"{self.queue.maxsize} jobs are already waiting")
+            self.jobs[job.id] = job
+            self._forget_finished()
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_event.set()
+        if job.status == 'queued':
+            job.status = 'cancelled'
+            job.finished_at = datetime.utcnow()
+        return job
+
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def shutdown(self, timeout=None):
+        for job in list(self.jobs.values()):
+            job.cancel_event.set()
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            if job.status == 'cancelled':
+                self._release(job)
+                continue
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            try:
+                job.result = job.work(job)
+                job.status = 'cancelled' if job.cancel_event.is_set() else 'completed'
+            except Exception as e:
+                logger.error(f"Job {job.id} ({job.kind}) failed: {e}")
+                job.status = 'failed'
+                job.error = str(e)
+            finally:
+                job.finished_at = datetime.utcnow()
+                self._release(job)
+
+    def _release(self, job):
+        job.work = None
+        if job.cleanup is not None:
+            try:
+                job.cleanup()
+            except Exception as e:
+                logger.error(f"Cleanup for job {job.id} failed: {e}")
+            job.cleanup = None
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
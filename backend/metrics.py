@@ -0,0 +1,184 @@
+import bisect
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import defaultdict
+
+from pymongo import monitoring
+
+# Histogram bucket upper bounds: seconds for latencies, bytes for sizes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+# Functions listed in a ?profile=1 breakdown
+PROFILE_LINES = 40
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, Prometheus style."""
+
+    __slots__ = ('name', 'help', 'labels', 'buckets', 'series')
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket (+Inf last), sum]
+        self.series = {}
+
+    def observe(self, values, amount):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, amount)] += 1
+        series[1] += amount
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for values, (counts, total) in sorted(self.series.items()):
+            labels = _labels(self.labels, values)
+            running = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                running += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {running}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {running}")
+
+
+class Counter:
+    __slots__ = ('name', 'help', 'labels', 'series')
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = defaultdict(int)
+
+    def inc(self, values, amount=1):
+        self.series[values] += amount
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} counter")
+        for values, total in sorted(self.series.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, values)}}} {total}")
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command the driver sends; registered on the MongoClient."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.metrics.observe_mongo(event.command_name, event.duration_micros / 1e6, False)
+
+    def failed(self, event):
+        self.metrics.observe_mongo(event.command_name, event.duration_micros / 1e6, True)
+
+
+class Metrics:
+    """Request and MongoDB instrumentation, exposed in Prometheus text format.
+
+    Each request costs two clock reads and a few dictionary updates under
+    one lock. Latency runs until the handler returns its response, so for
+    streamed responses it is the time to the first byte. Gauges (queue
+    depths and the like) are read from their owners when /metrics is
+    scraped rather than tracked here. Counts are per process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.callbacks = {}
+        self.request_latency = Histogram(
+            'http_request_duration_seconds', 'Time spent in the handler, by route.',
+            ('method', 'route'), LATENCY_BUCKETS)
+        self.requests = Counter('http_requests_total', 'Requests by route and status.',
+                                ('method', 'route', 'status'))
+        self.request_size = Histogram('http_request_size_bytes', 'Request body sizes, by route.',
+                                      ('method', 'route'), SIZE_BUCKETS)
+        self.response_size = Histogram('http_response_size_bytes',
+                                       'Response body sizes, by route (streamed responses excluded).',
+                                       ('method', 'route'), SIZE_BUCKETS)
+        self.mongo_latency = Histogram('mongodb_command_duration_seconds',
+                                       'MongoDB command round trips, by command.', ('command',), LATENCY_BUCKETS)
+        self.mongo_failures = Counter('mongodb_command_failures_total', 'Failed MongoDB commands.', ('command',))
+        self.mongo_listener = MongoCommandListener(self)
+
+    def add_callback(self, name, help, read, kind='gauge'):
+        """A metric owned elsewhere. `read` is called on every scrape and
+        returns {((label, value), ...): number}, with () for no labels."""
+        self.callbacks[name] = (help, read, kind)
+
+    def request_started(self):
+        with self.lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def request_finished(self, method, route, status, started, request_bytes, response_bytes):
+        elapsed = time.perf_counter() - started
+        values = (method, route)
+        with self.lock:
+            self.request_latency.observe(values, elapsed)
+            self.requests.inc((method, route, status))
+            if request_bytes is not None:
+                self.request_size.observe(values, request_bytes)
+            if response_bytes is not None:
+                self.response_size.observe(values, response_bytes)
+
+    def request_ended(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def observe_mongo(self, command, seconds, failed):
+        with self.lock:
+            self.mongo_latency.observe((command,), seconds)
+            if failed:
+                self.mongo_failures.inc((command,))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines.append("# HELP http_requests_in_flight Requests being handled right now.")
+            lines.append("# TYPE http_requests_in_flight gauge")
+            lines.append(f"http_requests_in_flight {self.in_flight}")
+            for metric in (self.requests, self.request_latency, self.request_size, self.response_size,
+                           self.mongo_latency, self.mongo_failures):
+                metric.render(lines)
+        for name, (help, read, kind) in sorted(self.callbacks.items()):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(read().items()):
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels)
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+def start_profile():
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile
+
+
+def profile_report(profile):
+    """Top functions by cumulative time, as pstats prints them."""
+    profile.disable()
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return out.getvalue()
@@ -0,0 +1,41 @@
+import hashlib
+import json
+import threading
+
+
+class OccupancyCache:
+    """Serialized /api/occupancy bodies and their ETags.
+
+    A body is built from the placement index's running totals at most once
+    per index revision and query, and the ETag is a hash of the body, so it
+    is the same from every server process. Polling clients that send it
+    back in If-None-Match get a 304 without anything being rebuilt.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.revision = None
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, index, module=None, with_containers=False):
+        """(body, etag) for the query against the index's current state."""
+        key = (module, with_containers)
+        revision = index.revision
+        with self.lock:
+            if self.index is not index or self.revision != revision:
+                self.index, self.revision, self.entries = index, revision, {}
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is None:
+            body = json.dumps(index.occupancy(module, with_containers), separators=(',', ':')).encode()
+            entry = (body, hashlib.sha1(body).hexdigest())
+            with self.lock:
+                if self.index is index and self.revision == revision:
+                    self.entries[key] = entry
+        return entry
@@ -0,0 +1,747 @@
+import threading
+from collections import defaultdict
+from itertools import permutations
+
+import numpy as np
+
+# Containers are addressed with the open face at depth == 0, so an item's
+# accessibility is governed by how deep (y) it sits inside its container.
+# Box layout in the occupancy arrays: [x0, y0, z0, x1, y1, z1]
+# (x = width, y = depth, z = height, all in cm).
+
+PRIORITY_LEVELS = {'high': 90, 'medium': 50, 'low': 10}
+
+TYPE_MODULE_PREFERENCES = {
+    'food': 'Unity',
+    'medical': 'Columbus',
+    'scientific': 'Destiny',
+}
+HEAVY_ITEM_MODULE = 'Tranquility'
+HEAVY_ITEM_WEIGHT = 10
+
+# Upper bound on containers that get an exact extreme-point evaluation per
+# recommendation; the vectorized pre-filter ranks the rest out.
+MAX_EXACT_EVALUATIONS = 64
+
+# Candidate positions (extreme point and orientation) checked for overlaps
+# at a time in find_position, and at most per container and item
+OVERLAP_CHUNK = 64
+MAX_CANDIDATES = 2048
+
+# Boxes in a container at which its pre-score is halved
+CROWDED_ITEMS = 50
+
+# Failed exact checks after which a container is closed for the rest of a
+# batch packing run.
+MAX_BATCH_MISSES = 3
+
+# Modules whose non-empty containers are packed below this percentage get a
+# consolidation suggestion in the occupancy report
+LOW_EFFICIENCY = 50.0
+
+
+def normalize_priority(priority):
+    if isinstance(priority, str):
+        return PRIORITY_LEVELS.get(priority.lower(), PRIORITY_LEVELS['medium'])
+    try:
+        return max(0, min(100, int(priority)))
+    except (TypeError, ValueError):
+        return PRIORITY_LEVELS['medium']
+
+
+def parse_dimensions(dimensions):
+    if isinstance(dimensions, dict):
+        values = (
+            dimensions.get('width', 0),
+            dimensions.get('depth', dimensions.get('length', 0)),
+            dimensions.get('height', 0),
+        )
+    elif isinstance(dimensions, str):
+        values = dimensions.lower().split('x')
+    else:
+        values = dimensions
+    dims = tuple(float(v) for v in values)
+    if len(dims) != 3 or min(dims) <= 0:
+        raise ValueError("Dimensions must be three positive numbers")
+    return dims
+
+
+def _orientations(dims):
+    return sorted(set(permutations(dims)))
+
+
+def _all3(mask):
+    # np.all(mask, axis=-1) over x, y and z: on arrays this small the
+    # generic reduction costs several times the comparisons feeding it
+    return mask[..., 0] & mask[..., 1] & mask[..., 2]
+
+
+def _box_to_position(box):
+    return {
+        "start": {"width": float(box[0]), "depth": float(box[1]), "height": float(box[2])},
+        "end": {"width": float(box[3]), "depth": float(box[4]), "height": float(box[5])},
+    }
+
+
+def position_to_box(position):
+    start = position['start']
+    end = position['end']
+    return (
+        float(start['width']), float(start['depth']), float(start['height']),
+        float(end['width']), float(end['depth']), float(end['height']),
+    )
+
+
+class ContainerSpace:
+    """Occupancy of a single container, kept as an array of placed boxes plus
+    the extreme points those boxes expose."""
+
+    __slots__ = ('container_id', 'module', 'section', 'size', 'max_weight',
+                 'boxes', 'item_ids', 'weights', 'count', 'points', 'reach', 'back_reach',
+                 'used_volume', 'used_weight', 'version')
+
+    def __init__(self, container_id, module, section, width, depth, height, max_weight=None):
+        self.container_id = container_id
+        self.module = module
+        self.section = section
+        self.size = np.array([width, depth, height], dtype=np.float64)
+        self.max_weight = float(max_weight) if max_weight else float('inf')
+        self.boxes = np.empty((8, 6), dtype=np.float64)
+        self.item_ids = []
+        self.weights = []
+        self.count = 0
+        self.points = np.zeros((1, 3), dtype=np.float64)
+        # Free run from each extreme point along +x, +y and +z to the nearest
+        # box or wall. No item longer than that on any axis can start there,
+        # so most candidates are discarded without an overlap check.
+        self.reach = self.size[None, :].copy()
+        # Free run from the back wall forward to the nearest box whose
+        # face-on footprint contains each point's (x, z), for the
+        # back-aligned positions offered to low-priority items
+        self.back_reach = self.size[1:2].copy()
+        self.used_volume = 0.0
+        self.used_weight = 0.0
+        # Bumped on every add/remove so per-container caches built on top of
+        # the occupancy (e.g. retrieval graphs) know when they are stale.
+        self.version = 0
+
+    @property
+    def volume(self):
+        return float(np.prod(self.size))
+
+    def occupied(self):
+        return self.boxes[:self.count]
+
+    def copy(self):
+        """Independent copy, e.g. for trying out moves off the live index."""
+        clone = ContainerSpace.__new__(ContainerSpace)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        clone.size = self.size.copy()
+        clone.boxes = self.boxes.copy()
+        clone.item_ids = list(self.item_ids)
+        clone.weights = list(self.weights)
+        clone.points = self.points.copy()
+        clone.reach = self.reach.copy()
+        clone.back_reach = self.back_reach.copy()
+        return clone
+
+    def fits(self, start, dims):
+        start = np.asarray(start, dtype=np.float64)
+        end = start + np.asarray(dims, dtype=np.float64)
+        if np.any(start < 0) or np.any(end > self.size):
+            return False
+        boxes = self.occupied()
+        if not len(boxes):
+            return True
+        overlap = _all3((boxes[:, :3] < end) & (boxes[:, 3:] > start))
+        return not overlap.any()
+
+    def find_position(self, dims, priority):
+        """Best start corner for an item of the given dimensions, ranking every
+        orientation at every extreme point with room for it and checking the
+        best ones for overlaps a chunk at a time. Returns (box,
+        accessibility) or None if the item does not fit."""
+        orientations = np.array(_orientations(dims), dtype=np.float64)
+        # Points without room for the item's shortest side in every
+        # direction cannot take it in any orientation
+        usable = _all3(self.reach >= min(dims))
+        points = self.points[usable]
+        # A point takes an orientation that its free run covers on every
+        # axis (the run ends at the walls, so it fits inside as well).
+        # Tested per axis on a points x orientations grid, so only the
+        # positions that pass are ever built.
+        reach = self.reach[usable]
+        fit = ((orientations[None, :, 0] <= reach[:, 0, None]) & (orientations[None, :, 1] <= reach[:, 1, None])
+               & (orientations[None, :, 2] <= reach[:, 2, None]))
+        point_rows, orientation_rows = np.nonzero(fit)
+        starts = points[point_rows]
+        sizes = orientations[orientation_rows]
+        # Low-priority items are also offered back-aligned variants so they
+        # don't claim the front of the container, one per distinct (x, z) of
+        # those points; their depth is bounded by the free run forward from
+        # the back wall instead.
+        if priority < PRIORITY_LEVELS['medium'] and len(points):
+            corners, first = np.unique(points[:, 0] + 1j * points[:, 2], return_index=True)
+            back_reach = self.back_reach[usable][first]
+            fit = ((orientations[None, :, 1] <= back_reach[:, None])
+                   & (corners.real[:, None] + orientations[None, :, 0] <= self.size[0])
+                   & (corners.imag[:, None] + orientations[None, :, 2] <= self.size[2]))
+            corner_rows, orientation_rows = np.nonzero(fit)
+            back_sizes = orientations[orientation_rows]
+            back = np.column_stack([corners.real[corner_rows], self.size[1] - back_sizes[:, 1],
+                                    corners.imag[corner_rows]])
+            starts = np.vstack([starts, back])
+            sizes = np.vstack([sizes, back_sizes])
+        ends = starts + sizes
+        if not len(starts):
+            return None
+
+        depth_ratio = starts[:, 1] / self.size[1] if self.size[1] else np.zeros(len(starts))
+        # High priority wants the open face, low priority the back wall.
+        weight = (priority - PRIORITY_LEVELS['medium']) / 50.0
+        accessibility = 1.0 - depth_ratio if weight >= 0 else depth_ratio
+        # Tie-break towards compact placements (low z, then low x).
+        compactness = (starts[:, 2] / self.size[2] + starts[:, 0] / self.size[0]) / 2
+        rank = -accessibility
+        # The first chunk usually has a free position, so at first only the
+        # candidates that can make it are sorted (those ranked no lower than
+        # its last); their order is the start of the full one
+        head = np.arange(len(rank))
+        if len(rank) > OVERLAP_CHUNK:
+            head = np.flatnonzero(rank <= np.partition(rank, OVERLAP_CHUNK - 1)[OVERLAP_CHUNK - 1])
+        order = head[np.lexsort((compactness[head], rank[head]))]
+
+        # Candidates are checked for overlaps best first, a chunk at a time
+        # and only against the boxes near the chunk, so a crowded container
+        # costs a few chunks rather than every point against every box. Only
+        # the MAX_CANDIDATES best are tried; a container whose best
+        # positions are all taken counts as full for this item.
+        boxes = self.occupied()
+        for first in range(0, min(len(rank), MAX_CANDIDATES), OVERLAP_CHUNK):
+            if len(order) < min(first + OVERLAP_CHUNK, len(rank)):
+                order = np.lexsort((compactness, rank))
+            chunk = order[first:first + OVERLAP_CHUNK]
+            if len(boxes):
+                low, high = starts[chunk].min(axis=0), ends[chunk].max(axis=0)
+                near = boxes[_all3((boxes[:, :3] < high) & (boxes[:, 3:] > low))]
+                if len(near):
+                    overlap = _all3(
+                        (near[None, :, :3] < ends[chunk][:, None, :]) & (near[None, :, 3:] > starts[chunk][:, None, :])
+                    ).any(axis=1)
+                    chunk = chunk[~overlap]
+            if len(chunk):
+                best = chunk[0]
+                return np.concatenate([starts[best], ends[best]]), float(accessibility[best])
+        return None
+
+    def add(self, item_id, box, weight=0.0):
+        if self.count == len(self.boxes):
+            grown = np.empty((len(self.boxes) * 2, 6), dtype=np.float64)
+            grown[:self.count] = self.boxes[:self.count]
+            self.boxes = grown
+        box = np.asarray(box, dtype=np.float64)
+        self.boxes[self.count] = box
+        self.item_ids.append(item_id)
+        self.weights.append(float(weight or 0))
+        self.count += 1
+        self.used_volume += float(np.prod(box[3:] - box[:3]))
+        self.used_weight += float(weight or 0)
+        self.version += 1
+        self._add_points(box)
+
+    def remove(self, item_id):
+        try:
+            index = self.item_ids.index(item_id)
+        except ValueError:
+            return None
+        box = self.boxes[index].copy()
+        weight = self.weights[index]
+        last = self.count - 1
+        self.boxes[index] = self.boxes[last]
+        self.item_ids[index] = self.item_ids[last]
+        self.weights[index] = self.weights[last]
+        self.item_ids.pop()
+        self.weights.pop()
+        self.count = last
+        self.used_volume -= float(np.prod(box[3:] - box[:3]))
+        self.used_weight -= weight
+        self.version += 1
+        self._rebuild_points()
+        return box
+
+    def box_of(self, item_id):
+        try:
+            return self.boxes[self.item_ids.index(item_id)].copy()
+        except ValueError:
+            return None
+
+    def _add_points(self, box):
+        # Only the new box can cover existing points, so the full prune is
+        # reserved for the new corners; likewise only the new box can cut
+        # the reach of the points that remain.
+        points = self.points
+        kept = ~_all3((box[:3] <= points) & (box[3:] > points))
+        new_points = self._prune_points(self._corner_points(box[None, :]))
+        new_points = new_points[~_all3(new_points[:, None, :] == points[None, :, :]).any(axis=1)]
+        reach = np.minimum(self.reach[kept], self._reach(points[kept], box[None, :]))
+        back_reach = np.minimum(self.back_reach[kept], self._back_reach(points[kept], box[None, :]))
+        self.points = np.vstack([points[kept], new_points])
+        self.reach = np.vstack([reach, self._reach(new_points)])
+        self.back_reach = np.concatenate([back_reach, self._back_reach(new_points)])
+
+    def _rebuild_points(self):
+        points = np.vstack([np.zeros((1, 3)), self._corner_points(self.occupied())])
+        self.points = self._prune_points(np.unique(points, axis=0))
+        self.reach = self._reach(self.points)
+        self.back_reach = self._back_reach(self.points)
+
+    def _back_reach(self, points, boxes=None):
+        # Distance from the back wall to the nearest box whose face-on
+        # footprint contains each (x, z)
+        boxes = self.occupied() if boxes is None else boxes
+        if not len(boxes) or not len(points):
+            return np.full(len(points), self.size[1])
+        hit = (
+            (boxes[None, :, 0] <= points[:, None, 0]) & (boxes[None, :, 3] > points[:, None, 0])
+            & (boxes[None, :, 2] <= points[:, None, 2]) & (boxes[None, :, 5] > points[:, None, 2])
+        )
+        return self.size[1] - np.where(hit, boxes[None, :, 4], 0.0).max(axis=1)
+
+    def _reach(self, points, boxes=None):
+        # Distance along each axis from the points to the first box whose
+        # cross-section contains the ray, or else to the wall
+        reach = self.size - points
+        boxes = self.occupied() if boxes is None else boxes
+        if not len(boxes) or not len(points):
+            return reach
+        inside = (boxes[None, :, :3] <= points[:, None, :]) & (boxes[None, :, 3:] > points[:, None, :])
+        # The ray along an axis hits a box that spans the point on the other
+        # two axes and starts at or beyond it on this one
+        across = inside[:, :, [1, 2, 0]] & inside[:, :, [2, 0, 1]]
+        ahead = boxes[None, :, :3] - points[:, None, :]
+        distance = np.where(across & (ahead >= 0), ahead, np.inf).min(axis=1)
+        return np.minimum(reach, distance)
+
+    def _corner_points(self, boxes):
+        # Each box exposes three corners, and each corner is projected
+        # towards the origin along the two axes it was not offset on, so new
+        # items are pushed flush against whatever they would rest on.
+        corners = np.vstack([
+            np.column_stack([boxes[:, 3], boxes[:, 1], boxes[:, 2]]),
+            np.column_stack([boxes[:, 0], boxes[:, 4], boxes[:, 2]]),
+            np.column_stack([boxes[:, 0], boxes[:, 1], boxes[:, 5]]),
+        ])
+        count = len(boxes)
+        offset_axes = np.repeat(np.arange(3), count)
+        points = np.repeat(corners, 2, axis=0)
+        axes = np.column_stack([(offset_axes + 1) % 3, (offset_axes + 2) % 3]).ravel()
+        return self._project(points, axes)
+
+    def _project(self, points, axes):
+        # Slide each point towards the origin along its own axis until it
+        # meets the face of a box or the container wall.
+        rows = np.arange(len(points))
+        projected = points.copy()
+        projected[rows, axes] = 0
+        boxes = self.occupied()
+        if not len(boxes):
+            return projected
+        covers = (boxes[None, :, :3] <= points[:, None, :]) & (boxes[None, :, 3:] > points[:, None, :])
+        covers[rows, :, axes] = True
+        faces = boxes[:, 3 + axes].T
+        stops = np.where(_all3(covers) & (faces <= points[rows, axes][:, None]), faces, 0.0)
+        projected[rows, axes] = stops.max(axis=1)
+        return projected
+
+    def _prune_points(self, points):
+        inside = _all3(points < self.size)
+        boxes = self.occupied()
+        if len(boxes):
+            covered = _all3(
+                (boxes[None, :, :3] <= points[:, None, :]) & (boxes[None, :, 3:] > points[:, None, :])
+            ).any(axis=1)
+            inside &= ~covered
+        return points[inside]
+
+
+class PlacementIndex:
+    """Free-space index over every container on the station.
+
+    Container-level capacity (free volume, free mass, sorted inner
+    dimensions) lives in parallel NumPy arrays so a recommendation can reject
+    thousands of containers in one vectorized pass before running the exact
+    extreme-point check on the few that remain.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.containers = []
+        self.container_lookup = {}
+        self.item_locations = {}
+        self.sorted_sizes = np.empty((0, 3), dtype=np.float64)
+        self.capacity = np.empty(0, dtype=np.float64)
+        self.used_volume = np.empty(0, dtype=np.float64)
+        self.max_weight = np.empty(0, dtype=np.float64)
+        self.used_weight = np.empty(0, dtype=np.float64)
+        self.modules = np.empty(0, dtype=object)
+        self.item_counts = np.empty(0, dtype=np.int64)
+        # Materialized per-module totals, adjusted by the difference on every
+        # place/remove so occupancy reports never rescan containers or items.
+        # `revision` moves whenever any of them do.
+        self.module_usage = defaultdict(lambda: {"containers": 0, "capacity": 0.0, "used_volume": 0.0,
+                                                 "used_weight": 0.0, "items": 0})
+        self.revision = 0
+
+    @classmethod
+    def from_store(cls, store):
+        index = cls()
+        index.add_containers(store.container_documents())
+        for item_id, container_id, box, weight in store.placed():
+            try:
+                index.place(item_id, container_id, box, weight)
+            except (KeyError, TypeError, ValueError):
+                continue
+        return index
+
+    def add_container(self, container):
+        return self.add_containers([container])[0]
+
+    def add_containers(self, containers):
+        with self.lock:
+            spaces = []
+            added = []
+            for container in containers:
+                container_id = container['container_id']
+                if container_id in self.container_lookup:
+                    spaces.append(self.containers[self.container_lookup[container_id]])
+                    continue
+                space = ContainerSpace(
+                    container_id,
+                    container.get('module'),
+                    container.get('section'),
+                    float(container['width']),
+                    float(container['depth']),
+                    float(container['height']),
+                    container.get('max_weight'),
+                )
+                self.container_lookup[container_id] = len(self.containers)
+                self.containers.append(space)
+                spaces.append(space)
+                added.append(space)
+            if added:
+                self.sorted_sizes = np.vstack([self.sorted_sizes, [np.sort(space.size) for space in added]])
+                self.capacity = np.append(self.capacity, [space.volume for space in added])
+                self.used_volume = np.append(self.used_volume, np.zeros(len(added)))
+                self.max_weight = np.append(self.max_weight, [space.max_weight for space in added])
+                self.used_weight = np.append(self.used_weight, np.zeros(len(added)))
+                self.modules = np.append(self.modules, np.array([space.module for space in added], dtype=object))
+                self.item_counts = np.append(self.item_counts, np.zeros(len(added), dtype=np.int64))
+                for space in added:
+                    usage = self.module_usage[space.module]
+                    usage["containers"] += 1
+                    usage["capacity"] += space.volume
+                self.revision += 1
+            return spaces
+
+    def get(self, container_id):
+        index = self.container_lookup.get(container_id)
+        return self.containers[index] if index is not None else None
+
+    def locate(self, item_id):
+        with self.lock:
+            index = self.item_locations.get(item_id)
+            if index is None:
+                return None, None
+            space = self.containers[index]
+            return space, space.box_of(item_id)
+
+    def place(self, item_id, container_id, box, weight=0.0):
+        with self.lock:
+            index = self.container_lookup.get(container_id)
+            if index is None:
+                raise KeyError(f"Unknown container {container_id}")
+            if item_id in self.item_locations:
+                self.remove(item_id)
+            space = self.containers[index]
+            space.add(item_id, box, weight)
+            self.item_locations[item_id] = index
+            self.module_usage[space.module]["items"] += 1
+            self._sync(index)
+            return space
+
+    def remove(self, item_id):
+        with self.lock:
+            index = self.item_locations.pop(item_id, None)
+            if index is None:
+                return None
+            space = self.containers[index]
+            space.remove(item_id)
+            self.module_usage[space.module]["items"] -= 1
+            self._sync(index)
+            return space
+
+    def occupancy(self, module=None, with_containers=False, warning=85.0):
+        """Utilization per module and station-wide, from the running totals.
+
+        Occupancy is used volume over capacity. Efficiency is how densely
+        the containers that hold anything are packed, i.e. used volume over
+        the capacity of non-empty containers. Modules at or above `warning`
+        percent occupancy are flagged, and suggestions point at crowded and
+        loosely packed modules. Per-container rows (all containers, or the
+        module's) are added with `with_containers`.
+        """
+        with self.lock:
+            in_use = self.used_volume > 0
+            modules = []
+            for name, usage in sorted(self.module_usage.items(), key=lambda entry: str(entry[0])):
+                if module and name != module:
+                    continue
+                members = self.modules == name
+                used_capacity = float(self.capacity[members & in_use].sum())
+                occupancy = _percent(usage["used_volume"], usage["capacity"])
+                modules.append({
+                    "name": name,
+                    "id": str(name).lower(),
+                    "occupancy": occupancy,
+                    "efficiency": _percent(usage["used_volume"], used_capacity),
+                    "warning": occupancy >= warning,
+                    "containers": usage["containers"],
+                    "items": usage["items"],
+                    "capacity": round(usage["capacity"], 1),
+                    "usedVolume": round(usage["used_volume"], 1),
+                    "usedWeight": round(usage["used_weight"], 3),
+                })
+            suggestions = []
+            roomiest = min(modules, key=lambda entry: entry["occupancy"], default=None)
+            for entry in modules:
+                if entry["warning"] and roomiest is not None and roomiest is not entry:
+                    suggestions.append(f"{entry['name']} is {entry['occupancy']:g}% full; move low-priority items "
+                                       f"to {roomiest['name']} ({roomiest['occupancy']:g}% full)")
+                elif entry["items"] and entry["efficiency"] < LOW_EFFICIENCY:
+                    suggestions.append(f"Consolidate the partly filled containers in {entry['name']} "
+                                       f"(packed to {entry['efficiency']:g}%)")
+            capacity = sum(usage["capacity"] for usage in self.module_usage.values())
+            used = sum(usage["used_volume"] for usage in self.module_usage.values())
+            report = {
+                "modules": modules,
+                "overall": {
+                    "occupancy": _percent(used, capacity),
+                    "efficiency": _percent(used, float(self.capacity[in_use].sum())),
+                    "warnings": sum(1 for entry in modules if entry["warning"]),
+                    "containers": len(self.containers),
+                    "items": len(self.item_locations),
+                },
+                "suggestions": suggestions,
+            }
+            if with_containers:
+                rows = np.flatnonzero(self.modules == module) if module else np.arange(len(self.containers))
+                report["containers"] = [{
+                    "containerId": self.containers[row].container_id,
+                    "module": self.containers[row].module,
+                    "section": self.containers[row].section,
+                    "occupancy": _percent(self.used_volume[row], self.capacity[row]),
+                    "items": self.containers[row].count,
+                    "usedWeight": round(float(self.used_weight[row]), 3),
+                    "maxWeight": None if np.isinf(self.max_weight[row]) else float(self.max_weight[row]),
+                } for row in rows]
+            return report
+
+    def _sync(self, index):
+        # Copy a container's totals into the arrays, moving its module's
+        # counters by the change
+        space = self.containers[index]
+        usage = self.module_usage[space.module]
+        usage["used_volume"] += space.used_volume - self.used_volume[index]
+        usage["used_weight"] += space.used_weight - self.used_weight[index]
+        self.used_volume[index] = space.used_volume
+        self.used_weight[index] = space.used_weight
+        self.item_counts[index] = space.count
+        self.revision += 1
+
+    def candidate_containers(self, dims, weight, preferred_module=None, limit=MAX_EXACT_EVALUATIONS,
+                             exclude=None):
+        """The `limit` containers that can possibly hold the item, best
+        pre-score first."""
+        if not self.containers:
+            return np.empty(0, dtype=np.int64)
+        item_volume = float(np.prod(dims))
+        free_volume = self.capacity - self.used_volume
+        mask = (
+            (free_volume >= item_volume)
+            & (self.max_weight - self.used_weight >= weight)
+            & _all3(self.sorted_sizes >= np.sort(dims))
+        )
+        if exclude is not None:
+            mask &= ~exclude
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return candidates
+        # Best fit: prefer the containers the item fills most, with the
+        # item-type module preference as a bonus. Containers already holding
+        # many boxes are discounted, so small items spread over a module's
+        # large containers instead of piling into one (every placement and
+        # retrieval there gets slower with each box).
+        pre_score = item_volume / free_volume[candidates] / (1.0 + self.item_counts[candidates] / CROWDED_ITEMS)
+        if preferred_module:
+            pre_score = pre_score + (self.modules[candidates] == preferred_module)
+        if len(candidates) > limit:
+            top = np.argpartition(-pre_score, limit - 1)[:limit]
+            candidates, pre_score = candidates[top], pre_score[top]
+        return candidates[np.argsort(-pre_score, kind='stable')]
+
+    def recommend(self, dims, weight=0.0, priority='medium', item_type=None, limit=3):
+        """Ranked placements for an item. Each entry carries the container,
+        the exact start/end position and a 0-100 fit score."""
+        dims = parse_dimensions(dims)
+        weight = float(weight or 0)
+        priority = normalize_priority(priority)
+        preferred_module = _preferred_module(item_type, weight)
+
+        results = []
+        with self.lock:
+            for placement in self._placements(dims, weight, priority, preferred_module):
+                results.append(placement)
+                if len(results) >= limit:
+                    break
+        results.sort(key=lambda r: r['fitScore'], reverse=True)
+        return results
+
+    def pack(self, items):
+        """First-fit-decreasing over a whole manifest.
+
+        `items` are dicts with item_id, dims (a parsed 3-tuple), weight,
+        priority and type. Items are packed largest first (higher priority
+        first among equal volumes) and each one is committed to the index
+        before the next is considered. Returns (item, placement) pairs in
+        packing order, with placement None for items that did not fit.
+        """
+        if not items:
+            return []
+        dims = np.array([item['dims'] for item in items], dtype=np.float64)
+        priorities = np.array([normalize_priority(item.get('priority')) for item in items])
+        order = np.lexsort((-priorities, -np.prod(dims, axis=1)))
+
+        packed = []
+        with self.lock:
+            # Containers that keep rejecting items are closed for the rest
+            # of the manifest, as in classic next-fit bin packing.
+            misses = np.zeros(len(self.containers), dtype=np.int32)
+            blocked = self._no_blocks()
+            for position in order:
+                item = items[position]
+                weight = float(item.get('weight') or 0)
+                preferred_module = _preferred_module(item.get('type'), weight)
+                placement = next(self._placements(item['dims'], weight, priorities[position],
+                                                  preferred_module, misses, blocked), None)
+                if placement is not None:
+                    self.place(item['item_id'], placement['containerId'],
+                               position_to_box(placement['position']), weight)
+                packed.append((item, placement))
+        return packed
+
+    def snapshot(self):
+        """Independent copy of the index, so a long search such as packing a
+        manifest can run on it without holding the lock; commit() then
+        applies the result here."""
+        with self.lock:
+            clone = PlacementIndex()
+            clone.containers = [space.copy() for space in self.containers]
+            clone.container_lookup = dict(self.container_lookup)
+            clone.item_locations = dict(self.item_locations)
+            for name in ('sorted_sizes', 'capacity', 'used_volume', 'max_weight', 'used_weight', 'modules',
+                         'item_counts'):
+                setattr(clone, name, getattr(self, name).copy())
+            for module, usage in self.module_usage.items():
+                clone.module_usage[module] = dict(usage)
+            clone.revision = self.revision
+            return clone
+
+    def commit(self, packed):
+        """Apply the (item, placement) pairs that pack() returned on a
+        snapshot. Placements still free here are taken as they are; one
+        whose container or spot has been taken since is searched for again
+        on this index. Returns the pairs as committed."""
+        committed = []
+        with self.lock:
+            blocked = self._no_blocks()
+            for item, placement in packed:
+                weight = float(item.get('weight') or 0)
+                if placement is not None and not self._still_free(placement, item['dims'], weight):
+                    preferred_module = _preferred_module(item.get('type'), weight)
+                    placement = next(self._placements(item['dims'], weight, normalize_priority(item.get('priority')),
+                                                      preferred_module, blocked=blocked), None)
+                if placement is not None:
+                    self.place(item['item_id'], placement['containerId'],
+                               position_to_box(placement['position']), weight)
+                committed.append((item, placement))
+        return committed
+
+    def _still_free(self, placement, dims, weight):
+        index = self.container_lookup.get(placement['containerId'])
+        if index is None or self.max_weight[index] - self.used_weight[index] < weight:
+            return False
+        box = np.array(position_to_box(placement['position']))
+        return self.containers[index].fits(box[:3], box[3:] - box[:3])
+
+    def _no_blocks(self):
+        # One row per container: the sorted dimensions of the last item that
+        # failed the exact check there, and 0 if that item was low priority
+        # (it was also offered back-aligned positions) else 1. A later item
+        # whose row is >= that one in every column cannot fit either, as long
+        # as nothing is removed, so the container is skipped for it. Kept
+        # per request or manifest, never on the index.
+        return np.full((len(self.containers), 4), np.inf)
+
+    def _placements(self, dims, weight, priority, preferred_module, misses=None, blocked=None):
+        # Exact checks run on the best-ranked batch of candidates; containers
+        # that fail are blocked for this shape, so if nothing in the batch
+        # fits the next batch ranks further down the list.
+        if blocked is None:
+            blocked = self._no_blocks()
+        key = np.append(np.sort(dims), 0.0 if priority < PRIORITY_LEVELS['medium'] else 1.0)
+        found = False
+        while not found:
+            exclude = np.all(key >= blocked, axis=1)
+            if misses is not None:
+                exclude |= misses >= MAX_BATCH_MISSES
+            candidates = self.candidate_containers(dims, weight, preferred_module, exclude=exclude)
+            if not len(candidates):
+                return
+            for index in candidates:
+                placement = self._evaluate(self.containers[index], dims, priority, preferred_module)
+                if placement is None:
+                    blocked[index] = key
+                    if misses is not None:
+                        misses[index] += 1
+                    continue
+                found = True
+                yield placement
+
+    def _evaluate(self, space, dims, priority, preferred_module):
+        found = space.find_position(dims, priority)
+        if found is None:
+            return None
+        box, accessibility = found
+        fill = (space.used_volume + float(np.prod(dims))) / space.volume
+        score = 0.45 * fill + 0.35 * accessibility
+        if preferred_module and space.module == preferred_module:
+            score += 0.2
+        return {
+            "containerId": space.container_id,
+            "module": space.module,
+            "section": space.section,
+            "position": _box_to_position(box),
+            "fitScore": round(score, 4),
+        }
+
+
+def _percent(part, whole):
+    return round(100.0 * float(part) / float(whole), 1) if whole else 0.0
+
+
+def _preferred_module(item_type, weight):
+    preferred_module = TYPE_MODULE_PREFERENCES.get(item_type)
+    if preferred_module is None and weight > HEAVY_ITEM_WEIGHT:
+        preferred_module = HEAVY_ITEM_MODULE
+    return preferred_module
@@ -0,0 +1,75 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Modules the fork server imports once, so each new worker process starts
+# with them loaded
+PRELOAD = ['simulation', 'rearrange']
+
+
+class ProcessPool:
+    """Long-lived worker processes shared by the requests that fan CPU-bound
+    work out (what-if simulations, rearrangement chains).
+
+    The server process runs many threads, and a child forked from one of
+    them can inherit a lock that another thread was holding. Workers are
+    therefore started by a fork server, a single-threaded process launched
+    once, or spawned where there is none; they are started on first use
+    and kept until shutdown(). Each call sends its shared data (pickled)
+    once to every process it uses.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max(1, int(max_workers))
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+                if context.get_start_method() == 'forkserver':
+                    context.set_forkserver_preload(PRELOAD)
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self.executor
+
+    def start(self):
+        """Start the worker processes now rather than on first use."""
+        executor = self._executor()
+        # One job per worker, since processes are added as jobs wait
+        for future in [executor.submit(int) for _ in range(self.max_workers)]:
+            future.result()
+
+    def map(self, function, shared, jobs, workers=None):
+        """[function(shared, job) for job in jobs], with the jobs dealt out
+        round-robin to at most `workers` processes."""
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        workers = min(workers or self.max_workers, self.max_workers, len(jobs))
+        executor = self._executor()
+        try:
+            futures = [executor.submit(_run_all, function, shared, jobs[first::workers])
+                       for first in range(workers)]
+            results = [None] * len(jobs)
+            for first, future in enumerate(futures):
+                results[first::workers] = future.result()
+            return results
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start afresh next time
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = None
+            raise
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_all(function, shared, jobs):
+    return [function(shared, job) for job in jobs]
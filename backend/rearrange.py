@@ -0,0 +1,301 @@
+import math
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from placement import PRIORITY_LEVELS, normalize_priority, _box_to_position
+
+# Seconds a rearrangement may search, and the moves one plan may contain
+DEFAULT_BUDGET = 2.0
+MAX_BUDGET = 30.0
+DEFAULT_MAX_MOVES = 50
+MAX_MOVES = 500
+
+# Score terms, lower is better. Fragmentation is the capacity-weighted
+# squared free fraction of every non-empty container, so emptying a
+# container or filling one up pays off more than spreading items evenly.
+# Access is each item's depth into its container, counted against
+# high-priority items and in favour of low-priority ones.
+FRAGMENTATION_WEIGHT = 1.0
+ACCESS_WEIGHT = 0.5
+
+# Share of proposals that re-seat an item in its own container, and how
+# many containers of its module are drawn as targets for the others
+SAME_CONTAINER_SHARE = 0.3
+TARGET_SAMPLES = 4
+
+# Proposals scored (not applied) to pick the starting temperature; the
+# temperature then cools geometrically to this fraction of it by the end
+# of the budget
+WARMUP_PROPOSALS = 30
+FINAL_TEMPERATURE_RATIO = 1e-3
+
+
+def _container_cost(capacity, used_volume, count):
+    if not count or not capacity:
+        return 0.0
+    return capacity * (1.0 - used_volume / capacity) ** 2
+
+
+def _reachable(space, box):
+    # Nothing sits in front of the box with an overlapping footprint on the
+    # open face, so it can be pulled out (or pushed in) straight
+    boxes = space.occupied()
+    if not len(boxes):
+        return True
+    in_front = boxes[:, 4] <= box[1]
+    overlap_x = (boxes[:, 0] < box[3]) & (boxes[:, 3] > box[0])
+    overlap_z = (boxes[:, 2] < box[5]) & (boxes[:, 5] > box[2])
+    return not np.any(in_front & overlap_x & overlap_z)
+
+
+class Layout:
+    """Private copy of some containers' occupancy that moves are tried on.
+
+    A move takes one item that can be pulled out of its container and puts
+    it at an extreme point of the same container or of another one in the
+    same module that it can be pushed into. Its score change depends only
+    on the two containers' totals and the item's old and new depth, so
+    scoring a candidate costs the same however large the station is.
+    """
+
+    def __init__(self, spaces, priorities):
+        self.spaces = spaces
+        self.lookup = {space.container_id: i for i, space in enumerate(spaces)}
+        self.by_module = defaultdict(list)
+        self.locations = {}
+        for i, space in enumerate(spaces):
+            self.by_module[space.module].append(i)
+            for item_id in space.item_ids:
+                self.locations[item_id] = i
+        self.items = list(self.locations)
+        self.priorities = {item_id: normalize_priority(priorities.get(item_id)) for item_id in self.items}
+        self.capacity = sum(space.volume for space in spaces)
+
+    @classmethod
+    def from_index(cls, index, store, module=None):
+        """Copy of the index's containers (those in `module`, if given), with
+        item priorities from the inventory store."""
+        with index.lock:
+            spaces = [space.copy() for space in index.containers if module is None or space.module == module]
+        priorities = {}
+        for space in spaces:
+            for item_id in space.item_ids:
+                item = store.get(item_id)
+                priorities[item_id] = item.priority if item is not None else None
+        return cls(spaces, priorities)
+
+    def _access(self, item_id, space, box):
+        weight = (self.priorities[item_id] - PRIORITY_LEVELS['medium']) / 50.0
+        return weight * box[1] / space.size[1] if space.size[1] else 0.0
+
+    def score(self):
+        if not self.items:
+            return 0.0
+        fragmentation = sum(_container_cost(space.volume, space.used_volume, space.count) for space in self.spaces)
+        access = sum(self._access(item_id, space, box)
+                     for space in self.spaces for item_id, box in zip(space.item_ids, space.occupied()))
+        return (FRAGMENTATION_WEIGHT * fragmentation / self.capacity
+                + ACCESS_WEIGHT * access / len(self.items))
+
+    def delta(self, item_id, source, box, target, new_box):
+        """Score change of moving `item_id` from `box` in `source` to
+        `new_box` in `target`."""
+        volume = float(np.prod(box[3:] - box[:3]))
+        fragmentation = 0.0
+        if target is not source:
+            fragmentation = (
+                _container_cost(source.volume, source.used_volume - volume, source.count - 1)
+                + _container_cost(target.volume, target.used_volume + volume, target.count + 1)
+                - _container_cost(source.volume, source.used_volume, source.count)
+                - _container_cost(target.volume, target.used_volume, target.count)
+            )
+        access = self._access(item_id, target, new_box) - self._access(item_id, source, box)
+        return (FRAGMENTATION_WEIGHT * fragmentation / self.capacity
+                + ACCESS_WEIGHT * access / len(self.items))
+
+    def propose(self, rnd):
+        """A random feasible move as (item_id, source index, box, target
+        index, new box, weight, score change), or None. The layout is left
+        as it was."""
+        item_id = rnd.choice(self.items)
+        source_index = self.locations[item_id]
+        source = self.spaces[source_index]
+        row = source.item_ids.index(item_id)
+        box = source.boxes[row].copy()
+        weight = source.weights[row]
+        if not _reachable(source, box):
+            return None
+        dims = box[3:] - box[:3]
+        priority = self.priorities[item_id]
+
+        if rnd.random() < SAME_CONTAINER_SHARE:
+            # Taken out and put back in: its own box is neither in the way
+            # nor occupied while the new spot is found
+            target_index, target = source_index, source
+            source.remove(item_id)
+            found = source.find_position(dims, priority)
+            reachable = found is not None and _reachable(source, found[0])
+            source.add(item_id, box, weight)
+            if not reachable or np.array_equal(found[0], box):
+                return None
+        else:
+            target_index = self._target(source_index, dims, weight, rnd)
+            if target_index is None:
+                return None
+            target = self.spaces[target_index]
+            found = target.find_position(dims, priority)
+            if found is None or not _reachable(target, found[0]):
+                return None
+        new_box = found[0]
+        return (item_id, source_index, box, target_index, new_box, weight,
+                self.delta(item_id, source, box, target, new_box))
+
+    def _target(self, source_index, dims, weight, rnd):
+        # The fullest of a few sampled containers in the module with room for
+        # the item, which steers items towards consolidating
+        members = self.by_module[self.spaces[source_index].module]
+        if len(members) < 2:
+            return None
+        volume = float(np.prod(dims))
+        sides = np.sort(dims)
+        best, best_fill = None, -1.0
+        for _ in range(TARGET_SAMPLES):
+            index = rnd.choice(members)
+            space = self.spaces[index]
+            if index == source_index or space.volume - space.used_volume < volume:
+                continue
+            if space.max_weight - space.used_weight < weight or np.any(np.sort(space.size) < sides):
+                continue
+            fill = space.used_volume / space.volume
+            if fill > best_fill:
+                best, best_fill = index, fill
+        return best
+
+    def apply(self, move):
+        item_id, source_index, _, target_index, new_box, weight, _ = move
+        self.spaces[source_index].remove(item_id)
+        self.spaces[target_index].add(item_id, new_box, weight)
+        self.locations[item_id] = target_index
+
+    def undo(self, move):
+        item_id, source_index, box, target_index, _, weight, _ = move
+        self.spaces[target_index].remove(item_id)
+        self.spaces[source_index].add(item_id, box, weight)
+        self.locations[item_id] = source_index
+
+    def efficiency(self):
+        """Used volume over the capacity of non-empty containers, in percent."""
+        used = sum(space.used_volume for space in self.spaces if space.count)
+        capacity = sum(space.volume for space in self.spaces if space.count)
+        return round(100.0 * used / capacity, 1) if capacity else 0.0
+
+    def containers_in_use(self):
+        return sum(1 for space in self.spaces if space.count)
+
+
+def anneal(layout, seconds, max_moves, seed=None):
+    """One simulated-annealing chain over `layout`.
+
+    Accepted moves are applied as they go; the result is the shortest
+    prefix of them (at most `max_moves`) reaching the best score seen,
+    which is where the chain rewinds to when the move list fills up (or
+    stops, if every move in it was an improvement). The layout is restored
+    before returning.
+    """
+    rnd = random.Random(seed)
+    started = time.monotonic()
+    score = best = layout.score()
+    moves, best_length, iterations = [], 0, 0
+    if not layout.items:
+        return {"score": best, "moves": [], "iterations": 0}
+
+    proposals = [layout.propose(rnd) for _ in range(WARMUP_PROPOSALS)]
+    deltas = [abs(move[-1]) for move in proposals if move is not None and move[-1]]
+    if not any(move is not None for move in proposals):
+        return {"score": best, "moves": [], "iterations": WARMUP_PROPOSALS}
+    initial = float(np.mean(deltas)) if deltas else 1e-9
+    final = initial * FINAL_TEMPERATURE_RATIO
+
+    while True:
+        elapsed = time.monotonic() - started
+        if elapsed >= seconds:
+            break
+        if len(moves) >= max_moves:
+            if best_length == len(moves):
+                break
+            while len(moves) > best_length:
+                layout.undo(moves.pop())
+            score = best
+        temperature = initial * (final / initial) ** (elapsed / seconds)
+        move = layout.propose(rnd)
+        iterations += 1
+        if move is None:
+            continue
+        delta = move[-1]
+        if delta < 0 or rnd.random() < math.exp(-delta / temperature):
+            layout.apply(move)
+            moves.append(move)
+            score += delta
+            if score < best - 1e-12:
+                best, best_length = score, len(moves)
+
+    plan = [(item_id, layout.spaces[source].container_id, box.tolist(),
+             layout.spaces[target].container_id, new_box.tolist())
+            for item_id, source, box, target, new_box, _, _ in moves[:best_length]]
+    while moves:
+        layout.undo(moves.pop())
+    return {"score": best, "moves": plan, "iterations": iterations}
+
+
+def _run_chain(layout, chain):
+    return anneal(layout, *chain)
+
+
+def optimize(layout, seconds=DEFAULT_BUDGET, max_moves=DEFAULT_MAX_MOVES, seed=None, pool=None, workers=1):
+    """Best move sequence found for `layout` within about `seconds`.
+
+    With a process_pool.ProcessPool, each of up to `workers` of its
+    processes runs an independent chain with its own seed on a copy of the
+    layout; the best chain wins, and fewer moves break ties. Its moves are
+    then applied to `layout`, so the totals after them can be read off it.
+    """
+    started = time.monotonic()
+    seed = random.randrange(2 ** 32) if seed is None else int(seed)
+    workers = min(workers, pool.max_workers) if pool is not None else 1
+    chains = [(seconds, max_moves, seed + i) for i in range(max(1, workers))]
+    before = {"score": layout.score(), "efficiency": layout.efficiency(),
+              "containersInUse": layout.containers_in_use()}
+    if len(chains) == 1 or not layout.items:
+        results = [anneal(layout, *chains[0])]
+    else:
+        results = pool.map(_run_chain, layout, chains, len(chains))
+    best = min(results, key=lambda result: (result["score"], len(result["moves"])))
+
+    moves = []
+    for step, (item_id, source_id, box, target_id, new_box) in enumerate(best["moves"], 1):
+        source, target = layout.lookup[source_id], layout.lookup[target_id]
+        row = layout.spaces[source].item_ids.index(item_id)
+        layout.apply((item_id, source, None, target, np.array(new_box), layout.spaces[source].weights[row], None))
+        moves.append({
+            "step": step,
+            "itemId": item_id,
+            "module": layout.spaces[target].module,
+            "fromContainer": source_id,
+            "fromPosition": _box_to_position(box),
+            "toContainer": target_id,
+            "toPosition": _box_to_position(new_box),
+        })
+    after = {"score": layout.score(), "efficiency": layout.efficiency(),
+             "containersInUse": layout.containers_in_use()}
+    return {
+        "moves": moves,
+        "score": {"before": round(before["score"], 6), "after": round(after["score"], 6)},
+        "efficiency": {"before": before["efficiency"], "after": after["efficiency"]},
+        "containersInUse": {"before": before["containersInUse"], "after": after["containersInUse"]},
+        "iterations": sum(result["iterations"] for result in results),
+        "chains": len(results),
+        "elapsed": round(time.monotonic() - started, 3),
+    }
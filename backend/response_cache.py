@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from urllib.parse import urlencode
+
+# Entries kept per process, and how long one is served before it is rebuilt
+# even if no write invalidated it (log aggregates move with every entry)
+MAX_ENTRIES = 1024
+DEFAULT_TTL = 30.0
+
+# Larger bodies are not worth holding in memory
+MAX_BODY_BYTES = 1_000_000
+
+# Query parameters that never change a response
+IGNORED_PARAMS = {'profile'}
+
+
+class MemoryBackend:
+    """LRU of tagged entries with expiry times, for one process.
+
+    Another backend (one shared by every worker, say) implements the same
+    get/set/invalidate/clear methods and sets `shared`. Entries are tuples
+    of bytes, ints and strings, so they serialize as they are.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # key -> (expires at, tags, value), least recently used first
+        self.entries = OrderedDict()
+        self.tagged = defaultdict(set)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, ttl, tags):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic() + ttl, tags, value)
+            for tag in tags:
+                self.tagged[tag].add(key)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def invalidate(self, tags):
+        """Drop every entry carrying any of `tags`; returns how many."""
+        with self.lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self.tagged.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tagged.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _drop(self, key):
+        _, tags, _ = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tagged[tag]
+
+
+class ResponseCache:
+    """Finished GET responses, keyed by namespace and normalized query.
+
+    Each entry is tagged with its namespace and with the items in it, so a
+    write can drop only what it made stale: moving an item invalidates the
+    searches that returned it, adding or removing items invalidates every
+    search. A response being built while something is invalidated is not
+    stored, as it may have read the data from before the write.
+    """
+
+    def __init__(self, backend=None, ttl=DEFAULT_TTL):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.generation = 0
+        # (namespace, 'hit' or 'miss') -> count
+        self.counts = defaultdict(int)
+        self.invalidated = 0
+
+    @staticmethod
+    def key(namespace, args):
+        # Parameter order, blank values and surrounding spaces don't matter
+        params = sorted((name, value.strip()) for name, value in args.items(multi=True)
+                        if value.strip() and name not in IGNORED_PARAMS)
+        return f"{namespace}?{urlencode(params)}"
+
+    def get(self, namespace, key):
+        if not self.ttl:
+            return None
+        entry = self.backend.get(key)
+        self._count(namespace, 'hit' if entry is not None else 'miss')
+        return entry
+
+    def put(self, namespace, key, entry, generation, items=()):
+        if not self.ttl or len(entry[0]) > MAX_BODY_BYTES or generation != self.generation:
+            return
+        self.backend.set(key, entry, self.ttl, [namespace] + [f"item:{item_id}" for item_id in items])
+
+    def invalidate(self, *namespaces, items=()):
+        tags = list(namespaces) + [f"item:{item_id}" for item_id in items]
+        if not tags:
+            return
+        with self.lock:
+            self.generation += 1
+        dropped = self.backend.invalidate(tags)
+        with self.lock:
+            self.invalidated += dropped
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+        self.backend.clear()
+
+    def _count(self, namespace, outcome):
+        with self.lock:
+            self.counts[(namespace, outcome)] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
@@ -0,0 +1,104 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class OcclusionGraph:
+    """Which items stand between each item and its container's open face.
+
+    An item blocks another when it sits in front of it (closer to depth 0)
+    and their footprints on the open face overlap, so the blocked item cannot
+    be pulled straight out until the blocker is moved.
+    """
+
+    __slots__ = ('version', 'item_ids', 'lookup', 'front', 'blockers')
+
+    def __init__(self, space):
+        self.version = space.version
+        self.item_ids = list(space.item_ids)
+        self.lookup = {item_id: i for i, item_id in enumerate(self.item_ids)}
+        boxes = space.occupied()
+        self.front = boxes[:, 1].copy()
+        if len(boxes):
+            in_front = boxes[None, :, 4] <= boxes[:, None, 1]
+            overlap_x = (boxes[None, :, 0] < boxes[:, None, 3]) & (boxes[None, :, 3] > boxes[:, None, 0])
+            overlap_z = (boxes[None, :, 2] < boxes[:, None, 5]) & (boxes[None, :, 5] > boxes[:, None, 2])
+            blocked_by = in_front & overlap_x & overlap_z
+            self.blockers = [np.flatnonzero(row) for row in blocked_by]
+        else:
+            self.blockers = []
+
+    def closure(self, targets):
+        """Indices of every item that has to leave the container, via BFS
+        from the targets along blocker edges, in a valid removal order."""
+        seen = set(targets)
+        queue = deque(targets)
+        while queue:
+            node = queue.popleft()
+            for blocker in self.blockers[node]:
+                if blocker not in seen:
+                    seen.add(blocker)
+                    queue.append(blocker)
+        # A blocker always starts strictly in front of what it blocks, so
+        # front-to-back order removes every item after its own blockers.
+        return sorted(seen, key=lambda node: (self.front[node], node))
+
+
+class RetrievalPlanner:
+    """Plans retrievals over the placement index, caching one occlusion
+    graph per container. A graph is rebuilt only when its container changed
+    since it was built, so traffic elsewhere on the station does not
+    invalidate it."""
+
+    def __init__(self, placement_index):
+        self.placement_index = placement_index
+        self.lock = threading.Lock()
+        self.graphs = {}
+
+    def graph_for(self, space):
+        with self.lock:
+            graph = self.graphs.get(space.container_id)
+            if graph is None or graph.version != space.version:
+                graph = OcclusionGraph(space)
+                self.graphs[space.container_id] = graph
+            return graph
+
+    def plan(self, item_ids):
+        """Minimal retrieval sequence for one or more items.
+
+        Targets sharing a container are planned together on its graph, so an
+        item blocking several targets is moved once. Returns (plans, missing)
+        where each plan covers one container and missing lists item IDs that
+        are not placed in any container.
+        """
+        by_container = {}
+        missing = []
+        with self.placement_index.lock:
+            for item_id in dict.fromkeys(item_ids):
+                space, _ = self.placement_index.locate(item_id)
+                if space is None:
+                    missing.append(item_id)
+                    continue
+                by_container.setdefault(space.container_id, (space, []))[1].append(item_id)
+
+            plans = []
+            for container_id, (space, targets) in by_container.items():
+                graph = self.graph_for(space)
+                wanted = set(targets)
+                order = graph.closure([graph.lookup[item_id] for item_id in targets])
+                steps = []
+                for node in order:
+                    item_id = graph.item_ids[node]
+                    steps.append({"action": "retrieve" if item_id in wanted else "remove", "itemId": item_id})
+                moved = [graph.item_ids[node] for node in order if graph.item_ids[node] not in wanted]
+                for item_id in reversed(moved):
+                    steps.append({"action": "placeBack", "itemId": item_id})
+                plans.append({
+                    "containerId": container_id,
+                    "module": space.module,
+                    "targets": targets,
+                    "itemsMoved": len(moved),
+                    "steps": steps,
+                })
+        return plans, missing
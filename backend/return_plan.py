@@ -0,0 +1,208 @@
+import time
+
+import numpy as np
+
+# Return vehicles: mass that can go back (kg) and how many waste containers
+# fit aboard. Containers default to cargo transfer bags.
+VEHICLES = {
+    'Progress MS': {'max_weight': 1600, 'containers': 24},
+    'Cygnus': {'max_weight': 3000, 'containers': 48},
+    'Dragon': {'max_weight': 2500, 'containers': 36},
+    'HTV': {'max_weight': 4000, 'containers': 60},
+}
+DEFAULT_VEHICLE = 'Cygnus'
+CONTAINER_MAX_WEIGHT = 27.0
+CONTAINER_VOLUME = 50 * 42 * 25
+
+# Item types packed apart from everything else
+BIOHAZARD_TYPES = {'biological', 'medical'}
+
+# Wall-clock budget for a plan; past it, the remaining items are packed
+# with next-fit instead of best-fit
+TIME_LIMIT = 0.5
+
+# Largest items x mass-steps table the exact knapsack will fill
+MAX_KNAPSACK_CELLS = 30_000_000
+
+
+class WasteLoad:
+    """Waste items as parallel arrays: weight (kg), volume (cm^3) and
+    whether each is a biohazard."""
+
+    __slots__ = ('item_ids', 'weight', 'volume', 'biohazard')
+
+    def __init__(self, items):
+        self.item_ids = [item['item_id'] for item in items]
+        self.weight = np.array([float(item.get('weight') or 0) for item in items])
+        self.volume = np.array([_volume(item) for item in items])
+        self.biohazard = np.array([
+            bool(item.get('hazardous')) or str(item.get('type', '')).lower() in BIOHAZARD_TYPES
+            for item in items
+        ], dtype=bool)
+
+    def __len__(self):
+        return len(self.item_ids)
+
+
+def _volume(item):
+    if item.get('volume'):
+        return float(item['volume'])
+    dimensions = item.get('dimensions') or {}
+    if isinstance(dimensions, dict):
+        sizes = [dimensions.get('width'), dimensions.get('depth', dimensions.get('length')), dimensions.get('height')]
+        if all(sizes):
+            return float(np.prod([float(size) for size in sizes]))
+    return 0.0
+
+
+def pack(load, rows, container_weight, container_volume, containers, mass_cap, deadline):
+    """Best-fit-decreasing over two constraints with biohazard separation.
+
+    Items go largest first (by the larger of their weight and volume share
+    of a container) into the open container of the same class they leave
+    least room in, opening a new one when none fits. Once `deadline` passes
+    the rest are packed next-fit. Returns (bin per row or -1, bin classes,
+    whether the time bound was hit).
+    """
+    size = np.maximum(load.weight[rows] / container_weight, load.volume[rows] / container_volume)
+    order = rows[np.argsort(-size, kind='stable')]
+    bins = np.full(len(load), -1)
+    free_weight = np.full(containers, container_weight)
+    free_volume = np.full(containers, float(container_volume))
+    kind = np.full(containers, -1)
+    opened = 0
+    latest = {0: -1, 1: -1}
+    loaded = 0.0
+    fallback = False
+    for row in order:
+        weight, volume, hazard = load.weight[row], load.volume[row], int(load.biohazard[row])
+        if loaded + weight > mass_cap or weight > container_weight or volume > container_volume:
+            continue
+        if not fallback and time.perf_counter() > deadline:
+            fallback = True
+        if fallback:
+            # Next-fit: only the most recently opened container of this class
+            candidates = np.arange(latest[hazard], latest[hazard] + 1) if latest[hazard] >= 0 else np.arange(0)
+        else:
+            candidates = np.arange(opened)
+        fits = candidates[(kind[candidates] == hazard) & (free_weight[candidates] >= weight)
+                          & (free_volume[candidates] >= volume)]
+        if len(fits):
+            slack = (free_weight[fits] - weight) / container_weight + (free_volume[fits] - volume) / container_volume
+            target = fits[np.argmin(slack)]
+        elif opened < containers:
+            target = opened
+            kind[target] = hazard
+            latest[hazard] = target
+            opened += 1
+        else:
+            continue
+        bins[row] = target
+        free_weight[target] -= weight
+        free_volume[target] -= volume
+        loaded += weight
+    return bins, kind[:opened], fallback
+
+
+def knapsack(load, rows, mass_cap, volume_cap, deadline):
+    """Rows that maximize total volume with total weight within `mass_cap`
+    and total volume within `volume_cap`.
+
+    A 0/1 dynamic programme over mass in steps sized so the table stays
+    within MAX_KNAPSACK_CELLS, each item updating the whole mass axis in one
+    array operation. Weights are rounded up to a step so its choice never
+    exceeds the cap, which can cost it a little against greedy by volume
+    per kilogram; the better of the two is returned, as (rows, method).
+    The programme only tracks mass, so it settles for the best mass step
+    whose volume is within `volume_cap`. Greedy alone is used when the
+    table would be too large or time runs out.
+    """
+    weights, volumes = load.weight[rows], load.volume[rows]
+    if weights.sum() <= mass_cap and volumes.sum() <= volume_cap:
+        return rows, "all"
+    density = volumes / np.maximum(weights, 1e-9)
+    order = np.argsort(-density, kind='stable')
+    greedy = rows[order[(np.cumsum(weights[order]) <= mass_cap) & (np.cumsum(volumes[order]) <= volume_cap)]]
+
+    steps = int(min(mass_cap * 10, MAX_KNAPSACK_CELLS // max(len(rows), 1)))
+    if steps < 10:
+        return greedy, "greedy"
+    unit = mass_cap / steps
+    cost = np.ceil(weights / unit - 1e-9).astype(np.int64)
+    best = np.zeros(steps + 1)
+    taken = np.zeros((len(rows), steps + 1), dtype=bool)
+    for i in range(len(rows)):
+        if time.perf_counter() > deadline:
+            return greedy, "greedy"
+        c = cost[i]
+        if c > steps:
+            continue
+        candidate = best[:steps + 1 - c] + volumes[i]
+        better = candidate > best[c:]
+        taken[i, c:] = better
+        best[c:] = np.where(better, candidate, best[c:])
+    within = np.where(best <= volume_cap, best, -1.0)
+    if within.max() <= load.volume[greedy].sum():
+        return greedy, "greedy"
+    chosen = []
+    capacity = int(np.argmax(within))
+    for i in range(len(rows) - 1, -1, -1):
+        if taken[i, capacity]:
+            chosen.append(rows[i])
+            capacity -= cost[i]
+    return np.array(chosen[::-1], dtype=np.int64), "dynamic-programming"
+
+
+def _load(load, rows, vehicle, deadline):
+    return pack(load, rows, vehicle['container_max_weight'], vehicle['container_volume'],
+                vehicle['containers'], vehicle['max_weight'], deadline)
+
+
+def plan_return(load, vehicle, mode='pack', time_limit=TIME_LIMIT):
+    """Assign waste to the vehicle's containers.
+
+    'pack' loads everything that fits; 'knapsack' first picks the items that
+    remove the most volume within what the vehicle and its containers can
+    take, then packs them, and keeps plain packing's result instead when
+    that removes more. Biohazards never share a container with other waste.
+    """
+    deadline = time.perf_counter() + time_limit
+    rows = np.flatnonzero((load.weight <= vehicle['container_max_weight'])
+                          & (load.volume <= vehicle['container_volume']))
+    selection = None
+    if mode == 'knapsack':
+        # Selection gets half the budget so packing is not left with none
+        mass_cap = min(vehicle['max_weight'], vehicle['containers'] * vehicle['container_max_weight'])
+        volume_cap = vehicle['containers'] * vehicle['container_volume']
+        chosen, selection = knapsack(load, rows, mass_cap, volume_cap, deadline - time_limit / 2)
+        bins, kinds, fallback = _load(load, chosen, vehicle, deadline)
+        # The selection does not see how items split into containers or the
+        # biohazard separation, so packing every item can still do better
+        loaded = _load(load, rows, vehicle, deadline)
+        if load.volume[loaded[0] >= 0].sum() > load.volume[bins >= 0].sum():
+            (bins, kinds, fallback), selection = loaded, "pack"
+    else:
+        bins, kinds, fallback = _load(load, rows, vehicle, deadline)
+    assigned = bins >= 0
+    placed = np.flatnonzero(assigned)
+    placed = placed[np.argsort(bins[placed], kind='stable')]
+    groups = np.split(placed, np.searchsorted(bins[placed], np.arange(1, len(kinds))))
+    containers = []
+    for target, (hazard, members) in enumerate(zip(kinds, groups)):
+        containers.append({
+            "id": f"CONT-{target + 1:03d}",
+            "biohazard": bool(hazard),
+            "capacity": round(vehicle['container_max_weight'], 1),
+            "filled": round(float(load.weight[members].sum()), 1),
+            "volumeCapacity": round(float(vehicle['container_volume']), 1),
+            "volumeUsed": round(float(load.volume[members].sum()), 1),
+            "items": len(members),
+            "itemIds": [load.item_ids[row] for row in members],
+        })
+    return {
+        "containers": containers,
+        "unassigned": [load.item_ids[row] for row in np.flatnonzero(~assigned)],
+        "removedWeight": round(float(load.weight[assigned].sum()), 1),
+        "removedVolume": round(float(load.volume[assigned].sum()), 1),
+        "solver": {"selection": selection, "packing": "next-fit" if fallback else "best-fit"},
+    }
@@ -0,0 +1,260 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+GRAM_SIZE = 3
+
+# Vocabulary tokens must share at least this fraction of a query word's
+# trigrams before the edit distance is checked.
+FUZZY_MIN_OVERLAP = 0.3
+
+
+def normalize(text):
+    return re.sub(r'[^0-9a-z]+', ' ', str(text).lower()).strip()
+
+
+def _grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _text_grams(text):
+    # Text shorter than a trigram is posted under itself
+    if len(text) < GRAM_SIZE:
+        return {text} if text else set()
+    return _grams(text)
+
+
+def _parts(gram):
+    # The strings shorter than a trigram that a posted gram contains
+    return {gram[i:i + size] for size in range(1, min(len(gram), GRAM_SIZE - 1) + 1)
+            for i in range(len(gram) - size + 1)}
+
+
+def _word_grams(word):
+    # Padded so short words still share their first and last letters with
+    # their misspellings.
+    return _grams(f' {word} ')
+
+
+def _max_edits(word):
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+
+def _within_distance(a, b, limit):
+    """Edit distance between a and b, counting an adjacent transposition as
+    a single edit, is at most `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if before is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return False
+        before, previous = previous, current
+    return previous[-1] <= limit
+
+
+class SearchIndex:
+    """In-process name and ID index over cargo items.
+
+    Prefix lookups bisect a sorted key list holding every item's full name,
+    each name token and its ID. Substring lookups walk the shortest trigram
+    posting list; a query shorter than a trigram walks the postings of the
+    trigrams that contain it, looked up in a map from each indexed trigram's
+    letters and letter pairs to the trigram (names and IDs shorter than a
+    trigram are posted whole). Typo-tolerant lookups correct
+    each query word against the token vocabulary (which grows with distinct
+    words, not with items) and intersect the corrected tokens' postings.
+    Every lookup stops as soon as the requested page is filled, so latency
+    does not grow with the number of matching items.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.ids = {}
+        self.keys = []
+        self.grams = defaultdict(set)
+        self.gram_parts = defaultdict(set)
+        self.tokens = defaultdict(set)
+        self.token_grams = defaultdict(set)
+
+    @classmethod
+    def from_store(cls, store):
+        index = cls()
+        index.add_many((item.item_id, item.name or '') for item in store.snapshot())
+        return index
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, item_id, name):
+        with self.lock:
+            normalized = normalize(name)
+            if self.entries.get(item_id) == normalized:
+                return
+            self.remove(item_id)
+            for key in self._keys_for(item_id, normalized):
+                insort(self.keys, (key, item_id))
+            self._index_terms(item_id, normalized)
+
+    def add_many(self, items):
+        # Bulk load: postings are filled item by item but the prefix keys
+        # are sorted once at the end instead of insorted one at a time.
+        with self.lock:
+            keys = []
+            for item_id, name in dict(items).items():
+                normalized = normalize(name)
+                if self.entries.get(item_id) == normalized:
+                    continue
+                self.remove(item_id)
+                keys.extend((key, item_id) for key in self._keys_for(item_id, normalized))
+                self._index_terms(item_id, normalized)
+            self.keys.extend(keys)
+            self.keys.sort()
+
+    def remove(self, item_id):
+        with self.lock:
+            normalized = self.entries.pop(item_id, None)
+            if normalized is None:
+                return
+            for key in self._keys_for(item_id, normalized):
+                position = bisect_left(self.keys, (key, item_id))
+                if position < len(self.keys) and self.keys[position] == (key, item_id):
+                    del self.keys[position]
+            for gram in _text_grams(normalized) | _text_grams(self.ids.pop(item_id)):
+                self._discard(self.grams, gram, item_id)
+                if gram not in self.grams:
+                    for part in _parts(gram):
+                        self._discard(self.gram_parts, part, gram)
+            for token in normalized.split():
+                self._discard(self.tokens, token, item_id)
+                if token not in self.tokens:
+                    for gram in _word_grams(token):
+                        self._discard(self.token_grams, gram, token)
+
+    def search(self, query, limit=50, offset=0, mode='auto'):
+        """Item IDs matching `query`, best matches first.
+
+        Prefix matches rank above substring matches, which rank above
+        typo-tolerant ones; `mode` restricts the lookup to 'prefix',
+        'substring' or 'fuzzy'. Returns (page of IDs, whether more matches
+        exist past this page).
+        """
+        query = normalize(query)
+        if not query:
+            return [], False
+        wanted = offset + limit + 1
+        tiers = {
+            'prefix': self._prefix,
+            'substring': self._substring,
+            'fuzzy': self._fuzzy,
+        }
+        selected = list(tiers) if mode == 'auto' else [mode]
+        ranked = {}
+        with self.lock:
+            for tier in selected:
+                for item_id in tiers[tier](query):
+                    ranked.setdefault(item_id, None)
+                    if len(ranked) >= wanted:
+                        break
+                if len(ranked) >= wanted:
+                    break
+        ordered = list(ranked)
+        return ordered[offset:offset + limit], len(ordered) > offset + limit
+
+    def _prefix(self, query):
+        position = bisect_left(self.keys, (query,))
+        while position < len(self.keys) and self.keys[position][0].startswith(query):
+            yield self.keys[position][1]
+            position += 1
+
+    def _substring(self, query):
+        grams = _grams(query)
+        if not grams:
+            # Too short for a trigram: names, words and IDs starting with it
+            # first, then every item posted under a gram that contains it
+            yield from self._prefix(query)
+            for gram in self.gram_parts.get(query, ()):
+                yield from self.grams[gram]
+            return
+        postings = sorted((self.grams.get(gram, set()) for gram in grams), key=len)
+        for item_id in postings[0]:
+            if all(item_id in other for other in postings[1:]) \
+                    and (query in self.entries[item_id] or query in self.ids[item_id]):
+                yield item_id
+
+    def _fuzzy(self, query):
+        corrections = []
+        for word in query.split():
+            tokens = self._similar_tokens(word)
+            if not tokens:
+                return
+            corrections.append(tokens)
+        # Walk the smallest group of postings and keep items that also carry
+        # a correction for every other query word.
+        corrections.sort(key=lambda tokens: sum(len(self.tokens[t]) for t in tokens))
+        seen = set()
+        for token in corrections[0]:
+            for item_id in self.tokens.get(token, ()):
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                if all(any(item_id in self.tokens.get(t, ()) for t in tokens) for tokens in corrections[1:]):
+                    yield item_id
+
+    def _similar_tokens(self, word):
+        limit = _max_edits(word)
+        if word in self.tokens:
+            exact = [word]
+        else:
+            exact = []
+        if not limit:
+            return exact
+        grams = _word_grams(word)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.token_grams.get(gram, ()))
+        threshold = max(1, int(len(grams) * FUZZY_MIN_OVERLAP))
+        similar = [
+            token for token, shared in overlap.most_common()
+            if shared >= threshold and token != word and _within_distance(word, token, limit)
+        ]
+        return exact + similar
+
+    def _index_terms(self, item_id, normalized):
+        self.entries[item_id] = normalized
+        self.ids[item_id] = normalized_id = normalize(item_id)
+        for gram in _text_grams(normalized) | _text_grams(normalized_id):
+            if not self.grams[gram]:
+                for part in _parts(gram):
+                    self.gram_parts[part].add(gram)
+            self.grams[gram].add(item_id)
+        for token in normalized.split():
+            if not self.tokens[token]:
+                for gram in _word_grams(token):
+                    self.token_grams[gram].add(token)
+            self.tokens[token].add(item_id)
+
+    def _discard(self, postings, key, value):
+        values = postings.get(key)
+        if values is not None:
+            values.discard(value)
+            if not values:
+                del postings[key]
+
+    def _keys_for(self, item_id, normalized):
+        keys = {self.ids[item_id] if item_id in self.ids else normalize(item_id)}
+        if normalized:
+            keys.add(normalized)
+            keys.update(normalized.split())
+        return keys
@@ -0,0 +1,428 @@
+import heapq
+import itertools
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+from pymongo import UpdateOne
+
+# Expected uses per day of an item with a usage limit, by access frequency.
+# Daily uses are drawn from a Poisson distribution with this mean.
+DAILY_USE_RATES = {'high': 1.0, 'medium': 0.3, 'low': 0.05}
+
+MAX_DAYS = 3650
+
+# Items listed per change type in a simulation summary; totals are exact.
+MAX_REPORTED_CHANGES = 500
+
+# Statuses of items that are no longer in the station's working inventory
+INACTIVE_STATUSES = ['waste', 'disposed', 'undocked']
+
+# Same-day events run in this order: deliveries land, then items expire,
+# then the day's consumption happens.
+RESUPPLY, EXPIRE, DAY = 0, 1, 2
+
+NO_EXPIRY = np.iinfo(np.int64).max
+
+# Uncommitted what-if runs kept for /api/simulate/commit, oldest dropped first
+MAX_STORED_SCENARIOS = 20
+
+
+def _epoch_day(value):
+    if value is None or value == '':
+        return NO_EXPIRY
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d')
+    return int(np.datetime64(value, 'D').astype(np.int64))
+
+
+def _date_of(epoch_day):
+    return str(np.datetime64(int(epoch_day), 'D'))
+
+
+def _datetime_of(epoch_day):
+    return datetime(1970, 1, 1) + timedelta(days=int(epoch_day))
+
+
+def _limit(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.inf
+    return value if value > 0 else np.inf
+
+
+def resupply_item(entry):
+    """Resupply manifest entry (API field names) as an inventory document."""
+    if not entry.get('itemId'):
+        raise ValueError("Every resupply item needs an itemId")
+    return {
+        "item_id": entry['itemId'],
+        "name": entry.get('name'),
+        "type": entry.get('type', 'general'),
+        "weight": entry.get('weight', 0),
+        "usage_limit": entry.get('usageLimit'),
+        "access_frequency": entry.get('accessFrequency', 'medium'),
+        "expiry_date": entry.get('expiryDate'),
+    }
+
+
+class Inventory:
+    """Column-oriented copy of the working inventory for simulation.
+
+    One NumPy array per attribute, indexed by row; an item without a usage
+    limit has infinite uses and one without an expiry date expires on
+    NO_EXPIRY, so both fall out of the vectorized checks naturally.
+    """
+
+    COLUMNS = ('item_ids', 'names', 'type_names', 'type_codes', 'weight', 'usage_limit',
+               'uses_left', 'rate', 'expiry', 'active')
+
+    __slots__ = COLUMNS + ('shared',)
+
+    def __init__(self):
+        self.shared = set()
+        self.item_ids = []
+        self.names = []
+        self.type_names = []
+        self.type_codes = np.zeros(0, dtype=np.int32)
+        self.weight = np.zeros(0)
+        self.usage_limit = np.zeros(0)
+        self.uses_left = np.zeros(0)
+        self.rate = np.zeros(0)
+        self.expiry = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+
+    @classmethod
+    def from_store(cls, store):
+        inventory = cls()
+        inventory.extend(item.document() for item in store.snapshot(exclude_statuses=INACTIVE_STATUSES))
+        return inventory
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def fork(self):
+        """Copy-on-write copy: columns are shared with the original (and made
+        read-only) until either side writes one through writable(), so a
+        fork costs a few references however large the inventory is."""
+        child = Inventory.__new__(Inventory)
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            if isinstance(column, np.ndarray):
+                column.setflags(write=False)
+            setattr(child, name, column)
+        self.shared = set(self.COLUMNS)
+        child.shared = set(self.COLUMNS)
+        return child
+
+    def writable(self, name):
+        column = getattr(self, name)
+        if name in self.shared:
+            column = column.copy() if isinstance(column, np.ndarray) else list(column)
+            setattr(self, name, column)
+            self.shared.discard(name)
+        return column
+
+    def extend(self, items):
+        """Append items (MongoDB documents or resupply entries); returns the
+        row indices they were given."""
+        types = {name: code for code, name in enumerate(self.type_names)}
+        ids, names, codes, weights, limits, left, rates, expiries = [], [], [], [], [], [], [], []
+        for item in items:
+            item_type = item.get('type') or 'general'
+            if item_type not in types:
+                types[item_type] = len(types)
+                self.writable('type_names').append(item_type)
+            limit = _limit(item.get('usage_limit'))
+            remaining = item.get('uses_remaining')
+            ids.append(item['item_id'])
+            names.append(item.get('name') or item['item_id'])
+            codes.append(types[item_type])
+            weights.append(float(item.get('weight') or 0))
+            limits.append(limit)
+            left.append(limit if remaining is None else float(remaining))
+            rates.append(DAILY_USE_RATES.get(str(item.get('access_frequency', 'medium')).lower(),
+                                             DAILY_USE_RATES['medium']))
+            expiries.append(_epoch_day(item.get('expiry_date')))
+        start = len(self.item_ids)
+        self.writable('item_ids').extend(ids)
+        self.writable('names').extend(names)
+        self.type_codes = np.concatenate([self.type_codes, np.array(codes, dtype=np.int32)])
+        self.weight = np.concatenate([self.weight, weights])
+        self.usage_limit = np.concatenate([self.usage_limit, limits])
+        self.uses_left = np.concatenate([self.uses_left, left])
+        self.rate = np.concatenate([self.rate, rates])
+        self.expiry = np.concatenate([self.expiry, np.array(expiries, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.ones(len(ids), dtype=bool)])
+        # Concatenation made fresh arrays, so none of them is shared any more
+        self.shared.intersection_update({'item_ids', 'names', 'type_names'})
+        return np.arange(start, len(self.item_ids))
+
+
+class Simulation:
+    """Discrete-event simulation over an Inventory.
+
+    Events sit on a heap ordered by (day, kind, sequence). Each simulated day
+    is a DAY event that draws every usable item's uses for the day at once
+    and marks items that ran out; expiries are pre-grouped into one EXPIRE
+    event per expiry date, and resupplies are RESUPPLY events that append
+    rows to the inventory. Per-day work is therefore a handful of array
+    operations over the items that can still be used up, not a loop over
+    items.
+    """
+
+    def __init__(self, inventory, start=None, seed=None):
+        self.inventory = inventory
+        self.start = _epoch_day(start or datetime.utcnow())
+        self.rng = np.random.default_rng(seed)
+        self.events = []
+        self.sequence = itertools.count()
+        self.day = 0
+        self.base_rows = len(inventory)
+        self.changed = np.zeros(len(inventory), dtype=bool)
+        self.used = np.zeros(len(inventory), dtype=bool)
+        self.waste_kg = 0.0
+        self.depleted = []
+        self.expired = []
+        self.resupplied = []
+        self.resupplied_items = []
+        self.consumed = np.zeros(len(inventory.type_names))
+        self.uses = np.zeros(len(inventory.type_names))
+        self.timeline = []
+        self.extra_uses = np.zeros(len(inventory))
+        self.usable = np.zeros(0, dtype=np.int64)
+
+    def schedule(self, day, kind, payload=None):
+        heapq.heappush(self.events, (day, kind, next(self.sequence), payload))
+
+    def run(self, days, daily_uses=(), resupplies=()):
+        """Simulate `days` days. `daily_uses` are item IDs used once every
+        day on top of their expected use; `resupplies` is a list of
+        (day, items) deliveries. Returns the summary of what changed."""
+        inventory = self.inventory
+        lookup = {item_id: row for row, item_id in enumerate(inventory.item_ids)}
+        for item_id in daily_uses:
+            if item_id in lookup:
+                self.extra_uses[lookup[item_id]] += 1
+
+        self._schedule_expiries(np.arange(len(inventory)), days)
+        for day, items in resupplies:
+            if 1 <= day <= days:
+                self.schedule(day, RESUPPLY, items)
+        self.schedule(1, DAY)
+        self._refresh_usable()
+
+        while self.events:
+            day, kind, _, payload = heapq.heappop(self.events)
+            self.day = day
+            if kind == RESUPPLY:
+                self._resupply(payload, days)
+            elif kind == EXPIRE:
+                self._expire(payload)
+            else:
+                self._consume()
+                if day < days:
+                    self.schedule(day + 1, DAY)
+        return self.summary(days)
+
+    def _schedule_expiries(self, rows, days):
+        # Items already past their date expire on the current (or first)
+        # simulated day
+        offsets = np.maximum(self.inventory.expiry[rows] - self.start, max(self.day, 1))
+        due = offsets <= days
+        rows, offsets = rows[due], offsets[due]
+        order = np.argsort(offsets, kind='stable')
+        rows, offsets = rows[order], offsets[order]
+        expiry_days, first = np.unique(offsets, return_index=True)
+        for day, group in zip(expiry_days, np.split(rows, first[1:])):
+            self.schedule(int(day), EXPIRE, group)
+
+    def _resupply(self, items, days):
+        inventory = self.inventory
+        rows = inventory.extend(items)
+        grow = len(inventory) - len(self.changed)
+        self.changed = np.concatenate([self.changed, np.ones(grow, dtype=bool)])
+        self.used = np.concatenate([self.used, np.zeros(grow, dtype=bool)])
+        self.extra_uses = np.concatenate([self.extra_uses, np.zeros(grow)])
+        types = len(inventory.type_names) - len(self.consumed)
+        self.consumed = np.concatenate([self.consumed, np.zeros(types)])
+        self.uses = np.concatenate([self.uses, np.zeros(types)])
+        self.resupplied.extend((inventory.item_ids[row], self.day) for row in rows)
+        self.resupplied_items.extend(items)
+        self._schedule_expiries(rows, days)
+        self._refresh_usable()
+
+    def _expire(self, rows):
+        inventory = self.inventory
+        rows = rows[inventory.active[rows]]
+        if not len(rows):
+            return
+        inventory.writable('active')[rows] = False
+        self.changed[rows] = True
+        self.waste_kg += float(inventory.weight[rows].sum())
+        self.expired.extend((row, self.day) for row in rows.tolist())
+        self._refresh_usable()
+
+    def _consume(self):
+        inventory = self.inventory
+        rows = self.usable
+        waste_before = len(self.depleted) + len(self.expired)
+        if len(rows):
+            uses = self.rng.poisson(inventory.rate[rows]) + self.extra_uses[rows]
+            uses = np.minimum(uses, inventory.uses_left[rows])
+            used = uses > 0
+            rows, uses = rows[used], uses[used]
+            inventory.writable('uses_left')[rows] -= uses
+            self.changed[rows] = True
+            self.used[rows] = True
+            codes = inventory.type_codes[rows]
+            self.uses += np.bincount(codes, weights=uses, minlength=len(self.uses))
+            self.consumed += np.bincount(codes, weights=inventory.weight[rows] * uses / inventory.usage_limit[rows],
+                                         minlength=len(self.consumed))
+            out = rows[inventory.uses_left[rows] <= 0]
+            if len(out):
+                inventory.writable('active')[out] = False
+                self.waste_kg += float(inventory.weight[out].sum())
+                self.depleted.extend((row, self.day) for row in out.tolist())
+                self._refresh_usable()
+        self.timeline.append({
+            "day": self.day,
+            "date": _date_of(self.start + self.day),
+            "activeItems": int(inventory.active.sum()),
+            "newWasteItems": len(self.depleted) + len(self.expired) - waste_before,
+            "wasteKg": round(self.waste_kg, 3),
+        })
+
+    def _refresh_usable(self):
+        inventory = self.inventory
+        self.usable = np.flatnonzero(inventory.active & np.isfinite(inventory.uses_left)
+                                     & ((inventory.rate > 0) | (self.extra_uses > 0)))
+
+    def summary(self, days):
+        inventory = self.inventory
+
+        def listing(changes, reason):
+            return [{
+                "itemId": inventory.item_ids[row],
+                "name": inventory.names[row],
+                "reason": reason,
+                "date": _date_of(self.start + day),
+            } for row, day in changes[:MAX_REPORTED_CHANGES]]
+
+        return {
+            "daysSimulated": days,
+            "startDate": _date_of(self.start),
+            "endDate": _date_of(self.start + days),
+            "consumables": {
+                f"{name}Consumed": round(float(kg), 3)
+                for name, kg in zip(inventory.type_names, self.consumed) if kg
+            },
+            "usesByType": {
+                name: int(uses) for name, uses in zip(inventory.type_names, self.uses) if uses
+            },
+            "wasteGenerated": round(self.waste_kg, 3),
+            "itemsUsed": int(np.count_nonzero(self.used)),
+            "itemsDepletedCount": len(self.depleted),
+            "itemsExpiredCount": len(self.expired),
+            "itemsResuppliedCount": len(self.resupplied),
+            "itemsDepleted": listing(self.depleted, "Out of Uses"),
+            "itemsExpired": listing(self.expired, "Expired"),
+            "itemsResupplied": [{"itemId": item_id, "date": _date_of(self.start + day)}
+                                for item_id, day in self.resupplied[:MAX_REPORTED_CHANGES]],
+            "timeline": self.timeline,
+        }
+
+    def changes(self):
+        """Final state of every item the run touched, as (updates, new_items):
+        field updates for items already in the inventory and full documents
+        for resupplied ones."""
+        inventory = self.inventory
+        waste = {row: ("Out of Uses", day) for row, day in self.depleted}
+        waste.update((row, ("Expired", day)) for row, day in self.expired)
+
+        def state(row):
+            fields = {}
+            if np.isfinite(inventory.uses_left[row]):
+                fields["uses_remaining"] = int(inventory.uses_left[row])
+            if row in waste:
+                reason, day = waste[row]
+                fields.update({
+                    "status": "waste",
+                    "waste_reason": reason,
+                    "waste_date": _datetime_of(self.start + day),
+                })
+            return fields
+
+        updates = [(inventory.item_ids[row], state(row))
+                   for row in np.flatnonzero(self.changed[:self.base_rows]).tolist()]
+        new_items = []
+        for row, item in enumerate(self.resupplied_items, self.base_rows):
+            document = {key: value for key, value in item.items() if value is not None}
+            if isinstance(document.get('expiry_date'), str):
+                document['expiry_date'] = datetime.strptime(document['expiry_date'][:10], '%Y-%m-%d')
+            new_items.append(dict(document, status="delivered", **state(row)))
+        return updates, new_items
+
+
+def commit_changes(cargo_collection, changes):
+    """Apply a run's changes in one unordered bulk write. Items that left
+    the working inventory since the snapshot are not touched, and resupplied
+    items are only inserted if they do not exist yet."""
+    updates, new_items = changes
+    operations = [
+        UpdateOne({"item_id": item_id, "status": {"$nin": INACTIVE_STATUSES}}, {"$set": fields})
+        for item_id, fields in updates if fields
+    ]
+    operations.extend(
+        UpdateOne({"item_id": item["item_id"]}, {"$setOnInsert": item}, upsert=True)
+        for item in new_items
+    )
+    if not operations:
+        return {"itemsUpdated": 0, "itemsAdded": 0}
+    result = cargo_collection.bulk_write(operations, ordered=False)
+    return {"itemsUpdated": result.modified_count, "itemsAdded": result.upserted_count}
+
+
+class ScenarioStore:
+    """Changes of recent what-if runs, held until one is committed."""
+
+    def __init__(self, capacity=MAX_STORED_SCENARIOS):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.scenarios = OrderedDict()
+
+    def put(self, changes):
+        scenario_id = uuid.uuid4().hex
+        with self.lock:
+            self.scenarios[scenario_id] = changes
+            while len(self.scenarios) > self.capacity:
+                self.scenarios.popitem(last=False)
+        return scenario_id
+
+    def pop(self, scenario_id):
+        with self.lock:
+            return self.scenarios.pop(scenario_id, None)
+
+
+def _run_scenario(inventory, scenario):
+    simulation = Simulation(inventory.fork(), start=scenario['start'], seed=scenario.get('seed'))
+    summary = simulation.run(scenario['days'], daily_uses=scenario.get('daily_uses', ()),
+                             resupplies=scenario.get('resupplies', ()))
+    return summary, simulation.changes()
+
+
+def run_scenarios(inventory, scenarios, pool=None, workers=1):
+    """Run each scenario on its own fork of `inventory`; returns a
+    (summary, changes) pair per scenario, in order.
+
+    With more than one scenario and worker the runs go to `pool`, a
+    process_pool.ProcessPool, which sends the snapshot once to each of the
+    worker processes it uses; within a process, each run's fork shares the
+    snapshot's columns.
+    """
+    if pool is None or workers <= 1 or len(scenarios) <= 1:
+        return [_run_scenario(inventory, scenario) for scenario in scenarios]
+    return pool.map(_run_scenario, inventory, scenarios, workers)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules import each other by bare name, as they do when the
+# server runs from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,60 @@
+import mongomock
+
+import generation
+from generation import InventoryGeneration
+
+
+class Worker(InventoryGeneration):
+    # Reads the counter on every poll rather than once per interval
+    def poll(self):
+        self.checked = float("-inf")
+        return super().poll()
+
+
+def workers(count=2):
+    db = mongomock.MongoClient()["test"]
+    return [Worker(db["server_state"], entries=db["inventory_changes"]) for _ in range(count)]
+
+
+def test_a_worker_gets_the_ids_another_one_changed():
+    first, second = workers()
+    second.poll()
+
+    first.bump(["I1", "I2"])
+    first.bump(["I2"], ["C1"])
+    changes = second.poll()
+
+    assert (changes.items, changes.containers, changes.reload) == ({"I1", "I2"}, {"C1"}, False)
+    assert second.poll() is None
+
+
+def test_a_worker_skips_its_own_changes():
+    first, second = workers()
+    first.poll()
+    second.poll()
+
+    second.bump(["I1"])
+    first.bump(["I2"])
+    changes = first.poll()
+
+    assert changes.items == {"I1"}
+
+
+def test_a_change_without_ids_asks_for_a_reload():
+    first, second = workers()
+    second.poll()
+
+    first.bump()
+
+    assert second.poll().reload
+
+
+def test_a_missing_entry_asks_for_a_reload_after_the_grace_period(monkeypatch):
+    first, second = workers()
+    second.poll()
+    first.collection.update_one({"_id": "inventory"}, {"$inc": {"generation": 1}}, upsert=True)
+    first.bump(["I1"])
+
+    assert second.poll() is None
+    monkeypatch.setattr(generation, "ENTRY_GRACE", 0)
+    assert second.poll().reload
@@ -0,0 +1,59 @@
+import io
+
+import mongomock
+
+from importer import ITEM_SCHEMA, import_csv
+
+CSV = """item_id,name,type,weight_kg,dimensions_cm,priority,expiry_date,usage_limit
+ITM-001,Food Packet,food,0.5,10x10x20,80,2030-01-01,5
+ITM-002,Oxygen Cylinder,medical,15,30x30x80,high,,
+ITM-003,Screwdriver,tools,0.2,2x3x20,low,,100
+ITM-004,Broken Row,tools,heavy,2x3x20,low,,
+"""
+
+
+def documents(collection):
+    return sorted((dict(document, _id=None) for document in collection.find()), key=lambda document: document["item_id"])
+
+
+def test_importing_the_same_file_twice_changes_nothing_the_second_time():
+    collection = mongomock.MongoClient()["test"]["cargo_items"]
+
+    first = import_csv(io.BytesIO(CSV.encode()), collection, ITEM_SCHEMA)
+    after_first = documents(collection)
+    second = import_csv(io.BytesIO(CSV.encode()), collection, ITEM_SCHEMA)
+
+    assert (first["added"], first["updated"], first["rejected"]) == (3, 0, 1)
+    assert (second["added"], second["updated"], second["rejected"]) == (0, 3, 1)
+    assert collection.count_documents({}) == 3
+    assert documents(collection) == after_first
+
+
+def test_the_last_row_for_an_item_wins():
+    collection = mongomock.MongoClient()["test"]["cargo_items"]
+    lines = CSV.splitlines()
+    body = "\n".join(lines + [lines[1].replace("Food Packet", "Food Packet (new)")]) + "\n"
+
+    stats = import_csv(io.BytesIO(body.encode()), collection, ITEM_SCHEMA)
+
+    assert stats["added"] == 3
+    assert collection.count_documents({"item_id": "ITM-001"}) == 1
+    assert collection.find_one({"item_id": "ITM-001"})["name"] == "Food Packet (new)"
+
+
+def test_a_file_with_only_the_required_columns_leaves_other_fields_alone():
+    collection = mongomock.MongoClient()["test"]["cargo_items"]
+    full = "item_id,name,type,weight_kg,dimensions_cm,priority,current_module,current_section\n" \
+           "ITM-001,Food Packet,food,0.5,10x10x20,high,Unity,S3\n"
+    import_csv(io.BytesIO(full.encode()), collection, ITEM_SCHEMA)
+
+    stats = import_csv(io.BytesIO(b"item_id,weight_kg,dimensions_cm\nITM-001,0.75,10x10x20\nITM-009,1,5x5x5\n"),
+                       collection, ITEM_SCHEMA)
+
+    assert (stats["added"], stats["updated"]) == (1, 1)
+    item = collection.find_one({"item_id": "ITM-001"})
+    assert (item["weight"], item["name"], item["type"], item["priority"], item["module"], item["section"]) == \
+        (0.75, "Food Packet", "food", "high", "Unity", "S3")
+    added = collection.find_one({"item_id": "ITM-009"})
+    assert (added["name"], added["priority"], added["hazardous"]) == ("ITM-009", "medium", False)
+    assert "module" not in added and "expiry_date" not in added
@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+
+from placement import PlacementIndex
+
+CONTAINERS = [
+    {"container_id": "LOCKER-1", "module": "Unity", "section": "S1", "width": 60, "depth": 40, "height": 50,
+     "max_weight": 200},
+    {"container_id": "LOCKER-2", "module": "Unity", "section": "S2", "width": 60, "depth": 40, "height": 50,
+     "max_weight": 200},
+    {"container_id": "RACK-1", "module": "Destiny", "section": "S1", "width": 100, "depth": 85, "height": 200,
+     "max_weight": 500},
+]
+
+
+def manifest(count, seed=0):
+    rnd = random.Random(seed)
+    return [{
+        "item_id": f"ITEM-{i:04d}",
+        "dims": tuple(float(rnd.randint(3, 30)) for _ in range(3)),
+        "weight": rnd.uniform(0.1, 5.0),
+        "priority": rnd.choice(['high', 'medium', 'low']),
+        "type": rnd.choice(['food', 'medical', 'tools']),
+    } for i in range(count)]
+
+
+def assert_feasible(index):
+    for space in index.containers:
+        boxes = space.occupied()
+        assert np.all(boxes[:, :3] >= 0)
+        assert np.all(boxes[:, 3:] <= space.size)
+        assert np.all(boxes[:, 3:] > boxes[:, :3])
+        for row in range(len(boxes)):
+            overlap = np.all((boxes[:, :3] < boxes[row, 3:]) & (boxes[:, 3:] > boxes[row, :3]), axis=1)
+            overlap[row] = False
+            assert not overlap.any(), f"{space.item_ids[row]} overlaps in {space.container_id}"
+        assert space.used_weight <= space.max_weight + 1e-9
+
+
+def test_pack_places_items_without_overlaps_inside_their_containers():
+    index = PlacementIndex()
+    index.add_containers(CONTAINERS)
+    items = manifest(400)
+    packed = index.pack(items)
+
+    assert len(packed) == len(items)
+    assert_feasible(index)
+    placed = [(item, placement) for item, placement in packed if placement is not None]
+    assert placed
+    for item, placement in placed:
+        space, box = index.locate(item["item_id"])
+        assert space.container_id == placement["containerId"]
+        assert sorted(box[3:] - box[:3]) == sorted(item["dims"])
+
+
+def test_pack_leaves_out_items_over_the_weight_limit():
+    index = PlacementIndex()
+    index.add_containers([dict(CONTAINERS[0], max_weight=10)])
+    items = [dict(item, weight=4.0) for item in manifest(5)]
+    packed = index.pack(items)
+
+    assert sum(1 for _, placement in packed if placement is not None) == 2
+    assert_feasible(index)
+
+
+def test_recommend_finds_nothing_for_an_item_larger_than_every_container():
+    index = PlacementIndex()
+    index.add_containers(CONTAINERS)
+
+    assert index.recommend((300, 10, 10), 1.0) == []
+
+
+def test_commit_finds_a_new_spot_when_the_planned_one_was_taken():
+    index = PlacementIndex()
+    index.add_containers([dict(CONTAINERS[0], width=40, depth=40, height=40)])
+    items = [{"item_id": f"CUBE-{i}", "dims": (20.0, 20.0, 20.0), "weight": 1.0, "priority": "medium",
+              "type": "tools"} for i in range(3)]
+    planned = index.snapshot().pack(items)
+    assert not index.item_locations
+
+    # Another request takes the first planned spot in the meantime
+    taken = planned[0][1]["position"]["start"]
+    start = [taken["width"], taken["depth"], taken["height"]]
+    index.place("OTHER", "LOCKER-1", start + [side + 20.0 for side in start], 1.0)
+    committed = index.commit(planned)
+
+    assert all(placement is not None for _, placement in committed)
+    assert len(index.item_locations) == 4
+    assert_feasible(index)
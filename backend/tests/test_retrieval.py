@@ -0,0 +1,48 @@
+from placement import PlacementIndex
+from retrieval import RetrievalPlanner
+
+
+def planner():
+    # Boxes are [x0, depth0, z0, x1, depth1, z1]; depth 0 is the open face.
+    # FRONT, MIDDLE and BACK are stacked one behind the other, SIDE stands
+    # apart in the second row
+    index = PlacementIndex()
+    index.add_container({"container_id": "C1", "module": "Unity", "width": 100, "depth": 100, "height": 100})
+    index.place("FRONT", "C1", (0, 0, 0, 50, 10, 50))
+    index.place("MIDDLE", "C1", (0, 10, 0, 50, 20, 50))
+    index.place("BACK", "C1", (0, 20, 0, 50, 30, 50))
+    index.place("SIDE", "C1", (50, 10, 0, 100, 20, 50))
+    return RetrievalPlanner(index)
+
+
+def test_unblocked_item_is_retrieved_in_one_step():
+    plans, missing = planner().plan(["SIDE"])
+
+    assert missing == []
+    assert plans[0]["itemsMoved"] == 0
+    assert plans[0]["steps"] == [{"action": "retrieve", "itemId": "SIDE"}]
+
+
+def test_blockers_are_removed_front_first_and_placed_back_in_reverse():
+    plans, _ = planner().plan(["BACK"])
+
+    assert plans[0]["itemsMoved"] == 2
+    assert [(step["action"], step["itemId"]) for step in plans[0]["steps"]] == [
+        ("remove", "FRONT"), ("remove", "MIDDLE"), ("retrieve", "BACK"),
+        ("placeBack", "MIDDLE"), ("placeBack", "FRONT"),
+    ]
+
+
+def test_targets_in_one_container_share_their_blockers():
+    plans, _ = planner().plan(["MIDDLE", "BACK"])
+
+    assert len(plans) == 1
+    assert plans[0]["itemsMoved"] == 1
+    assert len(plans[0]["steps"]) == 4
+
+
+def test_items_not_in_a_container_are_reported_missing():
+    plans, missing = planner().plan(["NOWHERE"])
+
+    assert plans == []
+    assert missing == ["NOWHERE"]
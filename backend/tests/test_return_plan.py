@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+import pytest
+
+from return_plan import WasteLoad, plan_return
+
+VEHICLE = {"max_weight": 25.0, "containers": 3, "container_max_weight": 10.0, "container_volume": 1000.0}
+
+
+def waste(count, seed):
+    rnd = random.Random(seed)
+    return WasteLoad([{
+        "item_id": f"W{i:03d}",
+        "weight": rnd.uniform(0.2, 6.0),
+        "volume": rnd.uniform(20.0, 700.0),
+        "type": rnd.choice(['packaging', 'medical', 'food']),
+    } for i in range(count)])
+
+
+@pytest.mark.parametrize("mode", ['pack', 'knapsack'])
+@pytest.mark.parametrize("seed", range(5))
+def test_plan_stays_within_vehicle_and_container_limits(mode, seed):
+    load = waste(40, seed)
+    plan = plan_return(load, VEHICLE, mode=mode)
+
+    assert len(plan["containers"]) <= VEHICLE["containers"]
+    assert plan["removedWeight"] <= VEHICLE["max_weight"] + 0.05
+    rows = {item_id: row for row, item_id in enumerate(load.item_ids)}
+    loaded = []
+    for container in plan["containers"]:
+        members = [rows[item_id] for item_id in container["itemIds"]]
+        assert load.weight[members].sum() <= VEHICLE["container_max_weight"] + 1e-9
+        assert load.volume[members].sum() <= VEHICLE["container_volume"] + 1e-9
+        # Biohazards never share a container with other waste
+        assert set(load.biohazard[members]) == {container["biohazard"]}
+        loaded.extend(container["itemIds"])
+    assert len(loaded) == len(set(loaded))
+    assert sorted(loaded + plan["unassigned"]) == sorted(load.item_ids)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_knapsack_never_removes_less_volume_than_pack(seed):
+    load = waste(40, seed)
+
+    assert plan_return(load, VEHICLE, mode='knapsack')["removedVolume"] >= \
+        plan_return(load, VEHICLE, mode='pack')["removedVolume"]
+
+
+def test_knapsack_selection_respects_the_vehicle_mass_limit():
+    load = waste(200, 7)
+    vehicle = dict(VEHICLE, max_weight=12.0, containers=10)
+    plan = plan_return(load, vehicle, mode='knapsack')
+
+    assert 0 < plan["removedWeight"] <= 12.0
+    assert np.isclose(plan["removedWeight"], sum(container["filled"] for container in plan["containers"]), atol=0.1)
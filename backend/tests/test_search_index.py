@@ -0,0 +1,27 @@
+from search_index import SearchIndex
+
+
+def index():
+    names = SearchIndex()
+    names.add_many([("ITM-001", "Food Packet"), ("ITM-002", "Oxygen Cylinder"), ("Q7", "Kit")])
+    return names
+
+
+def test_queries_shorter_than_a_trigram_match_inside_names_and_ids():
+    names = index()
+
+    assert set(names.search("yl", mode="substring")[0]) == {"ITM-002"}
+    assert set(names.search("q7", mode="substring")[0]) == {"Q7"}
+    assert set(names.search("t", mode="substring")[0]) == {"ITM-001", "ITM-002", "Q7"}
+    assert names.search("zq", mode="substring") == ([], False)
+
+
+def test_removed_items_are_no_longer_found_by_short_queries():
+    names = index()
+
+    names.remove("Q7")
+    names.add("ITM-001", "Water")
+
+    assert names.search("q7", mode="substring") == ([], False)
+    assert names.search("ck", mode="substring") == ([], False)
+    assert names.search("te", mode="substring")[0] == ["ITM-001"]
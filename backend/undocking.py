@@ -0,0 +1,100 @@
+import logging
+from datetime import datetime
+
+from pymongo import ReplaceOne
+from pymongo.errors import ConfigurationError, OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Round trips for the item reads are bounded by this many documents each
+UNDOCK_BATCH = 5000
+
+PLANNED, UNDOCKING, UNDOCKED = 'planned', 'undocking', 'undocked'
+
+
+def save_plan(plans_collection, mission_id, item_ids, vehicle, return_date):
+    """Record a return plan against its mission. Replanning is allowed until
+    the mission has undocked."""
+    plans_collection.create_index("mission_id", unique=True)
+    result = plans_collection.update_one(
+        {"mission_id": mission_id, "status": PLANNED},
+        {"$set": {"item_ids": item_ids, "vehicle": vehicle, "return_date": return_date,
+                  "planned_at": datetime.utcnow()}},
+    )
+    if result.matched_count:
+        return True
+    if plans_collection.find_one({"mission_id": mission_id}, {"_id": 1}):
+        return False
+    plans_collection.insert_one({"mission_id": mission_id, "status": PLANNED, "item_ids": item_ids,
+                                 "vehicle": vehicle, "return_date": return_date,
+                                 "planned_at": datetime.utcnow()})
+    return True
+
+
+def undock(db, mission_id, item_ids=None):
+    """Move a mission's waste out of the live inventory into `archived_items`.
+
+    The items come from the mission's return plan (or `item_ids` when there
+    is none). Inside one transaction the documents are read in batches,
+    written to the archive with a single bulk write keyed on (mission_id,
+    item_id), removed from cargo_items and waste_items with one delete_many
+    each, and the plan is marked undocked with the outcome. Every step is
+    idempotent, so on a standalone server without transactions the same
+    steps run in order and a retry after a failure finishes the job.
+
+    Returns (outcome, item_ids, already_undocked), or (None, None, False)
+    when the mission is unknown.
+    """
+    plans = db['return_plans']
+    plan = plans.find_one({"mission_id": mission_id})
+    if plan is not None and plan.get('status') == UNDOCKED:
+        return plan['outcome'], plan['item_ids'], True
+    if plan is None:
+        if not item_ids:
+            return None, None, False
+        plans.update_one({"mission_id": mission_id},
+                         {"$setOnInsert": {"status": PLANNED, "item_ids": list(item_ids)}}, upsert=True)
+    item_ids = plan['item_ids'] if plan is not None else list(item_ids)
+    plans.update_one({"mission_id": mission_id, "status": {"$ne": UNDOCKED}}, {"$set": {"status": UNDOCKING}})
+    db['archived_items'].create_index([("mission_id", 1), ("item_id", 1)], unique=True)
+
+    def steps(session=None):
+        now = datetime.utcnow()
+        for start in range(0, len(item_ids), UNDOCK_BATCH):
+            batch = item_ids[start:start + UNDOCK_BATCH]
+            documents = list(db['cargo_items'].find({"item_id": {"$in": batch}}, {"_id": 0}, session=session))
+            documents += [dict(document, source='waste_items') for document in
+                          db['waste_items'].find({"item_id": {"$in": batch}}, {"_id": 0}, session=session)]
+            if documents:
+                db['archived_items'].bulk_write([
+                    ReplaceOne({"mission_id": mission_id, "item_id": document['item_id']},
+                               dict(document, mission_id=mission_id, status=UNDOCKED, undocked_at=now),
+                               upsert=True)
+                    for document in documents
+                ], ordered=False, session=session)
+        removed = db['cargo_items'].delete_many({"item_id": {"$in": item_ids}}, session=session).deleted_count
+        removed += db['waste_items'].delete_many({"item_id": {"$in": item_ids}}, session=session).deleted_count
+        archived = db['archived_items'].count_documents({"mission_id": mission_id}, session=session)
+        outcome = {
+            "itemsArchived": archived,
+            "itemsRemoved": removed,
+            "itemsMissing": len(item_ids) - archived,
+            "completedAt": now.isoformat(),
+        }
+        plans.update_one({"mission_id": mission_id},
+                         {"$set": {"status": UNDOCKED, "outcome": outcome, "undocked_at": now}}, session=session)
+        return outcome
+
+    try:
+        with db.client.start_session() as session:
+            outcome = session.with_transaction(steps)
+    except (NotImplementedError, ConfigurationError) as e:
+        logger.info(f"Undocking {mission_id} without a transaction: {e}")
+        outcome = steps()
+    except OperationFailure as e:
+        # Standalone servers reject transactions (IllegalOperation, code 20)
+        if e.code != 20:
+            raise
+        logger.info(f"Undocking {mission_id} without a transaction: {e}")
+        outcome = steps()
+    return outcome, item_ids, False
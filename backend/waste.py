@@ -0,0 +1,257 @@
+import heapq
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+from sklearn.ensemble import IsolationForest
+from sklearn.linear_model import LinearRegression
+
+# Waste category reported for each item type; anything else is Technical
+WASTE_CATEGORIES = {
+    'food': 'Food',
+    'medical': 'Medical',
+    'biological': 'Biological',
+    'packaging': 'Packaging',
+    'clothing': 'Clothing',
+    'paper': 'Paper',
+}
+DEFAULT_CATEGORY = 'Technical'
+
+# Items in these states have left the station and are not counted
+OFF_STATION_STATUSES = ['disposed', 'undocked']
+
+# Days of the daily waste series the trend is fitted on, and the change over
+# that window (relative to its mean) that counts as a trend
+TREND_WINDOW_DAYS = 28
+TREND_THRESHOLD = 0.25
+
+# Days of daily station-wide totals screened for unusual spikes
+ANOMALY_WINDOW_DAYS = 90
+
+MAX_LISTED_ITEMS = 500
+
+# The expiry heap is rebuilt once stale entries make up over half of it
+# (and it has at least this many)
+MIN_HEAP_REBUILD = 64
+
+
+def _day(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value[:10], '%Y-%m-%d')
+    return value.date().toordinal() if isinstance(value, datetime) else None
+
+
+def classify(item, today):
+    """Why an item is waste on day `today` (a date ordinal), or None."""
+    if item.get('status') == 'waste':
+        return item.get('waste_reason') or 'Waste'
+    if item.get('damaged'):
+        return 'Damaged'
+    uses = item.get('uses_remaining')
+    if uses is not None and uses <= 0:
+        return 'Out of Uses'
+    expiry = _day(item.get('expiry_date'))
+    if expiry is not None and expiry <= today:
+        return 'Expired'
+    return None
+
+
+class WasteTracker:
+    """Running waste totals over the inventory.
+
+    Every item is classified once when it is loaded or changes; totals per
+    category and reason and a daily series of newly wasted kilograms per
+    category are adjusted by the difference, never by rescanning. Items
+    that will expire sit on a heap keyed by expiry day and are moved to
+    waste as the calendar reaches them. summary() is cached until the waste
+    set, an item's waste status or the next pickup changes, or the day
+    rolls over; the trend and anomaly models run on the pre-aggregated
+    daily series, not on items.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.waste = {}
+        self.expiring = {}
+        self.heap = []
+        self.totals = defaultdict(lambda: [0.0, 0])
+        self.reasons = defaultdict(int)
+        self.daily = defaultdict(float)
+        self.version = 0
+        self.cache_key = None
+        self.cache = None
+        self.next_pickup = None
+
+    @classmethod
+    def from_store(cls, store):
+        tracker = cls()
+        tracker.track(item.document() for item in store.snapshot(exclude_statuses=OFF_STATION_STATUSES))
+        return tracker
+
+    def track(self, items, today=None):
+        today = today or datetime.utcnow().date().toordinal()
+        with self.lock:
+            changed = False
+            for item in items:
+                item_id = item['item_id']
+                before = self.waste.get(item_id)
+                self._forget(item_id)
+                if item.get('status') in OFF_STATION_STATUSES:
+                    continue
+                category = WASTE_CATEGORIES.get(str(item.get('type', '')).lower(), DEFAULT_CATEGORY)
+                weight = float(item.get('weight') or 0)
+                name = item.get('name') or item_id
+                reason = classify(item, today)
+                if reason:
+                    day = _day(item.get('waste_date')) or (today if reason != 'Expired' else
+                                                          _day(item.get('expiry_date')))
+                    self._add(item_id, name, category, weight, reason, day)
+                elif _day(item.get('expiry_date')) is not None:
+                    expiry = _day(item.get('expiry_date'))
+                    self.expiring[item_id] = (expiry, name, category, weight)
+                    heapq.heappush(self.heap, (expiry, item_id))
+                changed = changed or self.waste.get(item_id) != before
+            self._compact()
+            if changed:
+                self.version += 1
+
+    def refresh(self, store, item_ids):
+        """Reclassify just these items from their current state in the
+        inventory store."""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+        found = store.documents(item_ids)
+        self.track(found)
+        self.forget(set(item_ids) - {item['item_id'] for item in found})
+
+    def forget(self, item_ids):
+        with self.lock:
+            changed = False
+            for item_id in item_ids:
+                changed = self._forget(item_id) or changed
+            self._compact()
+            if changed:
+                self.version += 1
+
+    def set_next_pickup(self, date):
+        with self.lock:
+            if date != self.next_pickup:
+                self.next_pickup = date
+                self.version += 1
+
+    def summary(self, today=None, include_items=False):
+        today = today or datetime.utcnow().date().toordinal()
+        with self.lock:
+            self._advance(today)
+            key = (self.version, today)
+            if self.cache_key != key:
+                self.cache = self._summarize(today)
+                self.cache_key = key
+            if not include_items:
+                return self.cache
+            items = [{
+                "itemId": item_id,
+                "name": name,
+                "category": category,
+                "weight": round(weight, 3),
+                "reason": reason,
+                "since": datetime.fromordinal(day).strftime('%Y-%m-%d') if day else None,
+            } for item_id, (name, category, weight, reason, day) in list(self.waste.items())[:MAX_LISTED_ITEMS]]
+            return dict(self.cache, items=items)
+
+    def _advance(self, today):
+        # Items whose expiry day has come become waste as of that day
+        expired = False
+        while self.heap and self.heap[0][0] <= today:
+            expiry, item_id = heapq.heappop(self.heap)
+            entry = self.expiring.get(item_id)
+            if entry is None or entry[0] != expiry:
+                continue
+            del self.expiring[item_id]
+            _, name, category, weight = entry
+            self._add(item_id, name, category, weight, 'Expired', expiry)
+            expired = True
+        if expired:
+            self.version += 1
+
+    def _compact(self):
+        # Every re-track pushes a new entry and leaves the old one behind;
+        # dropping them all at once keeps the heap within twice the
+        # expiring items at an amortized constant cost per push
+        if len(self.heap) > max(MIN_HEAP_REBUILD, 2 * len(self.expiring)):
+            self.heap = [(entry[0], item_id) for item_id, entry in self.expiring.items()]
+            heapq.heapify(self.heap)
+
+    def _add(self, item_id, name, category, weight, reason, day):
+        self.waste[item_id] = (name, category, weight, reason, day)
+        self.totals[category][0] += weight
+        self.totals[category][1] += 1
+        self.reasons[reason] += 1
+        self.daily[(category, day)] += weight
+
+    def _forget(self, item_id):
+        # Stale heap entries are skipped when popped rather than searched
+        # for. True if the item was waste.
+        self.expiring.pop(item_id, None)
+        entry = self.waste.pop(item_id, None)
+        if entry is None:
+            return False
+        _, category, weight, reason, day = entry
+        self.totals[category][0] -= weight
+        self.totals[category][1] -= 1
+        self.reasons[reason] -= 1
+        self.daily[(category, day)] -= weight
+        if self.totals[category][1] == 0:
+            del self.totals[category]
+        if self.reasons[reason] == 0:
+            del self.reasons[reason]
+        return True
+
+    def _series(self, category, today, days):
+        return np.array([self.daily.get((category, day), 0.0) for day in range(today - days + 1, today + 1)])
+
+    def _trend(self, series):
+        if not series.any():
+            return 'stable'
+        x = np.arange(len(series)).reshape(-1, 1)
+        slope = LinearRegression().fit(x, series).coef_[0]
+        change = slope * len(series) / max(series.mean(), 1e-9)
+        if change > TREND_THRESHOLD:
+            return 'increasing'
+        if change < -TREND_THRESHOLD:
+            return 'decreasing'
+        return 'stable'
+
+    def _anomalies(self, today):
+        # Days whose station-wide waste stands out from the recent pattern
+        totals = sum(self._series(category, today, ANOMALY_WINDOW_DAYS) for category in self.totals) \
+            if self.totals else np.zeros(ANOMALY_WINDOW_DAYS)
+        if np.count_nonzero(totals) < 2:
+            return []
+        model = IsolationForest(n_estimators=50, contamination='auto', random_state=0)
+        flagged = model.fit_predict(totals.reshape(-1, 1)) == -1
+        typical = np.median(totals)
+        first = today - ANOMALY_WINDOW_DAYS + 1
+        return [{
+            "date": datetime.fromordinal(first + offset).strftime('%Y-%m-%d'),
+            "amount": round(float(totals[offset]), 1),
+        } for offset in np.flatnonzero(flagged & (totals > typical))]
+
+    def _summarize(self, today):
+        categories = [{
+            "type": category,
+            "amount": round(kg, 1),
+            "items": count,
+            "trend": self._trend(self._series(category, today, TREND_WINDOW_DAYS)),
+        } for category, (kg, count) in sorted(self.totals.items())]
+        return {
+            "categories": categories,
+            "total": round(sum(kg for kg, _ in self.totals.values()), 1),
+            "totalItems": len(self.waste),
+            "byReason": dict(self.reasons),
+            "anomalies": self._anomalies(today),
+            "nextPickup": self.next_pickup,
+            "asOf": datetime.fromordinal(today).strftime('%Y-%m-%d'),
+        }
@@ -1,8 +1,10 @@
 
 import { useState } from 'react';
+import { useQuery } from '@tanstack/react-query';
 import { Tooltip, TooltipContent, TooltipProvider, TooltipTrigger } from '@/components/ui/tooltip';
 import { Progress } from '@/components/ui/progress';
-import { getMockIssOccupancy } from '@/services/api';
+import { getOccupancy, type ChangeEventType } from '@/services/api';
+import { useChangeFeed } from '@/hooks/use-change-feed';
 import { modulePositions } from './moduleLayout';
 
 
@@ -13,6 +15,11 @@ interface ModuleData {
   warning: boolean;
 }
 
+// Changes that move occupancy; the report is refetched when one arrives
+const OCCUPANCY_CHANGES: ChangeEventType[] = [
+  'item_placement', 'item_retrieval', 'container_import', 'waste_undocking'
+];
+
 const ISSCrossSection = () => {
   const [selectedModule, setSelectedModule] = useState<ModuleData | null>(null);
   const [zoomed, setZoomed] = useState(false);
@@ -53,7 +60,15 @@ const ISSCrossSection = () => {
 
 
 
-  const issData = getMockIssOccupancy();
+  const { data: occupancy } = useQuery({
+    queryKey: ['occupancy'],
+    queryFn: () => getOccupancy(),
+  });
+  useChangeFeed(OCCUPANCY_CHANGES, ['occupancy']);
+  const issData = occupancy?.data ?? {
+    modules: [],
+    overall: { occupancy: 0, efficiency: 0, warnings: 0 },
+  };
 
   // Helper function to determine color based on occupancy level
   const getOccupancyColor = (percentage: number) => {
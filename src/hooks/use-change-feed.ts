@@ -0,0 +1,17 @@
+import * as React from "react"
+import { useQueryClient } from "@tanstack/react-query"
+import { subscribeToChanges, type ChangeEventType } from "@/services/api"
+
+// Refetches a query when the backend reports one of these changes, instead
+// of polling for them
+export function useChangeFeed(types: ChangeEventType[], queryKey: readonly unknown[]) {
+  const queryClient = useQueryClient()
+  const typesKey = types.join(",")
+  const queryKeyKey = JSON.stringify(queryKey)
+
+  React.useEffect(() => {
+    return subscribeToChanges(typesKey.split(",") as ChangeEventType[], () => {
+      queryClient.invalidateQueries({ queryKey: JSON.parse(queryKeyKey) })
+    })
+  }, [queryClient, typesKey, queryKeyKey])
+}
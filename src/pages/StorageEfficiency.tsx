@@ -1,5 +1,7 @@
 
+import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { useQuery } from '@tanstack/react-query';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { 
   Table, 
@@ -11,13 +13,57 @@ import {
 } from '@/components/ui/table';
 import { Alert, AlertDescription, AlertTitle } from "@/components/ui/alert";
 import { Progress } from '@/components/ui/progress';
+import { Button } from '@/components/ui/button';
+import { useToast } from '@/components/ui/use-toast';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
-import { getMockStorageEfficiency } from '@/services/api';
-import { BarChart2, AlertTriangle, Lightbulb, Package } from 'lucide-react';
+import { getOccupancy, getRearrangement, type ChangeEventType, type RearrangementPlan } from '@/services/api';
+import { useChangeFeed } from '@/hooks/use-change-feed';
+import { BarChart2, AlertTriangle, Lightbulb, Package, Shuffle } from 'lucide-react';
+
+// Changes that move occupancy; the report is refetched when one arrives
+const OCCUPANCY_CHANGES: ChangeEventType[] = [
+  'item_placement', 'item_retrieval', 'container_import', 'waste_undocking'
+];
 
 const StorageEfficiency = () => {
-  const efficiencyData = getMockStorageEfficiency();
+  const { data: occupancy } = useQuery({
+    queryKey: ['occupancy'],
+    queryFn: () => getOccupancy(),
+  });
+  useChangeFeed(OCCUPANCY_CHANGES, ['occupancy']);
+  const efficiencyData = {
+    overall: occupancy?.data?.overall.efficiency ?? 0,
+    byModule: occupancy?.data?.modules ?? [],
+    suggestions: occupancy?.data?.suggestions ?? [],
+  };
   const navigate = useNavigate();
+  const { toast } = useToast();
+  const [plan, setPlan] = useState<RearrangementPlan | null>(null);
+  const [isPlanning, setIsPlanning] = useState(false);
+  
+  const handleRearrangement = async () => {
+    setIsPlanning(true);
+    
+    try {
+      const { data, error } = await getRearrangement({ timeBudget: 2 });
+      if (error || !data) throw new Error(error);
+      setPlan(data);
+      toast({
+        title: "Rearrangement ready",
+        description: data.moves.length
+          ? `${data.moves.length} moves raise packing efficiency from ${data.efficiency.before}% to ${data.efficiency.after}%.`
+          : "No moves would improve the current arrangement.",
+      });
+    } catch (error) {
+      toast({
+        title: "Rearrangement failed",
+        description: "There was an error computing a rearrangement.",
+        variant: "destructive",
+      });
+    } finally {
+      setIsPlanning(false);
+    }
+  };
   
   // Helper function to get a color based on efficiency value
   const getEfficiencyColor = (value: number) => {
@@ -211,6 +257,41 @@ const StorageEfficiency = () => {
               <AlertDescription>{suggestion}</AlertDescription>
             </Alert>
           ))}
+          
+          <div className="flex items-center justify-between pt-2">
+            <p className="text-sm text-muted-foreground">
+              {plan
+                ? `${plan.containersInUse.before} → ${plan.containersInUse.after} containers in use, efficiency ${plan.efficiency.before}% → ${plan.efficiency.after}%`
+                : 'Compute a step-by-step plan of moves that consolidates partly filled containers'}
+            </p>
+            <Button onClick={handleRearrangement} disabled={isPlanning} className="gap-2">
+              <Shuffle className="h-4 w-4" />
+              {isPlanning ? 'Planning...' : 'Suggest moves'}
+            </Button>
+          </div>
+          
+          {plan && plan.moves.length > 0 && (
+            <Table>
+              <TableHeader>
+                <TableRow>
+                  <TableHead>Step</TableHead>
+                  <TableHead>Item</TableHead>
+                  <TableHead>From</TableHead>
+                  <TableHead>To</TableHead>
+                </TableRow>
+              </TableHeader>
+              <TableBody>
+                {plan.moves.map((move) => (
+                  <TableRow key={move.step}>
+                    <TableCell>{move.step}</TableCell>
+                    <TableCell className="font-medium">{move.itemName ?? move.itemId}</TableCell>
+                    <TableCell>{move.fromContainer}</TableCell>
+                    <TableCell>{move.module}/{move.toContainer}</TableCell>
+                  </TableRow>
+                ))}
+              </TableBody>
+            </Table>
+          )}
         </CardContent>
       </Card>
       
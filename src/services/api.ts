@@ -91,18 +91,30 @@ export async function placeItem(payload: {
 }
 
 // 3. Waste Management API
-export async function identifyWaste() {
-  return handleRequest<any>('/api/waste/identify', {
+export async function identifyWaste(params?: { items?: boolean }) {
+  const query = params?.items ? '?items=true' : '';
+  return handleRequest<any>(`/api/waste/identify${query}`, {
     method: 'GET',
   });
 }
 
 export async function createWasteReturnPlan(payload: {
-  wasteItems: Array<{
-    id: string;
-    type: string;
-    weight: number;
+  wasteItems?: Array<{
+    id?: string;
+    itemId?: string;
+    type?: string;
+    weight?: number;
+    volume?: number;
+    dimensions?: { width: number; depth: number; height: number };
+    hazardous?: boolean;
   }>;
+  fromInventory?: boolean;
+  mode?: 'pack' | 'knapsack';
+  vehicle?: 'Progress MS' | 'Cygnus' | 'Dragon' | 'HTV';
+  maxWeight?: number;
+  containers?: number;
+  returnDate?: string;
+  missionId?: string;
 }) {
   return handleRequest<any>('/api/waste/return-plan', {
     method: 'POST',
@@ -113,6 +125,7 @@ export async function createWasteReturnPlan(payload: {
 export async function completeWasteUndocking(payload: {
   missionId: string;
   userId?: string;
+  itemIds?: string[];
 }) {
   return handleRequest<any>('/api/waste/complete-undocking', {
     method: 'POST',
@@ -121,9 +134,33 @@ export async function completeWasteUndocking(payload: {
 }
 
 // 4. Time Simulation API
-export async function simulateDay(payload?: {
-  userId?: string;
+export interface SimulationScenario {
+  name?: string;
   days?: number;
+  startDate?: string;
+  seed?: number;
+  itemsToBeUsedPerDay?: Array<string | { itemId: string }>;
+  resupplies?: Array<{
+    day: number;
+    items: Array<{
+      itemId: string;
+      name?: string;
+      type?: string;
+      weight?: number;
+      usageLimit?: number;
+      accessFrequency?: 'high' | 'medium' | 'low';
+      expiryDate?: string;
+    }>;
+  }>;
+}
+
+// Runs one scenario, or several what-if `scenarios` side by side. Results
+// carry a scenarioId that commitSimulation applies; `commit` applies a
+// single scenario straight away.
+export async function simulateDay(payload?: SimulationScenario & {
+  userId?: string;
+  scenarios?: SimulationScenario[];
+  commit?: boolean;
 }) {
   return handleRequest<any>('/api/simulate/day', {
     method: 'POST',
@@ -131,6 +168,16 @@ export async function simulateDay(payload?: {
   });
 }
 
+export async function commitSimulation(payload: {
+  scenarioId: string;
+  userId?: string;
+}) {
+  return handleRequest<any>('/api/simulate/commit', {
+    method: 'POST',
+    body: JSON.stringify(payload),
+  });
+}
+
 // 5. Import/Export API
 export async function importItems(csvFile: File) {
   const formData = new FormData();
@@ -154,16 +201,41 @@ export async function importContainers(csvFile: File) {
   });
 }
 
-export async function exportArrangement(params: {
+// Imports run as background jobs; poll until status is completed/failed/cancelled
+export async function getImportJob(jobId: string) {
+  return handleRequest<any>(`/api/jobs/${jobId}`, {
+    method: 'GET',
+  });
+}
+
+export async function cancelImportJob(jobId: string) {
+  return handleRequest<any>(`/api/jobs/${jobId}/cancel`, {
+    method: 'POST',
+  });
+}
+
+// The export is streamed as a file download rather than returned as JSON,
+// so callers point a link or window.location at this URL
+export function exportArrangement(params: {
   module?: string;
-  format?: 'csv' | 'json';
+  format?: 'csv' | 'json' | 'jsonl' | 'parquet';
 }) {
   const searchParams = new URLSearchParams();
   
   if (params.module) searchParams.append('module', params.module);
   if (params.format) searchParams.append('format', params.format);
   
-  return handleRequest<any>(`/api/export/arrangement?${searchParams.toString()}`, {
+  return `${API_BASE_URL}/api/export/arrangement?${searchParams.toString()}`;
+}
+
+export interface ExportSummary {
+  modules: Array<{ module: string; items: number }>;
+  items: number;
+  formats: Array<'csv' | 'json' | 'jsonl' | 'parquet'>;
+}
+
+export async function getExportSummary() {
+  return handleRequest<ExportSummary>('/api/export/summary', {
     method: 'GET',
   });
 }
@@ -175,6 +247,9 @@ export async function getLogs(params: {
   itemId?: string;
   userId?: string;
   actionType?: string;
+  limit?: number;
+  cursor?: string;
+  groupBy?: Array<'actionType' | 'userId' | 'itemId' | 'hour' | 'day'>;
 }) {
   const searchParams = new URLSearchParams();
   
@@ -184,33 +259,145 @@ export async function getLogs(params: {
   if (params.itemId) searchParams.append('itemId', params.itemId);
   if (params.userId) searchParams.append('userId', params.userId);
   if (params.actionType) searchParams.append('actionType', params.actionType);
+  if (params.limit) searchParams.append('limit', params.limit.toString());
+  if (params.cursor) searchParams.append('cursor', params.cursor);
+  if (params.groupBy?.length) searchParams.append('groupBy', params.groupBy.join(','));
   
   return handleRequest<any>(`/api/logs?${searchParams.toString()}`, {
     method: 'GET',
   });
 }
 
-// Mock data functions for development
-export const getMockIssOccupancy = () => {
-  return {
-    modules: [
-      { name: 'Unity', id: 'unity', occupancy: 75, warning: false },
-      { name: 'Destiny', id: 'destiny', occupancy: 88, warning: true },
-      { name: 'Harmony', id: 'harmony', occupancy: 62, warning: false },
-      { name: 'Columbus', id: 'columbus', occupancy: 45, warning: false },
-      { name: 'Kibo', id: 'kibo', occupancy: 91, warning: true },
-      { name: 'Zvezda', id: 'zvezda', occupancy: 79, warning: false },
-      { name: 'Zarya', id: 'zarya', occupancy: 82, warning: true },
-      { name: 'Rassvet', id: 'rassvet', occupancy: 54, warning: false }
-    ],
-    overall: {
-      occupancy: 72,
-      efficiency: 68,
-      warnings: 3
-    }
+// 7. Occupancy API
+export interface ModuleOccupancy {
+  name: string;
+  id: string;
+  occupancy: number;
+  efficiency: number;
+  warning: boolean;
+  containers: number;
+  items: number;
+  capacity: number;
+  usedVolume: number;
+  usedWeight: number;
+}
+
+export interface OccupancyReport {
+  modules: ModuleOccupancy[];
+  overall: {
+    occupancy: number;
+    efficiency: number;
+    warnings: number;
+    containers: number;
+    items: number;
   };
-};
+  suggestions: string[];
+  containers?: Array<{
+    containerId: string;
+    module: string;
+    section: string | null;
+    occupancy: number;
+    items: number;
+    usedWeight: number;
+    maxWeight: number | null;
+  }>;
+}
 
+// The response carries an ETag and Cache-Control: no-cache, so the browser
+// revalidates each request and an unchanged report comes back as a 304
+export async function getOccupancy(params: {
+  module?: string;
+  containers?: boolean;
+} = {}) {
+  const searchParams = new URLSearchParams();
+  
+  if (params.module) searchParams.append('module', params.module);
+  if (params.containers) searchParams.append('containers', 'true');
+  
+  return handleRequest<OccupancyReport>(`/api/occupancy?${searchParams.toString()}`, {
+    method: 'GET',
+  });
+}
+
+// 8. Change Feed API
+export type ChangeEventType =
+  | 'item_placement'
+  | 'item_retrieval'
+  | 'item_import'
+  | 'container_import'
+  | 'waste_undocking'
+  | 'simulation'
+  | 'simulation_commit';
+
+// Bursts are merged server-side: one event per type carries how many changes
+// it stands for and up to 100 of the affected item ids
+export interface ChangeEvent {
+  id: number;
+  type: ChangeEventType;
+  count: number;
+  itemIds: string[];
+  truncated: boolean;
+  timestamp: string;
+  location?: string;
+  missionId?: string;
+  details?: Record<string, unknown>;
+}
+
+// Returns a function that closes the stream; EventSource reconnects on its own
+export function subscribeToChanges(
+  types: ChangeEventType[],
+  onEvent: (event: ChangeEvent) => void
+) {
+  const searchParams = new URLSearchParams();
+  
+  if (types.length) searchParams.append('types', types.join(','));
+  
+  const source = new EventSource(`${API_BASE_URL}/api/events?${searchParams.toString()}`);
+  const listener = (message: MessageEvent) => onEvent(JSON.parse(message.data));
+  types.forEach((type) => source.addEventListener(type, listener));
+  
+  return () => source.close();
+}
+
+// 10. Rearrangement API
+type Corner = { width: number; depth: number; height: number };
+
+export interface RearrangementMove {
+  step: number;
+  itemId: string;
+  itemName: string | null;
+  module: string;
+  fromContainer: string;
+  fromPosition: { start: Corner; end: Corner };
+  toContainer: string;
+  toPosition: { start: Corner; end: Corner };
+}
+
+export interface RearrangementPlan {
+  moves: RearrangementMove[];
+  score: { before: number; after: number };
+  efficiency: { before: number; after: number };
+  containersInUse: { before: number; after: number };
+  iterations: number;
+  chains: number;
+  elapsed: number;
+}
+
+// Only a proposal: the moves are carried out in order through the place API
+export async function getRearrangement(payload: {
+  module?: string;
+  timeBudget?: number;
+  maxMoves?: number;
+  seed?: number;
+  userId?: string;
+} = {}) {
+  return handleRequest<RearrangementPlan>('/api/rearrange', {
+    method: 'POST',
+    body: JSON.stringify(payload),
+  });
+}
+
+// Mock data functions for development
 export const getMockWasteData = () => {
   return {
     categories: [
@@ -224,24 +411,3 @@ export const getMockWasteData = () => {
     nextPickup: '2025-04-15'
   };
 };
-
-export const getMockStorageEfficiency = () => {
-  return {
-    overall: 68,
-    byModule: [
-      { name: 'Unity', efficiency: 65 },
-      { name: 'Destiny', efficiency: 72 },
-      { name: 'Harmony', efficiency: 81 },
-      { name: 'Columbus', efficiency: 59 },
-      { name: 'Kibo', efficiency: 43 },
-      { name: 'Zvezda', efficiency: 75 },
-      { name: 'Zarya', efficiency: 66 },
-      { name: 'Rassvet', efficiency: 77 }
-    ],
-    suggestions: [
-      'Reorganize Unity compartments 3-7 to improve access to frequently used items',
-      'Consolidate packaging materials in Destiny to free up 15% additional space',
-      'Move low-priority equipment from Kibo to Rassvet to balance load distribution'
-    ]
-  };
-};